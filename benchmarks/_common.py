@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def write_result(name: str, params: dict, metrics: dict, output: str = None) -> dict:
+    """
+    Print a benchmark result and, if `output` is given, append it as one JSON line so
+    results of different commits can be compared with a simple diff or pandas.
+    """
+    record = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": params,
+        "metrics": metrics,
+    }
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProbe:
+    """
+    Wall time and peak RSS of named stages. A background thread samples RSS every
+    `interval` seconds while a stage runs; `peak_rss_mb` is the peak above the RSS at
+    the start of the stage.
+
+        probe = StageProbe()
+        with probe.stage("build"):
+            ...
+        probe.results  # {"build": {"seconds": ..., "peak_rss_mb": ...}}
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.results = {}
+        self._peak = 0
+        self._running = False
+
+    def _sample(self):
+        while self._running:
+            self._peak = max(self._peak, current_rss())
+            time.sleep(self.interval)
+
+    @contextmanager
+    def stage(self, name: str):
+        start_rss = current_rss()
+        self._peak = start_rss
+        self._running = True
+        sampler = threading.Thread(target=self._sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._running = False
+            sampler.join()
+            self._peak = max(self._peak, current_rss())
+            result = self.results.setdefault(name, {"seconds": 0.0, "peak_rss_mb": 0.0})
+            result["seconds"] = round(result["seconds"] + seconds, 4)
+            result["peak_rss_mb"] = round(max(result["peak_rss_mb"], (self._peak - start_rss) / 2**20), 2)
@@ -0,0 +1,174 @@
+"""
+End-to-end benchmark of BatchOpenAIProcessor.generate_batch_response against the
+in-process Batch API emulator (benchmarks/mock_batch.py), on synthetic datasets of
+increasing size. Records wall time and peak RSS of every stage: dataset load,
+make_json_list, build, upload, submit, poll, download, merge_jsonl_files and merge_data.
+
+    python -m benchmarks.bench_batch --rows 1000 10000 100000 --output benchmarks/results/batch.jsonl
+    python -m benchmarks.bench_batch --rows 1000000 --context-chars 500 --fail-rate 0.01 --shuffle
+"""
+import os
+import json
+import random
+import argparse
+import tempfile
+from dataclasses import asdict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmarks._common import StageProbe, write_result
+from benchmarks.mock_batch import MockBatchClient, MockBatchConfig
+
+_SENTENCES = [
+    "Điều {n}. Phạm vi điều chỉnh và đối tượng áp dụng của văn bản này.",
+    "Thông tư {n}/2023/TT-BTC hướng dẫn thi hành một số điều của Luật Ngân sách nhà nước.",
+    "Cơ quan, tổ chức, cá nhân có liên quan chịu trách nhiệm thi hành Quyết định này.",
+    "Khoản {n}. Kinh phí thực hiện được bố trí từ nguồn ngân sách nhà nước theo phân cấp hiện hành.",
+    "Ủy ban nhân dân các tỉnh, thành phố trực thuộc trung ương tổ chức triển khai thực hiện.",
+]
+
+# Các bước nằm trong generate_batch_response, lấy thời gian từ span của src/utils/tracing.py
+_TRACED_STAGES = {
+    "batch.upload": "upload",
+    "batch.submit": "submit",
+    "batch.poll": "poll",
+    "batch.download": "download",
+}
+
+
+def make_dataset(path: str, rows: int, context_chars: int, seed: int = 0, batch_rows: int = 10000):
+    """Parquet dataset folder loadable with load_dataset(path, split="train")."""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(path, "data"), exist_ok=True)
+    schema = pa.schema([("title", pa.string()), ("context", pa.string())])
+    with pq.ParquetWriter(os.path.join(path, "data", "train-00000-of-00001.parquet"), schema) as writer:
+        for start in range(0, rows, batch_rows):
+            titles, contexts = [], []
+            for i in range(start, min(rows, start + batch_rows)):
+                parts, size = [], 0
+                while size < context_chars:
+                    sentence = rng.choice(_SENTENCES).format(n=rng.randint(1, 300))
+                    parts.append(sentence)
+                    size += len(sentence) + 1
+                titles.append(f"Văn bản {i}")
+                contexts.append("\n".join(parts)[:context_chars])
+            writer.write_table(pa.table({"title": titles, "context": contexts}, schema=schema))
+
+
+def run_one(rows: int, args, workdir: str) -> dict:
+    from src.utils.tracing import configure_tracing, load_spans
+    from src.pipeline.batch_processor.bactch_open_ai_processor import BatchOpenAIProcessor, BatchOpenAIConfig
+
+    probe = StageProbe()
+
+    class ProbedProcessor(BatchOpenAIProcessor):
+        def make_json_list(self):
+            with probe.stage("make_json_list"):
+                return super().make_json_list()
+
+        def build_request(self, *a, **kw):
+            with probe.stage("build"):
+                return super().build_request(*a, **kw)
+
+        def merge_jsonl_files(self, *a, **kw):
+            with probe.stage("merge_jsonl_files"):
+                return super().merge_jsonl_files(*a, **kw)
+
+        def merge_data(self, *a, **kw):
+            with probe.stage("merge_data"):
+                return super().merge_data(*a, **kw)
+
+    dataset_dir = os.path.join(workdir, "dataset")
+    with probe.stage("make_dataset"):
+        make_dataset(dataset_dir, rows, args.context_chars, args.seed)
+
+    config = BatchOpenAIConfig(
+        model_name="mock-model",
+        url="/v1/chat/completions",
+        dataset_name=dataset_dir,
+        num_samples_range=(0, rows),
+        temperature=0.7,
+        top_p=0.95,
+        max_tokens=1024,
+        column_name_list=["context"],
+        system_prompt="Trích xuất thông tin có cấu trúc từ văn bản pháp luật.",
+        compact_context=args.compact,
+        poll_interval=args.poll_interval,
+    )
+    emulator = asdict(MockBatchConfig(
+        validating_s=args.validating_s,
+        rows_per_s=args.rows_per_s,
+        finalizing_s=args.finalizing_s,
+        fail_rate=args.fail_rate,
+        shuffle=args.shuffle,
+        seed=args.seed,
+    ))
+    client = MockBatchClient(MockBatchConfig(**emulator), storage_dir=os.path.join(workdir, "files"))
+    trace_path = os.path.join(workdir, "trace.jsonl")
+    configure_tracing(trace_path)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # generate_batch_response ghi file vào thư mục hiện tại
+    try:
+        with probe.stage("load_dataset"):
+            processor = ProbedProcessor(client, config)
+        with probe.stage("total"):
+            result = processor.generate_batch_response()
+    finally:
+        os.chdir(cwd)
+        configure_tracing(None)
+
+    stages = dict(probe.results)
+    for span in load_spans(trace_path):
+        if span["name"] in _TRACED_STAGES:
+            stages[_TRACED_STAGES[span["name"]]] = {"seconds": round(span["duration"], 4)}
+
+    merged_path = os.path.join(workdir, f"merged_output_batch_input0_{rows}.json")
+    merged = 0
+    if os.path.exists(merged_path):
+        with open(merged_path, "r", encoding="utf-8") as f:
+            merged = len(json.load(f))
+    total_s = stages["total"]["seconds"]
+    return {
+        "params": {"rows": rows, "context_chars": args.context_chars, "compact": args.compact,
+                   "poll_interval": args.poll_interval, "emulator": emulator},
+        "metrics": {
+            "ok": result is not False,
+            "merged_rows": merged,
+            "rows_per_s": round(rows / total_s, 1) if total_s else None,
+            "stages": stages,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--context-chars", type=int, default=1500)
+    parser.add_argument("--compact", action="store_true", help="Enable compact_context in build_request")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--validating-s", type=float, default=0.2)
+    parser.add_argument("--rows-per-s", type=float, default=0, help="Emulated batch throughput (0 = as fast as possible)")
+    parser.add_argument("--finalizing-s", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--shuffle", action="store_true", help="Return outputs out of input order")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Keep generated files here instead of a temp dir")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_batch_") as tmp:
+        root = os.path.abspath(args.workdir) if args.workdir else tmp
+        # Cache Arrow của datasets nằm cạnh dữ liệu benchmark, không làm đầy ~/.cache
+        # (phải đặt trước khi import datasets)
+        os.environ["HF_DATASETS_CACHE"] = os.path.join(root, "hf_cache")
+        for rows in args.rows:
+            workdir = os.path.join(root, f"rows_{rows}")
+            os.makedirs(workdir, exist_ok=True)
+            record = run_one(rows, args, workdir)
+            write_result("batch_e2e", record["params"], record["metrics"], args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Load test of POST /chat against the offline mock provider (benchmarks/mock_openai.py):
+requests are fired open-loop at each target RPS, and throughput, error rate and
+p50/p95/p99 latency are reported per step as one JSON line, so runs of different
+commits can be compared.
+
+    python -m benchmarks.bench_chat_load --rps 5 20 50 --duration 30 --output benchmarks/results/chat_load.jsonl
+    python -m benchmarks.bench_chat_load --rps 20 --stream --rate-429 0.05 --latency-ms 1500
+
+By default the mock and the API (uvicorn src.api.api_module:app) are started as
+subprocesses on free ports, with the router's env pointed at the mock. Pass
+--api-url to drive an already running API instead (its provider config is untouched).
+Every request carries a distinct prompt so /chat coalescing does not merge them;
+--same-prompt sends one prompt throughout to measure coalescing instead.
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+from dataclasses import asdict
+
+import httpx
+
+from benchmarks._common import REPO_ROOT, write_result, percentile
+from benchmarks.mock_openai import add_mock_arguments, mock_config_from_args
+from src.pipeline.registry import ROUTER_MAP
+
+PROMPT = (
+    "Trích xuất số hiệu, loại văn bản, cơ quan ban hành và ngày ban hành từ văn bản sau. "
+    "Thông tư 01/2023/TT-BGDĐT quy định chi tiết thi hành một số điều của Luật Giáo dục. "
+) * 8
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def start_servers(args):
+    """Start the mock and the API; returns (api_url, mock_url, processes)."""
+    mock_port, api_port = free_port(), free_port()
+    mock_cmd = [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(mock_port)]
+    for name, value in asdict(mock_config_from_args(args)).items():
+        mock_cmd += [f"--{name.replace('_', '-')}", str(value)]
+
+    prefix = ROUTER_MAP[args.router]
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(p for p in (REPO_ROOT, os.environ.get("PYTHONPATH")) if p),
+        **{
+            f"{prefix}_BASE_URL": f"http://127.0.0.1:{mock_port}/v1",
+            f"{prefix}_KEY": "mock",
+            f"{prefix}_MODEL_NAME": "mock-model",
+        },
+    )
+    api_cmd = [
+        sys.executable, "-m", "uvicorn", "src.api.api_module:app",
+        "--host", "127.0.0.1", "--port", str(api_port), "--log-level", "warning",
+        "--workers", str(args.api_workers),
+    ]
+    processes = [
+        subprocess.Popen(mock_cmd, cwd=REPO_ROOT, env=env),
+        subprocess.Popen(api_cmd, cwd=REPO_ROOT, env=env),
+    ]
+    mock_url, api_url = f"http://127.0.0.1:{mock_port}", f"http://127.0.0.1:{api_port}"
+    wait_ready(f"{mock_url}/stats")
+    wait_ready(f"{api_url}/metrics")
+    return api_url, mock_url, processes
+
+
+async def send_chat(client: httpx.AsyncClient, api_url: str, payload: dict):
+    start = time.perf_counter()
+    try:
+        response = await client.post(f"{api_url}/chat", json=payload)
+        body = response.json()
+        ok = (
+            response.status_code == 200
+            and body.get("status") == "success"
+            and not str(body.get("response", "")).startswith("<Error>")
+        )
+    except (httpx.HTTPError, ValueError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+async def run_step(
+    api_url: str, rps: float, duration: float, payload: dict, max_in_flight: int, timeout: float,
+    same_prompt: bool = False,
+) -> dict:
+    """
+    Fire round(rps * duration) requests on a fixed schedule (open loop). Each request
+    gets its own prompt (sequence number appended) so /chat coalescing does not
+    merge them, unless `same_prompt`.
+    """
+    total = max(1, round(rps * duration))
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    late = []
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def fire(i: int, scheduled: float):
+            body = payload if same_prompt else dict(payload, chat=f"{payload['chat']}\n#{i}")
+            async with in_flight:
+                late.append(time.perf_counter() - scheduled)
+                return await send_chat(client, api_url, body)
+
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(i, scheduled)))
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, ok in results if ok]
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "sent": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / total, 4),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3),
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p95_s": round(percentile(latencies, 95), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        "latency_mean_s": round(statistics.fmean(latencies), 4) if latencies else 0.0,
+        "latency_max_s": round(max(latencies), 4) if latencies else 0.0,
+        "start_lag_p95_s": round(percentile(late, 95), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, nargs="+", default=[10.0], help="Target request rates (one step each)")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per step")
+    parser.add_argument("--router", default="deepseek", choices=sorted(r for r in ROUTER_MAP if r != "gemini"))
+    parser.add_argument("--stream", action="store_true", help="Ask the pipeline to stream from the provider")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--same-prompt", action="store_true", help="Send one prompt for every request (measures coalescing)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--api-url", default=None, help="Use a running API instead of starting one")
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--output", default=None)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    processes = []
+    mock_url = None
+    try:
+        if args.api_url:
+            api_url = args.api_url.rstrip("/")
+        else:
+            api_url, mock_url, processes = start_servers(args)
+
+        payload = {
+            "chat": PROMPT,
+            "model_name": "mock-model",
+            "router_name": args.router,
+            "config": {"stream": args.stream, "max_tokens": 1024},
+        }
+        for _ in range(args.warmup):
+            httpx.post(f"{api_url}/chat", json=payload, timeout=args.timeout)
+
+        for rps in args.rps:
+            mock_before = httpx.get(f"{mock_url}/stats").json() if mock_url else {}
+            metrics = asyncio.run(run_step(
+                api_url, rps, args.duration, payload, args.max_in_flight, args.timeout, args.same_prompt,
+            ))
+            if mock_url:
+                mock_after = httpx.get(f"{mock_url}/stats").json()
+                for key in ("requests", "429", "500"):
+                    metrics[f"provider_{key}"] = mock_after.get(key, 0) - mock_before.get(key, 0)
+            params = {
+                "rps": rps,
+                "duration": args.duration,
+                "router": args.router,
+                "stream": args.stream,
+                "max_in_flight": args.max_in_flight,
+                "same_prompt": args.same_prompt,
+                "api_workers": args.api_workers if not args.api_url else None,
+                "mock": asdict(mock_config_from_args(args)) if mock_url else None,
+            }
+            write_result("chat_load", params, metrics, args.output)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
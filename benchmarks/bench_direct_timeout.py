@@ -0,0 +1,123 @@
+"""
+Check that a timed-out row in send_request.py direct mode does not stall the other
+rows of the process: rows are sent in-process through
+SingleRequestProcessor.call_direct against the mock provider
+(benchmarks/mock_openai.py), some with a timeout shorter than the provider latency.
+A ticker measures how long the event loop is blocked, and the latency of the rows
+that do not time out is reported as one JSON line.
+
+    python -m benchmarks.bench_direct_timeout --rows 20 --timed-out 5 --latency-ms 2000
+
+Exits with status 1 when the loop stall exceeds --max-stall-s.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from types import SimpleNamespace
+from dataclasses import asdict
+
+from benchmarks._common import REPO_ROOT, write_result, percentile
+from benchmarks.bench_chat_load import free_port, wait_ready
+from benchmarks.mock_openai import add_mock_arguments, mock_config_from_args
+from src.pipeline.registry import ROUTER_MAP
+
+
+async def run(args) -> dict:
+    from send_request import SingleRequestProcessor
+
+    def processor(timeout: float):
+        # call_direct chỉ cần config, không cần tải dataset
+        return SimpleNamespace(config=SimpleNamespace(timeout=timeout, tenant="bench"))
+
+    def payload(i: int) -> dict:
+        return {
+            "chat": f"Văn bản số {i}",  # khác nhau để không bị gộp (CHAT_COALESCE)
+            "model_name": "mock-model",
+            "router_name": args.router,
+            "priority": "bulk",
+            "config": {"stream": False, "max_tokens": 64},
+        }
+
+    stall = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.05)
+            now = time.perf_counter()
+            stall.append(now - last - 0.05)
+            last = now
+
+    async def row(i: int, timeout: float):
+        start = time.perf_counter()
+        try:
+            await SingleRequestProcessor.call_direct(processor(timeout), payload(i))
+            return time.perf_counter() - start, "ok"
+        except asyncio.TimeoutError:
+            return time.perf_counter() - start, "timeout"
+
+    # Khởi tạo client của pipeline trước khi đo
+    await row(-1, args.timeout)
+    tick = asyncio.create_task(ticker())
+    results = await asyncio.gather(*(
+        row(i, args.short_timeout if i < args.timed_out else args.timeout) for i in range(args.rows)
+    ))
+    tick.cancel()
+
+    ok = [latency for latency, status in results if status == "ok"]
+    timed_out = [latency for latency, status in results if status == "timeout"]
+    return {
+        "ok": len(ok),
+        "timed_out": len(timed_out),
+        "timed_out_max_s": round(max(timed_out), 4) if timed_out else 0.0,
+        "latency_p50_s": round(percentile(ok, 50), 4),
+        "latency_max_s": round(max(ok), 4) if ok else 0.0,
+        "loop_stall_max_s": round(max(stall, default=0.0), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--timed-out", type=int, default=5, help="Rows sent with --short-timeout")
+    parser.add_argument("--short-timeout", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--router", default="deepseek", choices=sorted(r for r in ROUTER_MAP if r != "gemini"))
+    parser.add_argument("--max-stall-s", type=float, default=0.2)
+    parser.add_argument("--output", default=None)
+    add_mock_arguments(parser)
+    parser.set_defaults(latency_ms=2000, latency_sigma=0.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    mock_cmd = [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port)]
+    for name, value in asdict(mock_config_from_args(args)).items():
+        mock_cmd += [f"--{name.replace('_', '-')}", str(value)]
+    prefix = ROUTER_MAP[args.router]
+    os.environ.update({
+        f"{prefix}_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        f"{prefix}_KEY": "mock",
+        f"{prefix}_MODEL_NAME": "mock-model",
+    })
+
+    process = subprocess.Popen(mock_cmd, cwd=REPO_ROOT)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/stats")
+        metrics = asyncio.run(run(args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    params = {key: getattr(args, key) for key in ("rows", "timed_out", "short_timeout", "router", "max_stall_s")}
+    params["mock"] = asdict(mock_config_from_args(args))
+    write_result("direct_timeout", params, metrics, args.output)
+    if metrics["loop_stall_max_s"] > args.max_stall_s:
+        print(f"❌ Event loop bị chặn {metrics['loop_stall_max_s']}s khi một request direct bị timeout")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
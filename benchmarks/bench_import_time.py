@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark: import the API module in fresh interpreters and report wall time,
+the slowest imports (from `python -X importtime`) and which heavy SDKs got loaded.
+
+    python -m benchmarks.bench_import_time --runs 5 --output benchmarks/results/import_time.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from benchmarks._common import REPO_ROOT, write_result, percentile
+
+HEAVY_MODULES = [
+    "datasets", "pandas", "langchain_google_genai", "langchain_core",
+    "google.genai", "openai", "groq", "markitdown",
+]
+
+_PROBE = (
+    "import sys, json, time; t = time.perf_counter(); import {module}; "
+    "print(json.dumps({{'seconds': time.perf_counter() - t, "
+    "'loaded': [m for m in {heavy!r} if m in sys.modules]}}))"
+)
+
+
+def run_once(module: str, importtime: bool = False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    pythonpath = os.pathsep.join(p for p in (REPO_ROOT, os.environ.get("PYTHONPATH")) if p)
+    env = dict(os.environ, PYTHONPATH=pythonpath)
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    return wall, probe, proc.stderr
+
+
+def top_imports(importtime_log: str, limit: int = 15):
+    """Parse `-X importtime` output into (cumulative µs, module) sorted descending."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.api.api_module")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Append the result as a JSON line to this file")
+    args = parser.parse_args()
+
+    # Warm-up run so .pyc compilation is not counted
+    run_once(args.module)
+
+    walls, imports = [], []
+    for _ in range(args.runs):
+        wall, probe, _ = run_once(args.module)
+        walls.append(wall)
+        imports.append(probe["seconds"])
+
+    _, probe, log = run_once(args.module, importtime=True)
+    write_result(
+        "import_time",
+        {"module": args.module, "runs": args.runs},
+        {
+            "import_seconds_median": round(statistics.median(imports), 4),
+            "import_seconds_p95": round(percentile(imports, 95), 4),
+            "process_seconds_median": round(statistics.median(walls), 4),
+            "heavy_modules_loaded": probe["loaded"],
+            "top_imports": top_imports(log),
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark the title normalizer used by match_url_and_save against the previous
+row-by-row implementation on a synthetic set of titles (default 1M, ~20% distinct).
+
+    python -m benchmarks.bench_normalize --rows 1000000 --output benchmarks/results/normalize.jsonl
+"""
+import re
+import time
+import random
+import argparse
+import unicodedata
+
+import pandas as pd
+
+from benchmarks._common import write_result
+from src.preproccess.tool import normalize, normalize_series, _normalize_str
+
+
+def normalize_reference(text):
+    """The row-by-row normalize() this benchmark compares against."""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    text = text.replace("–", "-").replace("—", "-")
+    text = ''.join(c for c in text if c.isprintable())
+    text = text.replace('\u00A0', ' ')
+    text = text.replace('_', '/')
+    text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    text = text.strip('"').strip("'")
+    text = re.sub(r"\s+", " ", text)
+    return text.strip().lower()
+
+
+_KINDS = ["Thông tư", "Nghị định", "Quyết định", "Luật", "Công văn", "Nghị quyết"]
+_AGENCIES = ["BTC", "BGDĐT", "BYT", "BNNMT", "UBND", "TTg", "BTTTT"]
+_TOPICS = [
+    "quy định chi tiết thi hành", "sửa đổi, bổ sung một số điều của", "hướng dẫn thực hiện",
+    "về quy chuẩn kỹ thuật quốc gia", "ban hành “Quy chế” quản lý", "về chất lượng môi trường xung quanh",
+]
+_NOISE = ["", " ", "\u00a0", "\t", "\n", "  ", "\u200b", "–", "—", "’", "_", "\ufb01", "\uff34"]
+
+
+def make_titles(rows: int, distinct_ratio: float, seed: int = 0) -> pd.Series:
+    rng = random.Random(seed)
+    distinct = []
+    for i in range(max(1, int(rows * distinct_ratio))):
+        title = (
+            f"{rng.choice(_NOISE)}{rng.choice(_KINDS)} {i}/{rng.randint(2000, 2025)}"
+            f"{rng.choice(['/', '_'])}TT-{rng.choice(_AGENCIES)}{rng.choice(_NOISE)} "
+            f"{rng.choice(_TOPICS)}{rng.choice(_NOISE)} do Bộ trưởng ban hành{rng.choice(_NOISE)}"
+        )
+        if rng.random() < 0.05:
+            title = f'"{title}"'
+        distinct.append(title)
+    values = [rng.choice(distinct) for _ in range(rows)]
+    for i in rng.sample(range(rows), k=min(rows, 100)):
+        values[i] = None
+    return pd.Series(values, dtype=object)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct-ratio", type=float, default=0.2)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    titles = make_titles(args.rows, args.distinct_ratio)
+
+    reference_s, expected = timed(lambda: titles.apply(normalize_reference))
+    _normalize_str.cache_clear()
+    series_s, actual = timed(lambda: normalize_series(titles))
+    _normalize_str.cache_clear()
+    scalar_s, scalar = timed(lambda: titles.map(normalize))
+
+    mismatches = int((expected.to_numpy() != actual.to_numpy()).sum() + (expected.to_numpy() != scalar.to_numpy()).sum())
+    write_result(
+        "normalize",
+        {"rows": args.rows, "distinct_ratio": args.distinct_ratio},
+        {
+            "reference_seconds": round(reference_s, 3),
+            "normalize_series_seconds": round(series_s, 3),
+            "normalize_memoized_seconds": round(scalar_s, 3),
+            "speedup_series": round(reference_s / series_s, 2),
+            "speedup_memoized": round(reference_s / scalar_s, 2),
+            "mismatches": mismatches,
+        },
+        args.output,
+    )
+    if mismatches:
+        raise SystemExit(f"❌ {mismatches} titles differ from the reference normalize()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Baseline of the offline stages on a synthetic corpus (benchmarks/corpus.py): wall
+time, throughput and peak RSS of convert_pdf_to_text, make_csv, safe_json_loads,
+extract_and_map_fields_from_df, normalize and match_url_and_save, as one JSON line
+per run so commits can be compared.
+
+    python -m benchmarks.bench_offline --documents 2000 --output benchmarks/results/offline.jsonl
+    python -m benchmarks.bench_offline --documents 20000 --no-pdf --stages make_csv normalize --repeat 3
+
+Each stage runs `--repeat` times on the same files; the fastest run is reported
+(peak RSS is the largest seen). Artifact caching is off, so every run does the
+full work. The pdf2txt stage needs `pdftotext` (poppler-utils) on PATH and is
+reported as skipped otherwise. Stage output (prints, progress bars) is silenced
+unless --verbose is given.
+"""
+import io
+import os
+import shutil
+import argparse
+import tempfile
+import contextlib
+from dataclasses import asdict
+
+import pandas as pd
+
+from benchmarks._common import StageProbe, write_result
+from benchmarks.corpus import add_corpus_arguments, corpus_config_from_args, write_corpus
+
+@contextlib.contextmanager
+def _quiet(enabled: bool):
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+STAGES = ["pdf2txt", "make_csv", "safe_json_loads", "extract", "normalize", "match_url"]
+
+
+def run_stages(paths: dict, workdir: str, stages: list, repeat: int, verbose: bool) -> dict:
+    from src.generate.pdf2txt import convert_pdf_to_text
+    from src.utils.utils import make_csv
+    from src.preproccess.tool import (
+        safe_json_loads, extract_and_map_fields_from_df, match_url_and_save, normalize, _normalize_str,
+    )
+
+    llm_df = pd.read_json(paths["llm_output.json"], orient="records", dtype=False)
+    responses = llm_df["context_response"].tolist()
+    titles = pd.read_csv(paths["data.csv"], usecols=["title"])["title"].tolist()
+    state = {}
+
+    def pdf2txt():
+        out_dir = os.path.join(workdir, "pdf2txt")
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        convert_pdf_to_text(paths["pdf"], out_dir, use_cache=False)
+        return len(os.listdir(out_dir))
+
+    def csv_stage():
+        make_csv(os.path.join(workdir, "make_csv.csv"), paths["txt"], use_cache=False)
+        return len(os.listdir(paths["txt"]))
+
+    def json_stage():
+        state["parsed"] = sum(safe_json_loads(text) is not None for text in responses)
+        return len(responses)
+
+    def extract():
+        state["final_df"] = extract_and_map_fields_from_df(llm_df, paths["data.csv"])
+        return len(llm_df)
+
+    def normalize_stage():
+        _normalize_str.cache_clear()
+        state["normalized"] = len({normalize(title) for title in titles})
+        return len(titles)
+
+    def match_url():
+        if "final_df" not in state:
+            extract()
+        final_df = state["final_df"].copy()
+        match_url_and_save(final_df, paths["urls.json"], os.path.join(workdir, "matched.csv"))
+        state["matched_url"] = int(final_df["url"].ne("").sum())
+        return len(final_df)
+
+    functions = {
+        "pdf2txt": pdf2txt, "make_csv": csv_stage, "safe_json_loads": json_stage,
+        "extract": extract, "normalize": normalize_stage, "match_url": match_url,
+    }
+    results = {}
+    for name in stages:
+        if name == "pdf2txt" and (not os.path.isdir(paths["pdf"]) or not shutil.which("pdftotext")):
+            results[name] = {"skipped": "pdftotext not on PATH" if os.path.isdir(paths["pdf"]) else "corpus built with --no-pdf"}
+            continue
+        best = None
+        for _ in range(repeat):
+            probe = StageProbe()
+            with _quiet(not verbose), probe.stage(name):
+                items = functions[name]()
+            run = probe.results[name]
+            if best is None:
+                best = dict(run, items=items)
+            else:
+                best["seconds"] = min(best["seconds"], run["seconds"])
+                best["peak_rss_mb"] = max(best["peak_rss_mb"], run["peak_rss_mb"])
+        best["items_per_s"] = round(best["items"] / best["seconds"], 1) if best["seconds"] else None
+        results[name] = best
+        print(f"⏱️ {name}: {best['seconds']:.3f}s, {best['items_per_s']} items/s, +{best['peak_rss_mb']} MB")
+
+    checks = {key: state[key] for key in ("parsed", "normalized", "matched_url") if key in state}
+    if "final_df" in state:
+        checks["extracted"] = len(state["final_df"])
+    return {"stages": results, "checks": checks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="Keep the corpus and stage outputs here instead of a temp dir")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    parser.add_argument("--output", default=None)
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    config = corpus_config_from_args(args)
+    if "pdf2txt" not in args.stages:
+        config.pdf = False
+
+    with tempfile.TemporaryDirectory(prefix="bench_offline_") as tmp:
+        root = os.path.abspath(args.workdir) if args.workdir else tmp
+        probe = StageProbe()
+        with probe.stage("corpus"):
+            summary = write_corpus(os.path.join(root, "corpus"), config)
+        paths = summary.pop("paths")
+        metrics = run_stages(paths, root, args.stages, max(1, args.repeat), args.verbose)
+
+    metrics["corpus"] = dict(summary, seconds=probe.results["corpus"]["seconds"])
+    write_result("offline_stages", {"corpus": asdict(config), "repeat": args.repeat}, metrics, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Synthetic Vietnamese legal corpus for benchmarking the offline stages, in the
+formats they read:
+
+- pdf/  one PDF per document (input of convert_pdf_to_text)
+- txt/  the same documents as `pdftotext -layout` text: page headers / footers,
+        form feeds, Chương / Điều / Khoản / điểm structure (input of make_csv)
+- data.csv         title/system/human/context rows as written by make_csv
+- llm_output.json  merged batch output [{"custom_id", "context_response"}] with a
+                   share of malformed responses (fences, prose, trailing commas,
+                   truncation, double encoding, ...) for safe_json_loads /
+                   extract_and_map_fields_from_df
+- urls.json        URL catalogue [{"title", "url"}] for match_url_and_save, with
+                   titles written slightly differently and some missing
+
+Near-duplicate documents (same body, different number / spacing) are mixed in.
+Everything is derived from `seed`, so the same config always gives the same files.
+
+    python -m benchmarks.corpus --documents 2000 --out /tmp/corpus
+"""
+import os
+import csv
+import json
+import random
+import argparse
+import unicodedata
+from dataclasses import dataclass, asdict, field
+from typing import List, Optional, Tuple
+
+_KINDS = [
+    ("Thông tư", "TT"), ("Nghị định", "NĐ-CP"), ("Quyết định", "QĐ-TTg"),
+    ("Nghị quyết", "NQ-HĐND"), ("Công văn", "CV-BTC"), ("Luật", "QH15"),
+]
+_AGENCIES = [
+    ("BỘ TÀI CHÍNH", "BTC", "Bộ trưởng", "Hồ Đức Phớc"),
+    ("BỘ GIÁO DỤC VÀ ĐÀO TẠO", "BGDĐT", "Bộ trưởng", "Nguyễn Kim Sơn"),
+    ("BỘ Y TẾ", "BYT", "Thứ trưởng", "Trần Văn Thuấn"),
+    ("CHÍNH PHỦ", "CP", "Thủ tướng", "Phạm Minh Chính"),
+    ("ỦY BAN NHÂN DÂN THÀNH PHỐ HÀ NỘI", "UBND", "Chủ tịch", "Trần Sỹ Thanh"),
+    ("BỘ THÔNG TIN VÀ TRUYỀN THÔNG", "BTTTT", "Bộ trưởng", "Nguyễn Mạnh Hùng"),
+]
+_FIELDS = ["Tài chính nhà nước", "Giáo dục", "Y tế", "Thuế - Phí - Lệ phí", "Công nghệ thông tin", "Bộ máy hành chính"]
+_TOPICS = [
+    "quy định chi tiết thi hành một số điều của Luật Ngân sách nhà nước",
+    "sửa đổi, bổ sung một số điều của Thông tư số {ref}",
+    "hướng dẫn thực hiện chế độ tài chính đối với đơn vị sự nghiệp công lập",
+    "ban hành “Quy chế” quản lý và sử dụng kinh phí chi thường xuyên",
+    "về quy chuẩn kỹ thuật quốc gia đối với thiết bị đầu cuối",
+    "quy định về tổ chức và hoạt động của cơ sở giáo dục đại học",
+]
+_CHAPTERS = ["QUY ĐỊNH CHUNG", "QUY ĐỊNH CỤ THỂ", "TỔ CHỨC THỰC HIỆN", "ĐIỀU KHOẢN THI HÀNH"]
+_ARTICLE_TITLES = [
+    "Phạm vi điều chỉnh", "Đối tượng áp dụng", "Giải thích từ ngữ", "Nguyên tắc thực hiện",
+    "Trách nhiệm của cơ quan, đơn vị", "Kinh phí thực hiện", "Chế độ báo cáo", "Hiệu lực thi hành",
+]
+_SENTENCES = [
+    "Cơ quan, tổ chức, cá nhân có liên quan chịu trách nhiệm thi hành {kind} này",
+    "Kinh phí thực hiện được bố trí từ nguồn ngân sách nhà nước theo phân cấp hiện hành",
+    "Ủy ban nhân dân các tỉnh, thành phố trực thuộc trung ương tổ chức triển khai thực hiện",
+    "Trường hợp các văn bản dẫn chiếu tại {kind} này được sửa đổi, bổ sung hoặc thay thế thì áp dụng theo văn bản mới",
+    "Đơn vị sự nghiệp công lập tự bảo đảm chi thường xuyên theo quy định tại khoản {k} Điều {d}",
+    "Mức thu phí được xác định bằng {n}% giá trị hợp đồng nhưng tối đa không quá {m} triệu đồng",
+    "Định kỳ hằng năm, trước ngày {n} tháng {k}, báo cáo kết quả thực hiện gửi {agency}",
+    "Trong quá trình thực hiện, nếu có vướng mắc, đề nghị phản ánh kịp thời về {agency} để xem xét, giải quyết",
+]
+_STATUSES = ["Còn hiệu lực", "Hết hiệu lực một phần", "Hết hiệu lực toàn bộ", "Chưa có hiệu lực"]
+
+
+@dataclass
+class CorpusConfig:
+    documents: int = 200
+    articles: Tuple[int, int] = (4, 30)        # số Điều mỗi văn bản
+    clauses: Tuple[int, int] = (1, 5)          # số Khoản mỗi Điều
+    lines_per_page: int = 55
+    duplicate_rate: float = 0.1                # tỉ lệ văn bản gần trùng (cùng nội dung, khác số hiệu / khoảng trắng)
+    malformed_rate: float = 0.2                # tỉ lệ response LLM bị lỗi định dạng
+    missing_url_rate: float = 0.1              # tỉ lệ văn bản không có trong danh mục URL
+    fuzzy_url_rate: float = 0.2                # tỉ lệ tiêu đề trong danh mục viết khác một chút
+    pdf: bool = True
+    seed: int = 0
+
+
+@dataclass
+class Document:
+    title: str
+    text: str
+    fields: dict = field(default_factory=dict)
+    duplicate_of: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        # Tên file không chứa "/", normalize() đổi "_" lại thành "/"
+        return self.title.replace("/", "_")
+
+
+def _date(rng: random.Random, year: int) -> str:
+    return f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _sentence(rng: random.Random, kind: str, agency: str) -> str:
+    return rng.choice(_SENTENCES).format(
+        kind=kind.lower(), agency=agency.title(), k=rng.randint(1, 9), d=rng.randint(1, 40),
+        n=rng.randint(1, 30), m=rng.randint(1, 500),
+    ) + "."
+
+
+def make_document(rng: random.Random, index: int, config: CorpusConfig) -> Document:
+    """One document: header block, Chương / Điều / Khoản / điểm body and signature."""
+    kind, suffix = rng.choice(_KINDS)
+    agency, code, role, signer = rng.choice(_AGENCIES)
+    year = rng.randint(2005, 2025)
+    number = f"{index + 1}/{year}/{suffix if kind != 'Thông tư' else 'TT-' + code}"
+    topic = rng.choice(_TOPICS).format(ref=f"{rng.randint(1, 200)}/{year - 1}/TT-{code}")
+    title = f"{kind} {number} {topic}"
+    issued = _date(rng, year)
+
+    lines = [
+        f"{agency:<40}CỘNG HÒA XÃ HỘI CHỦ NGHĨA VIỆT NAM",
+        f"{'-------':<40}Độc lập - Tự do - Hạnh phúc",
+        f"{'':<40}---------------",
+        f"Số: {number:<35}Hà Nội, ngày {issued[8:]} tháng {issued[5:7]} năm {year}",
+        "",
+        f"{kind.upper():^80}",
+        f"{topic[0].upper() + topic[1:]:^80}",
+        "",
+        f"Căn cứ Luật Ban hành văn bản quy phạm pháp luật ngày 22 tháng 6 năm 2015;",
+        f"Theo đề nghị của Vụ trưởng Vụ Pháp chế, {role} {agency.title()} ban hành {kind} {topic}.",
+        "",
+    ]
+    n_articles = rng.randint(*config.articles)
+    per_chapter = max(1, n_articles // len(_CHAPTERS))
+    for article in range(1, n_articles + 1):
+        if article % per_chapter == 1 or per_chapter == 1:
+            chapter = min((article - 1) // per_chapter, len(_CHAPTERS) - 1)
+            lines += ["", f"{'Chương ' + 'I' * (chapter + 1):^80}", f"{_CHAPTERS[chapter]:^80}", ""]
+        lines.append(f"Điều {article}. {rng.choice(_ARTICLE_TITLES)}")
+        for clause in range(1, rng.randint(*config.clauses) + 1):
+            lines.append(f"{clause}. {_sentence(rng, kind, agency)}")
+            if rng.random() < 0.3:
+                for point in "abc"[: rng.randint(1, 3)]:
+                    lines.append(f"    {point}) {_sentence(rng, kind, agency)}")
+    lines += [
+        "",
+        f"{'Nơi nhận:':<45}{role.upper():^35}",
+        f"{'- Như Điều ' + str(n_articles) + ';':<45}",
+        f"{'- Lưu: VT, PC.':<45}{signer:^35}",
+    ]
+    fields = {
+        "so_hieu": number,
+        "loai_vb": kind,
+        "linh_vuc": rng.choice(_FIELDS),
+        "noi_ban_hanh": agency.title(),
+        "nguoi_ky": signer,
+        "ngay_ban_hanh": issued,
+        "ngay_hieu_luc": _date(rng, min(year + 1, 2025)),
+        "ngay_cong_bao": _date(rng, year),
+        "so_cong_bao": f"{rng.randint(1, 1200)}-{rng.randint(1, 1200)}",
+        "tinh_trang": rng.choice(_STATUSES),
+        "noi_dung": " ".join(lines[8:14]).strip(),
+    }
+    return Document(title=title, text="\n".join(lines), fields=fields)
+
+
+def near_duplicate(rng: random.Random, doc: Document, index: int) -> Document:
+    """Same body as `doc`, another number and some whitespace noise."""
+    old_number = doc.fields["so_hieu"]
+    number = f"{index + 1}{old_number[old_number.index('/'):]}"
+    text = doc.text.replace(old_number, number)
+    text = "\n".join(line + " " * rng.randint(0, 2) for line in text.split("\n"))
+    return Document(title=doc.title.replace(old_number, number), text=text, fields=dict(doc.fields, so_hieu=number),
+                    duplicate_of=doc.title)
+
+
+def make_documents(config: CorpusConfig) -> List[Document]:
+    rng = random.Random(config.seed)
+    docs = []
+    for i in range(config.documents):
+        if docs and rng.random() < config.duplicate_rate:
+            docs.append(near_duplicate(rng, rng.choice(docs), i))
+        else:
+            docs.append(make_document(rng, i, config))
+    return docs
+
+
+def paginate(text: str, title: str, lines_per_page: int) -> List[List[str]]:
+    """Split into pages with the running header / footer pdftotext keeps."""
+    body = text.split("\n")
+    chunks = [body[i:i + lines_per_page] for i in range(0, len(body), lines_per_page)] or [[]]
+    header = f"{'THƯ VIỆN PHÁP LUẬT':<60}{title[:20]}"
+    pages = []
+    for n, chunk in enumerate(chunks, 1):
+        pages.append(([header, ""] if n > 1 else []) + chunk + ["", f"{'Trang ' + str(n) + '/' + str(len(chunks)):>80}"])
+    return pages
+
+
+def render_txt(doc: Document, lines_per_page: int) -> str:
+    return "\f".join("\n".join(page) + "\n" for page in paginate(doc.text, doc.title, lines_per_page))
+
+
+def _pdf_text(line: str) -> str:
+    # Font chuẩn của PDF (Courier, WinAnsi) không có đủ dấu tiếng Việt: bỏ dấu
+    line = unicodedata.normalize("NFD", line.replace("Đ", "D").replace("đ", "d"))
+    line = "".join(c for c in line if not unicodedata.combining(c)).encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Minimal PDF (Courier, one text object per page), readable by pdftotext."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"]
+    kids = []
+    for page in pages:
+        content = "BT /F1 9 Tf 11 TL 36 806 Td\n" + "".join(f"({_pdf_text(line)}) Tj T*\n" for line in page) + "ET"
+        stream = content.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def llm_response(rng: random.Random, doc: Document, malformed_rate: float) -> Tuple[str, str]:
+    """A response for `doc` and its kind: "ok" or the kind of damage applied."""
+    text = json.dumps(doc.fields, ensure_ascii=False, indent=rng.choice([None, 2]))
+    if rng.random() >= malformed_rate:
+        return text, "ok"
+    kind = rng.choice([
+        "fence", "prose", "trailing_comma", "comments", "escapes", "control_chars",
+        "escaped_quotes", "truncated", "double_encoded", "empty", "no_json",
+    ])
+    if kind == "fence":
+        text = f"```json\n{text}\n```"
+    elif kind == "prose":
+        text = f"Dưới đây là thông tin trích xuất từ văn bản:\n{text}\nHy vọng hữu ích."
+    elif kind == "trailing_comma":
+        text = text[:text.rindex("}")].rstrip() + ",\n}"
+    elif kind == "comments":
+        text = text.replace("{", "{\n  // thông tin văn bản", 1)
+    elif kind == "escapes":
+        text = text.replace(doc.fields["so_hieu"], doc.fields["so_hieu"].replace("/", "\\/").replace("-", "\\-"), 1)
+    elif kind == "control_chars":
+        text = text.replace(doc.fields["noi_dung"][:20], doc.fields["noi_dung"][:10] + "\n\t" + doc.fields["noi_dung"][10:20], 1)
+    elif kind == "escaped_quotes":
+        text = json.dumps(doc.fields, ensure_ascii=False).replace('"', '\\"')
+    elif kind == "truncated":
+        text = text[: rng.randint(len(text) // 3, len(text) - 5)]
+    elif kind == "double_encoded":
+        text = json.dumps(text, ensure_ascii=False)
+    elif kind == "empty":
+        text = rng.choice(["", "   ", "null"])
+    elif kind == "no_json":
+        text = "PDF không chứa đủ thông tin để trích xuất."
+    return text, kind
+
+
+def _catalogue_title(rng: random.Random, title: str, fuzzy_rate: float) -> str:
+    """The catalogue spells titles a little differently from the documents."""
+    title = title.replace("/", rng.choice(["/", "_"]))
+    if rng.random() < fuzzy_rate:
+        title = rng.choice([
+            lambda t: t.upper(),
+            lambda t: f"“{t}”",
+            lambda t: t.replace(" ", "  ", 2),
+            lambda t: t.replace("-", "–"),
+            lambda t: t.replace("một số điều", "một số điều,"),
+            lambda t: t[:-1],
+        ])(title)
+    return title
+
+
+def write_corpus(out_dir: str, config: Optional[CorpusConfig] = None) -> dict:
+    """
+    Write the corpus under `out_dir` and return the paths plus a summary
+    (documents, duplicates, malformed responses by kind, ...).
+    """
+    from src.utils.utils import system_prompt, human_prompt
+
+    config = config or CorpusConfig()
+    rng = random.Random(config.seed + 1)
+    docs = make_documents(config)
+    paths = {name: os.path.join(out_dir, name) for name in ("pdf", "txt", "data.csv", "llm_output.json", "urls.json")}
+    os.makedirs(paths["txt"], exist_ok=True)
+    if config.pdf:
+        os.makedirs(paths["pdf"], exist_ok=True)
+
+    # Thứ tự file trong CSV giống make_csv (sắp theo tên) để custom_id khớp đúng dòng
+    docs = sorted(docs, key=lambda d: d.filename + ".txt")
+    for doc in docs:
+        txt = render_txt(doc, config.lines_per_page)
+        with open(os.path.join(paths["txt"], doc.filename + ".txt"), "w", encoding="utf-8") as f:
+            f.write(txt)
+        if config.pdf:
+            write_pdf(os.path.join(paths["pdf"], doc.filename + ".pdf"), paginate(doc.text, doc.title, config.lines_per_page))
+
+    with open(paths["data.csv"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["title", "system", "human", "context"], quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for doc in docs:
+            writer.writerow({"title": doc.filename, "system": system_prompt.strip(), "human": human_prompt,
+                             "context": render_txt(doc, config.lines_per_page).strip()})
+
+    kinds = {}
+    records = []
+    for i, doc in enumerate(docs):
+        text, kind = llm_response(rng, doc, config.malformed_rate)
+        kinds[kind] = kinds.get(kind, 0) + 1
+        records.append({"custom_id": f"req-{i}", "context_response": text})
+    rng.shuffle(records)
+    with open(paths["llm_output.json"], "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+
+    catalogue = [
+        {"title": _catalogue_title(rng, doc.title, config.fuzzy_url_rate),
+         "url": f"https://thuvienphapluat.vn/van-ban/{i}.aspx"}
+        for i, doc in enumerate(docs) if rng.random() >= config.missing_url_rate
+    ]
+    # Danh mục gộp từ nhiều nguồn nên có mục trùng tiêu đề
+    catalogue += [dict(item) for item in catalogue if rng.random() < config.duplicate_rate]
+    rng.shuffle(catalogue)
+    with open(paths["urls.json"], "w", encoding="utf-8") as f:
+        json.dump(catalogue, f, ensure_ascii=False)
+
+    return {
+        "paths": paths,
+        "documents": len(docs),
+        "near_duplicates": sum(d.duplicate_of is not None for d in docs),
+        "txt_bytes": sum(os.path.getsize(os.path.join(paths["txt"], d.filename + ".txt")) for d in docs),
+        "responses": kinds,
+        "catalogue": len(catalogue),
+    }
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    defaults = CorpusConfig()
+    for name, value in asdict(defaults).items():
+        flag = f"--{name.replace('_', '-')}"
+        if isinstance(value, tuple):
+            parser.add_argument(flag, type=int, nargs=2, default=list(value), metavar=("MIN", "MAX"))
+        elif isinstance(value, bool):
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction, default=value)
+        else:
+            parser.add_argument(flag, type=type(value), default=value)
+
+
+def corpus_config_from_args(args) -> CorpusConfig:
+    values = {name: getattr(args, name) for name in asdict(CorpusConfig())}
+    values["articles"], values["clauses"] = tuple(values["articles"]), tuple(values["clauses"])
+    return CorpusConfig(**values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    summary = write_corpus(args.out, corpus_config_from_args(args))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
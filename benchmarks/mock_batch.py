@@ -0,0 +1,224 @@
+"""
+In-process emulator of the files / batches API used by BatchOpenAIProcessor
+(files.create, batches.create, batches.retrieve, files.content), so a batch can run
+end to end without OpenAI or Groq.
+
+    client = MockBatchClient(MockBatchConfig(rows_per_s=5000, fail_rate=0.01, shuffle=True))
+    BatchOpenAIProcessor(client, config).generate_batch_response()
+
+Batches go through validating -> in_progress -> finalizing -> completed (or the
+forced `final_status`) on a background thread. Output lines follow the Batch API
+format; failed requests go to a separate error file, and `shuffle` returns outputs
+out of input order.
+"""
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass
+class MockBatchConfig:
+    validating_s: float = 0.5       # thời gian ở trạng thái validating
+    rows_per_s: float = 0           # tốc độ xử lý request (0 = không giới hạn)
+    finalizing_s: float = 0.5       # thời gian ở trạng thái finalizing
+    fail_rate: float = 0.0          # tỉ lệ request lỗi (ghi vào error file)
+    shuffle: bool = False           # trả output không theo thứ tự input
+    shuffle_window: int = 10000     # xáo trộn trong từng cửa sổ N dòng (giới hạn bộ nhớ)
+    final_status: str = "completed" # "completed", "failed", "expired" hoặc "cancelled"
+    completion_chars: int = 400     # độ dài nội dung trả lời giả lập
+    seed: int = 0
+
+
+class _Object:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__dict__})"
+
+
+class _FileContent:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_to_file(self, file: str):
+        shutil.copyfile(self.path, file)
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    @property
+    def text(self) -> str:
+        return self.read().decode("utf-8")
+
+
+class _Files:
+    def __init__(self, client: "MockBatchClient"):
+        self._client = client
+
+    def create(self, file, purpose: str = "batch"):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        path = os.path.join(self._client.storage_dir, file_id)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file, out, length=1 << 20)
+        self._client._files[file_id] = path
+        return _Object(id=file_id, object="file", bytes=os.path.getsize(path), purpose=purpose,
+                       filename=os.path.basename(getattr(file, "name", file_id)))
+
+    def content(self, file_id: str) -> _FileContent:
+        if file_id not in self._client._files:
+            raise KeyError(f"No such file: {file_id}")
+        return _FileContent(self._client._files[file_id])
+
+
+class _Batches:
+    def __init__(self, client: "MockBatchClient"):
+        self._client = client
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str = "24h", metadata=None):
+        if input_file_id not in self._client._files:
+            raise KeyError(f"No such file: {input_file_id}")
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        state = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self._client._batches[batch_id] = state
+        threading.Thread(target=self._client._run, args=(batch_id,), name=f"mock-{batch_id}", daemon=True).start()
+        return self.retrieve(batch_id)
+
+    def retrieve(self, batch_id: str):
+        with self._client._lock:
+            state = dict(self._client._batches[batch_id])
+        state["request_counts"] = _Object(**state["request_counts"])
+        return _Object(**state)
+
+
+class MockBatchClient:
+    """Drop-in for the `client` argument of BatchOpenAIProcessor."""
+
+    def __init__(self, config: Optional[MockBatchConfig] = None, storage_dir: Optional[str] = None):
+        self.config = config or MockBatchConfig()
+        self.storage_dir = storage_dir or tempfile.mkdtemp(prefix="mock_batch_")
+        os.makedirs(self.storage_dir, exist_ok=True)
+        self.files = _Files(self)
+        self.batches = _Batches(self)
+        self._files: Dict[str, str] = {}
+        self._batches: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+
+    def _set(self, batch_id: str, **fields):
+        with self._lock:
+            self._batches[batch_id].update(fields)
+
+    def _new_file(self) -> tuple:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        path = os.path.join(self.storage_dir, file_id)
+        self._files[file_id] = path
+        return file_id, path
+
+    def _response_line(self, request: dict, failed: bool) -> dict:
+        custom_id = request.get("custom_id")
+        if failed:
+            body = {"error": {"message": "The server had an error processing the request (mock)", "type": "server_error"}}
+            status_code = 500
+        else:
+            prompt = "".join(str(m.get("content", "")) for m in request.get("body", {}).get("messages", []))
+            content = json.dumps({"so_hieu": custom_id, "noi_dung": prompt[: self.config.completion_chars]}, ensure_ascii=False)
+            prompt_tokens = max(1, len(prompt) // 4)
+            completion_tokens = max(1, len(content) // 4)
+            body = {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("body", {}).get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+            status_code = 200
+        return {
+            "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+            "custom_id": custom_id,
+            "response": {"status_code": status_code, "request_id": uuid.uuid4().hex, "body": body},
+            "error": None,
+        }
+
+    def _run(self, batch_id: str):
+        config = self.config
+        with self._lock:
+            input_path = self._files[self._batches[batch_id]["input_file_id"]]
+        time.sleep(config.validating_s)
+
+        if config.final_status != "completed":
+            error_id, error_path = self._new_file()
+            with open(error_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"error": {"code": config.final_status, "message": f"Batch {config.final_status} (mock)"}}) + "\n")
+            self._set(batch_id, status=config.final_status, error_file_id=error_id)
+            return
+
+        self._set(batch_id, status="in_progress")
+        start = time.monotonic()
+        output_id, output_path = self._new_file()
+        error_id, error_path = self._new_file()
+        total = completed = failed = 0
+        window = []
+
+        def flush(out, err):
+            nonlocal completed, failed
+            if config.shuffle:
+                self._rng.shuffle(window)
+            for line in window:
+                if line["response"]["status_code"] == 200:
+                    out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                    completed += 1
+                else:
+                    err.write(json.dumps(line, ensure_ascii=False) + "\n")
+                    failed += 1
+            window.clear()
+
+        with open(input_path, "r", encoding="utf-8") as src, \
+                open(output_path, "w", encoding="utf-8") as out, \
+                open(error_path, "w", encoding="utf-8") as err:
+            for raw in src:
+                if not raw.strip():
+                    continue
+                total += 1
+                window.append(self._response_line(json.loads(raw), self._rng.random() < config.fail_rate))
+                if len(window) >= max(1, config.shuffle_window):
+                    flush(out, err)
+                    self._set(batch_id, request_counts={"total": total, "completed": completed, "failed": failed})
+            flush(out, err)
+
+        if config.rows_per_s:
+            remaining = total / config.rows_per_s - (time.monotonic() - start)
+            if remaining > 0:
+                time.sleep(remaining)
+        self._set(batch_id, status="finalizing", request_counts={"total": total, "completed": completed, "failed": failed})
+        time.sleep(config.finalizing_s)
+        self._set(
+            batch_id,
+            status="completed",
+            output_file_id=output_id if completed else None,
+            error_file_id=error_id if failed else None,
+        )
+
+    def close(self):
+        shutil.rmtree(self.storage_dir, ignore_errors=True)
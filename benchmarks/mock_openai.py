@@ -0,0 +1,152 @@
+"""
+Offline stand-in for an OpenAI-compatible provider: POST /v1/chat/completions
+(streaming and non-streaming) with a configurable latency distribution, token rate
+and 429/500 injection, so /chat can be load-tested without spending quota.
+
+    python -m benchmarks.mock_openai --port 9100 --latency-ms 800 --tokens-per-s 60 --rate-429 0.05
+
+Point a router at it, e.g. DEEPSEEK_BASE_URL=http://127.0.0.1:9100/v1 DEEPSEEK_KEY=mock
+DEEPSEEK_MODEL_NAME=mock-model. GET /stats returns the counters of served responses.
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 500          # trung vị thời gian xử lý trước token đầu tiên
+    latency_sigma: float = 0.5       # độ lệch của phân phối log-normal (0 = cố định)
+    tokens_per_s: float = 80         # tốc độ sinh token (0 = trả ngay)
+    completion_tokens: int = 200     # số token trả lời trung bình (±50%)
+    chunk_tokens: int = 4            # số token mỗi chunk khi stream
+    rate_429: float = 0.0            # tỉ lệ trả 429
+    rate_500: float = 0.0            # tỉ lệ trả 500
+    retry_after: float = 1.0         # giá trị header Retry-After của 429 (giây)
+    seed: int = 0
+
+
+_WORDS = "điều khoản quy định văn bản pháp luật thông tư nghị định hướng dẫn thi hành".split()
+
+
+def _error(status: int, message: str, error_type: str, headers=None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": error_type, "code": status}}, status_code=status, headers=headers)
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="mock-openai")
+    rng = random.Random(config.seed)
+    stats = Counter()
+
+    def first_token_delay() -> float:
+        base = config.latency_ms / 1000
+        return base * rng.lognormvariate(0, config.latency_sigma) if config.latency_sigma else base
+
+    def completion_length(max_tokens) -> int:
+        n = max(1, int(config.completion_tokens * rng.uniform(0.5, 1.5)))
+        return min(n, max_tokens) if max_tokens else n
+
+    def token_delay(tokens: int) -> float:
+        return tokens / config.tokens_per_s if config.tokens_per_s else 0.0
+
+    @app.get("/stats")
+    def get_stats():
+        return {"config": asdict(config), **stats}
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        roll = rng.random()
+        if roll < config.rate_429:
+            stats["429"] += 1
+            return _error(429, "Rate limit reached (mock)", "rate_limit_exceeded", {"Retry-After": f"{config.retry_after:g}"})
+        if roll < config.rate_429 + config.rate_500:
+            stats["500"] += 1
+            return _error(500, "Internal server error (mock)", "server_error")
+
+        model = body.get("model") or "mock-model"
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        n_tokens = completion_length(body.get("max_tokens"))
+        words = [rng.choice(_WORDS) for _ in range(n_tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens, "total_tokens": prompt_tokens + n_tokens}
+        delay = first_token_delay()
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay + token_delay(n_tokens))
+            stats["200"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(delay)
+            yield chunk({"role": "assistant", "content": ""})
+            step = max(1, config.chunk_tokens)
+            for i in range(0, n_tokens, step):
+                part = words[i:i + step]
+                await asyncio.sleep(token_delay(len(part)))
+                yield chunk({"content": (" " if i else "") + " ".join(part)})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+            stats["200"] += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    defaults = MockConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+
+
+def mock_config_from_args(args) -> MockConfig:
+    return MockConfig(**{name: getattr(args, name) for name in asdict(MockConfig())})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(mock_config_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -1,11 +1,26 @@
 import os
-import requests
 import json
 import re
+import random
+import asyncio
+import importlib.util
+from contextlib import nullcontext
+import httpx
 from datasets import load_dataset
 from dotenv import load_dotenv
 from dataclasses import dataclass
 from tqdm import tqdm
+from src.preproccess.compact import compact_text
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Lỗi upstream bị /chat bọc trong body (status "error" hoặc chuỗi "<Error> ...")
+_RETRYABLE_ERROR_RE = re.compile(r"\b(?:429|500|502|503|504)\b|rate.?limit|timeout|timed out|overloaded", re.IGNORECASE)
+
+
+class RetryableError(Exception):
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 @dataclass
@@ -21,6 +36,16 @@ class SingleRequestConfig:
     title_column: str  # title
     system_prompt: str
     output_dir: str
+    compact_context: bool = False  # bỏ header/footer, số trang, khoảng trắng layout trước khi gửi
+    concurrency: int = 8  # số request đồng thời
+    timeout: float = 600
+    max_retries: int = 5
+    read_batch_size: int = 64  # số dòng dataset đọc mỗi lần
+    overwrite: bool = False  # False: bỏ qua title đã có file output (chạy tiếp được)
+    http2: bool = True  # cần h2 (httpx[http2]), không có thì dùng HTTP/1.1
+    mode: str = "remote"  # "remote": gọi /chat qua HTTP; "direct": gọi pipeline ngay trong process
+    priority: str = "bulk"  # xếp sau request /chat của người dùng ("interactive")
+    tenant: str = None  # gửi qua header X-Tenant-Id để chia quota công bằng giữa các job
 
 
 class SingleRequestProcessor:
@@ -34,36 +59,164 @@ class SingleRequestProcessor:
         filename = re.sub(r'[\\/*?:"<>|]', '_', filename)
         return filename.strip()
 
-    def process_all(self, start_idx=0, end_idx=1):
-        for i in tqdm(range(start_idx, end_idx), desc="⏳ Processing requests"):
-            item = self.dataset[i]
-            context = item[self.config.column_name]
-            title = item[self.config.title_column]
-            safe_title = self.safe_filename(title)
-            filename = os.path.join(self.config.output_dir, f"{safe_title}.json")
-
-            full_prompt = f"{self.config.system_prompt.strip()}\n\nContext:\n{context.strip()}"
-            payload = {
-                "chat": full_prompt,
-                "model_name": self.config.model_name,
-                "router_name": self.config.router_name,
-                "config": {
-                    "temperature": self.config.temperature,
-                    "top_p": self.config.top_p,
-                    "max_tokens": self.config.max_tokens,
-                    "stream": False,
-                    "get_thinking": False
-                }
+    def output_path(self, title: str) -> str:
+        return os.path.join(self.config.output_dir, f"{self.safe_filename(title)}.json")
+
+    def iter_rows(self, start_idx: int, end_idx: int):
+        """
+        Yield (index, title, context) reading `read_batch_size` rows at a time and only
+        the two needed columns.
+        """
+        columns = [self.config.title_column, self.config.column_name]
+        dataset = self.dataset.select_columns(columns)
+        end_idx = min(end_idx, len(dataset))
+        for start in range(start_idx, end_idx, self.config.read_batch_size):
+            batch = dataset[start:min(start + self.config.read_batch_size, end_idx)]
+            for offset, (title, context) in enumerate(zip(batch[self.config.title_column], batch[self.config.column_name])):
+                yield start + offset, title, context
+
+    def build_payload(self, context: str) -> dict:
+        full_prompt = f"{self.config.system_prompt.strip()}\n\nContext:\n{context.strip()}"
+        return {
+            "chat": full_prompt,
+            "model_name": self.config.model_name,
+            "router_name": self.config.router_name,
+            "priority": self.config.priority,
+            "config": {
+                "temperature": self.config.temperature,
+                "top_p": self.config.top_p,
+                "max_tokens": self.config.max_tokens,
+                "stream": False,
+                "get_thinking": False
             }
+        }
+
+    def make_client(self):
+        if self.config.mode == "direct":
+            return nullcontext()
+        http2 = self.config.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("⚠️ Chưa cài h2 (pip install httpx[http2]), dùng HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=self.config.concurrency,
+            max_keepalive_connections=self.config.concurrency,
+        )
+        headers = {"X-Tenant-Id": self.config.tenant} if self.config.tenant else None
+        return httpx.AsyncClient(
+            http2=http2, limits=limits, headers=headers, timeout=httpx.Timeout(self.config.timeout, connect=10)
+        )
+
+    async def post(self, client: httpx.AsyncClient, payload: dict) -> dict:
+        response = await client.post(self.config.api_url, json=payload)
+        if response.status_code in RETRY_STATUS:
+            retry_after = response.headers.get("retry-after")
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def call_direct(self, payload: dict) -> dict:
+        """
+        Same as POST /chat but in-process: same settings logic, shared pipeline
+        clients and per-router scheduler, no JSON round trip of the context.
+        """
+        from src.pipeline.service import chat
 
+        return await asyncio.wait_for(chat(**payload, tenant=self.config.tenant), self.config.timeout)
+
+    async def send_with_retry(self, client, payload: dict) -> dict:
+        """
+        Send one payload (HTTP or direct), retrying 429/5xx responses, transport
+        errors and rate-limit/timeout errors reported in the body, with exponential
+        backoff (or the server's Retry-After).
+        """
+        for attempt in range(self.config.max_retries + 1):
             try:
-                response = requests.post(self.config.api_url, json=payload)
-                result = response.json()
-                with open(filename, "w", encoding="utf-8") as f:
-                    json.dump(result, f, indent=2, ensure_ascii=False)
-                print(f"[{i}] Saved to: {filename}")
-            except Exception as e:
-                print(f"[{i}] Error while saving {filename}: {e}")
+                if self.config.mode == "direct":
+                    result = await self.call_direct(payload)
+                else:
+                    result = await self.post(client, payload)
+                message = str(result.get("response", "")) if isinstance(result, dict) else ""
+                failed = isinstance(result, dict) and (result.get("status") == "error" or message.startswith("<Error>"))
+                if failed and _RETRYABLE_ERROR_RE.search(message):
+                    raise RetryableError(message[:200])
+                if failed:
+                    raise ValueError(message[:500])
+                return result
+            except (RetryableError, httpx.TransportError, asyncio.TimeoutError) as e:
+                if attempt == self.config.max_retries:
+                    raise
+                delay = getattr(e, "retry_after", None) or min(60, 2 ** attempt + random.random())
+                tqdm.write(f"⚠️ Lần {attempt + 1} lỗi ({type(e).__name__}: {e}), thử lại sau {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def save_result(self, filename: str, result: dict):
+        # Ghi ra file tạm rồi đổi tên: file output chỉ tồn tại khi đã ghi xong
+        tmp_path = filename + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, filename)
+
+    async def process_one(self, client, i: int, title: str, context: str):
+        filename = self.output_path(title)
+        try:
+            if self.config.compact_context:
+                context, stats = compact_text(context)
+                tqdm.write(f"[{i}] 🗜️ {stats.tokens_in} → {stats.tokens_out} token")
+            result = await self.send_with_retry(client, self.build_payload(context))
+            await asyncio.to_thread(self.save_result, filename, result)
+            return i, None
+        except Exception as e:
+            return i, f"{type(e).__name__}: {e}"
+
+    async def process_all_async(self, start_idx=0, end_idx=1) -> dict:
+        """
+        Send rows [start_idx, end_idx) with at most `concurrency` requests in flight.
+        Titles whose output already exists are skipped unless `overwrite`; failed
+        rows are not written, so running again resumes where it stopped.
+        Returns:
+            dict: {"sent", "skipped", "failed": {row index: error}}
+        """
+        concurrency = max(1, self.config.concurrency)
+        skipped, sent, failed = 0, 0, {}
+        pending = set()
+        progress = tqdm(total=max(0, min(end_idx, len(self.dataset)) - start_idx), desc="⏳ Processing requests")
+
+        def collect(done):
+            nonlocal sent
+            for task in done:
+                i, error = task.result()
+                if error:
+                    failed[i] = error
+                    tqdm.write(f"[{i}] ❌ {error}")
+                else:
+                    sent += 1
+                progress.update(1)
+            progress.set_postfix(failed=len(failed), skipped=skipped)
+
+        async with self.make_client() as client:
+            for i, title, context in self.iter_rows(start_idx, end_idx):
+                if not self.config.overwrite and os.path.exists(self.output_path(title)):
+                    skipped += 1
+                    progress.update(1)
+                    continue
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                pending.add(asyncio.create_task(self.process_one(client, i, title, context)))
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                collect(done)
+        progress.close()
+
+        print(f"✅ Đã gửi {sent}, bỏ qua {skipped} (đã có output), lỗi {len(failed)}")
+        return {"sent": sent, "skipped": skipped, "failed": failed}
+
+    def process_all(self, start_idx=0, end_idx=1):
+        return asyncio.run(self.process_all_async(start_idx, end_idx))
 
 
 if __name__ == "__main__":
@@ -116,7 +269,8 @@ Cấu trúc JSON yêu cầu:
 }
 "Hãy trích xuất thông tin theo yêu cầu."
 """,
-        output_dir="./law_outputs"
+        output_dir="./law_outputs",
+        mode="remote",  # "direct": gọi pipeline ngay trong process, không qua API
     )
 
     processor = SingleRequestProcessor(config)
@@ -1,19 +1,21 @@
-from ..pipeline.gemini_endpoint.chat import GeminiChatPipeline
-from ..pipeline.openai_endpoint.chat import OpenAIChatPipeline
-from ..pipeline.openai_endpoint.chat import GroqChatPipeline
-from src.pipeline.batch_processor.batch_groq_processor import BatchOpenAIProcessor, BatchOpenAIConfig, Groq
+# Pipelines, generators and provider SDKs are imported lazily (see pipeline.registry and the
+# endpoint bodies) to keep the API cold start cheap.
+from ..pipeline.registry import ROUTER_MAP, get_pipeline_cls
+from ..pipeline.service import chat as run_chat
 from ..utils.utils import get_all_env_values
 from ..utils.loggers import logger
-from ..utils.handle_response import handle_response
+from ..utils.metrics import render_metrics
+from ..utils.loop_watchdog import install_watchdog
 from ..pipeline.base_chat import BaseSettings, BaseConfig
-from ..generate.pdf2json import generate_json
-from ..generate.pdf2txt import convert_pdf_to_text
-from tqdm import tqdm
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 import os
+import hmac
+import hashlib
+import asyncio
 from dotenv import load_dotenv
 # load_dotenv()
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # -> /home/truongnn/trung/project/LOHA
@@ -48,16 +50,27 @@ def setup_logger():
 
 logger = setup_logger()
 app = FastAPI()
+# Log stack khi một handler giữ event loop quá LOOP_WATCHDOG_THRESHOLD_MS (mặc định 250 ms)
+install_watchdog(app)
 
 class FolderRequest(BaseModel):
     input_folder: str
     output_folder: str
+
+class JsonFolderRequest(FolderRequest):
+    concurrency: int = 8
+    timeout: float = 120
+    max_retries: int = 3
+    use_cache: bool = True
+    clusters_csv: str = None
+    compact: bool = False
     
 class ChatRequest(BaseModel):
     chat: str
     model_name: str
     router_name: str
     config: dict | None = None
+    priority: str = "interactive"  # "bulk" cho job hàng loạt (send_request.py)
 
 DEFAULT_SYSTEM_PROMPT = r"""
 Bạn là một chuyên gia pháp luật có nhiệm vụ **trích xuất thông tin có cấu trúc** từ văn bản pháp luật đã được số hóa (OCR hoặc định dạng văn bản thường).
@@ -102,27 +115,22 @@ class BatchRequest(BaseModel):
     max_tokens: int
     column_name_list: str
     system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    compact_context: bool = False
 
     
-PIPELINE_MAP = {
-    "gemini": GeminiChatPipeline,      
-    "groq": GroqChatPipeline,        
-    "openai": OpenAIChatPipeline,
-    "openrouter": OpenAIChatPipeline,
-    "deepseek": OpenAIChatPipeline,
-    "nvidia": OpenAIChatPipeline,
-}
-
-ROUTER_MAP = {
-    'openai': 'OPENAI',
-    'openrouter': 'OPENROUTER',
-    'deepseek': 'DEEPSEEK',
-    'groq': 'GROQ',
-    'nvidia': 'NVIDIA',
-    'gemini': 'GEMINI'}
+def request_tenant(
+    x_tenant_id: str | None = Header(default=None),
+    x_api_key: str | None = Header(default=None),
+) -> str | None:
+    """Tenant used for fair queuing: X-Tenant-Id, else a hash of X-API-Key (never the key itself)."""
+    if x_tenant_id:
+        return x_tenant_id.strip()[:64]
+    if x_api_key:
+        return "key:" + hashlib.sha256(x_api_key.encode()).hexdigest()[:12]
+    return None
 
 @app.post("/chat")
-async def chat_with_model(req: ChatRequest):
+async def chat_with_model(req: ChatRequest, tenant: str | None = Depends(request_tenant)):
 
     """
     Args:
@@ -130,46 +138,66 @@ async def chat_with_model(req: ChatRequest):
         chat (str): The chat message to send to the model.
         model_name (str): The name of the model to use.
         router_name (str): The name of the router to use.
+        priority (str): "interactive" (default) or "bulk"; interactive requests are
+            served first and keep a reserved share of the router's quota.
     Returns:
         response (dict): The response from the model.
         status (str): The status of the response.
     """
+    # Cùng logic với chế độ direct của send_request.py (src/pipeline/service.py):
+    # pipeline/client được dùng lại, có scheduler (ưu tiên + rate limit) theo router
+    return await run_chat(req.chat, req.model_name, req.router_name, req.config, priority=req.priority, tenant=tenant)
+    
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request counts, latency/TTFT histograms, token usage and cache/limiter state in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# ---- debug (chỉ bật khi có DEBUG_ADMIN_TOKEN, gửi kèm header X-Admin-Token) ----------
+
+MAX_PROFILE_SECONDS = 60
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    expected = os.getenv("DEBUG_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def debug_profile(seconds: float = 10, interval_ms: float = 5, idle: bool = False):
+    """
+    Sample the stacks of every thread (event loop included) for `seconds` and return
+    them in folded format, e.g. `curl ... > out.folded && flamegraph.pl out.folded > out.svg`
+    or open the file in speedscope. Waiting threads are skipped unless `idle`.
+    """
+    from ..utils.profiling import render_folded, sample_stacks
+
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
     try:
-        envs = get_all_env_values()
-        model_name = req.model_name.lower()
-        router_name = req.router_name.lower()
-        pipeline_cls = PIPELINE_MAP.get(router_name)
-        if not pipeline_cls:
-            raise Exception("Model not supported")
-
-        prefix = ROUTER_MAP.get(router_name)
-        if not prefix:
-            raise Exception("Router not supported")
-
-        api_key = envs.get(f"{prefix}_KEY")
-        model = envs.get(f"{prefix}_MODEL_NAME", model_name)
-        base_url = envs.get(f"{prefix}_BASE_URL")
-        settings = BaseSettings(
-            model_name=model,
-            base_url=base_url,
-            api_key=api_key
-        )
-        user_config = req.config or {}
-        config = BaseConfig(
-            temperature=user_config.get("temperature", 0.6),
-            top_p=user_config.get("top_p", 0.95),
-            max_tokens=user_config.get("max_tokens", 4096),
-            stream=user_config.get("stream", False),
-            get_thinking=user_config.get("get_thinking", False),
-        )
+        stacks = await asyncio.to_thread(sample_stacks, seconds, max(interval_ms, 1) / 1000, idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(render_folded(stacks))
 
-        pipeline = pipeline_cls(settings, config)
 
-        response = await pipeline.send_messages_async(req.chat)
-        return handle_response({"response": response}, "success")
-    except Exception as e:
-        return handle_response({"response": f"Error: Got {e}"}, "error")
-    
+@app.get("/debug/tracemalloc", dependencies=[Depends(require_admin)])
+def debug_tracemalloc(limit: int = 25, key_type: str = "lineno", reset: bool = True, stop: bool = False):
+    """
+    Allocation growth since the previous call. The first call starts tracemalloc
+    (which slows allocations down) and takes the baseline; `stop=true` turns it off.
+    """
+    from ..utils.profiling import allocation_tracker
+
+    if stop:
+        return allocation_tracker.stop()
+    if key_type not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=422, detail="key_type must be lineno, filename or traceback")
+    return allocation_tracker.diff(limit=max(1, limit), key_type=key_type, reset=reset)
+
 
 @app.get("/check_model_status")
 async def check_model_status():
@@ -185,7 +213,7 @@ async def check_model_status():
             base_url = envs.get(f"{prefix}_BASE_URL")
 
         
-            pipeline_cls = PIPELINE_MAP.get(router_name)
+            pipeline_cls = get_pipeline_cls(router_name)
             if not pipeline_cls:
                 status_dict[router_name] = "pending: no pipeline"
                 continue
@@ -223,11 +251,18 @@ def generate_txt_folders(request: FolderRequest):
     if not os.path.exists(output_txt_dir):
         os.makedirs(output_txt_dir, exist_ok=True)
 
+    from ..generate.pdf2txt import convert_pdf_to_text
     convert_pdf_to_text(input_pdf_dir, output_txt_dir)
     return {"message": f"Converted all PDFs in {input_pdf_dir} to TXT in {output_txt_dir}"}
 
 @app.post("/generate_json")
-def generate_json_folders(request: FolderRequest):
+async def generate_json_folders(request: JsonFolderRequest, tenant: str | None = Depends(request_tenant)):
+    """
+    Convert every TXT in `input_folder` to JSON with at most `concurrency` Gemini calls
+    in flight. Each file gets `timeout` seconds per attempt and `max_retries` retries;
+    files that still fail are listed in the response instead of aborting the run.
+    Gemini calls are queued as bulk work, behind interactive /chat requests.
+    """
     input_txt_dir = request.input_folder
     output_json_dir = request.output_folder
 
@@ -236,17 +271,29 @@ def generate_json_folders(request: FolderRequest):
     if not os.path.exists(output_json_dir):
         os.makedirs(output_json_dir, exist_ok=True)
 
-    txt_files = [file for file in os.listdir(input_txt_dir) if file.endswith(".txt")]
-    
-    for file in tqdm(txt_files, desc="Converting TXT to JSON"):
-        input_txt_path = os.path.join(input_txt_dir, file)
-        generate_json(input_txt_path, output_json_dir)
-    return {"message": f"Converted all TXTs in {input_txt_dir} to JSON in {output_json_dir}"}
+    from ..generate.pdf2json import generate_json_folder
+    summary = await generate_json_folder(
+        input_txt_dir,
+        output_json_dir,
+        concurrency=max(1, request.concurrency),
+        timeout=request.timeout,
+        max_retries=max(0, request.max_retries),
+        use_cache=request.use_cache,
+        clusters_csv=request.clusters_csv,
+        compact=request.compact,
+        tenant=tenant,
+    )
+    logger.info(f"/generate_json {input_txt_dir}: {summary['succeeded']}/{summary['total']} succeeded")
+    return {
+        "message": f"Converted {summary['succeeded']}/{summary['total']} TXTs in {input_txt_dir} to JSON in {output_json_dir}",
+        **summary,
+    }
 
 @app.post("/generate_batch")
 async def generate_batch(req: BatchRequest):
     try:
-        
+        from ..pipeline.batch_processor.batch_groq_processor import BatchOpenAIProcessor, BatchOpenAIConfig, Groq
+
         client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         system_prompt = req.system_prompt or DEFAULT_SYSTEM_PROMPT
         config = BatchOpenAIConfig(
@@ -258,12 +305,14 @@ async def generate_batch(req: BatchRequest):
             top_p=req.top_p,
             max_tokens=req.max_tokens,
             column_name_list=req.column_name_list.split(","),
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            compact_context=req.compact_context,
         )
         
         logger.info(f"Starting batch generation with config: {config}")
-        processor = BatchOpenAIProcessor(client, config)
-        processor.generate_batch_response()
+        # Tải dataset và poll batch (time.sleep) đều là code đồng bộ: chạy ngoài event loop
+        processor = await asyncio.to_thread(BatchOpenAIProcessor, client, config)
+        await asyncio.to_thread(processor.generate_batch_response)
         return print("status: completed")
     
     except ValueError as ve:
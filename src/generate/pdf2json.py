@@ -1,9 +1,13 @@
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
+from functools import lru_cache
 from src.utils.utils import get_filename_without_ext
 import getpass
 import os
+import random
+import asyncio
+from tqdm import tqdm
+from src.utils.loggers import logger
+from src.utils.tracing import current_span, span
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=".env")
@@ -11,8 +15,7 @@ load_dotenv(dotenv_path=".env")
 if "GOOGLE_API_KEY" not in os.environ:
     os.getenv("GOOGLE_API_KEY")
     
-SYSTEM_PROMPT_LAW_EXTRACTION = ChatPromptTemplate.from_messages([
-    ("system", r"""
+LAW_EXTRACTION_SYSTEM_TEXT = r"""
 Bạn là một chuyên gia pháp luật có nhiệm vụ **trích xuất thông tin có cấu trúc** từ văn bản pháp luật đã được số hóa (OCR hoặc định dạng văn bản thường).
 
 Yêu cầu:
@@ -54,27 +57,97 @@ Yêu cầu:
   "vb_duoc_can_cu": ["..."],                // Văn bản được căn cứ bởi
   "vb_lien_quan_cung_noi_dung": ["..."]     // Các văn bản liên quan nội dung
 }}
-"""),
-    ("human", "Context:\n{context}\n\nQuestion:\nHãy trích xuất thông tin theo yêu cầu.")
-])
+"""
+LAW_EXTRACTION_HUMAN_TEXT = "Context:\n{context}\n\nQuestion:\nHãy trích xuất thông tin theo yêu cầu."
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0.7,
-    max_tokens=32000,
-    timeout=30
-)
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+TXT2JSON_STAGE_VERSION = 1
+
+@lru_cache(maxsize=None)
+def get_chain():
+    """
+    Build the prompt | Gemini chain on first use, so importing this module does not
+    pull in langchain or create a client.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", LAW_EXTRACTION_SYSTEM_TEXT),
+        ("human", LAW_EXTRACTION_HUMAN_TEXT)
+    ])
+    llm = ChatGoogleGenerativeAI(
+        model=GEMINI_MODEL_NAME,
+        temperature=0.7,
+        max_tokens=32000,
+        timeout=30
+    )
+    return prompt | llm
 
 def process_txt_with_gemini(text_data: str):
-    chain = SYSTEM_PROMPT_LAW_EXTRACTION | llm
+    chain = get_chain()
     response = chain.invoke({"context": text_data})
     return response.content
 
-def generate_json(in_txt: str, output_dir: str):
+async def process_txt_with_gemini_async(text_data: str):
+    chain = get_chain()
+    response = await chain.ainvoke({"context": text_data})
+    return response.content
+
+def txt2json_stage_key(compact: bool = False):
+    from src.utils.artifact_store import stage_key, sha256_text
+
+    params = {
+        "model": GEMINI_MODEL_NAME,
+        "prompt": sha256_text(LAW_EXTRACTION_SYSTEM_TEXT + LAW_EXTRACTION_HUMAN_TEXT),
+    }
+    if compact:
+        from src.preproccess.compact import COMPACT_STAGE_VERSION
+
+        params["compact"] = COMPACT_STAGE_VERSION
+    return stage_key("txt2json", TXT2JSON_STAGE_VERSION, params)
+
+def _reuse_cached_json(store, key, input_hash, base_name, output_dir):
+    cached = store.get(key, input_hash)
+    if cached is None:
+        return None
+    # Giữ nguyên phân loại thành công / fail của lần chạy trước
+    if os.path.basename(os.path.dirname(cached)) == "fail":
+        output_dir = os.path.join(output_dir, "fail")
+    out_json = os.path.join(output_dir, f"{base_name}.json")
+    store.reuse(key, input_hash, out_json)
+    return out_json
+
+def _prepare_input(in_txt: str, output_dir: str, use_cache: bool, compact: bool = False):
+    """
+    With `compact`, layout boilerplate is stripped (src/preproccess/compact.py)
+    before the text is sent.
+    Returns:
+        tuple: (cached output path or None, raw text or None, store, stage key, input hash)
+    """
+    store, key, input_hash = None, None, None
+    if use_cache:
+        from src.utils.artifact_store import get_artifact_store
+
+        store = get_artifact_store()
+        key = txt2json_stage_key(compact)
+        input_hash = store.hash_file(in_txt)
+        out_json = _reuse_cached_json(store, key, input_hash, get_filename_without_ext(in_txt), output_dir)
+        if out_json:
+            current_span().set_attribute("cached", True)
+            return out_json, None, store, key, input_hash
+
     with open(in_txt, 'r', encoding='utf-8') as f:
         raw_text = f.read()
-        
-    formatted_data = process_txt_with_gemini(raw_text)
+    if compact:
+        from src.preproccess.compact import compact_text
+
+        raw_text, stats = compact_text(raw_text)
+        current_span().set_attributes(tokens_in=stats.tokens_in, tokens_out=stats.tokens_out)
+        logger.info(f"🗜️ {os.path.basename(in_txt)}: {stats.tokens_in} → {stats.tokens_out} token ({stats.saved_ratio:.1%} tiết kiệm)")
+    return None, raw_text, store, key, input_hash
+
+def _save_output(formatted_data: str, in_txt: str, output_dir: str, store, key, input_hash):
     base_name = get_filename_without_ext(in_txt)
 
     # Kiểm tra nội dung trả về có phải chuỗi cảnh báo không
@@ -91,8 +164,141 @@ def generate_json(in_txt: str, output_dir: str):
 
     with open(out_json, 'w', encoding='utf-8') as f:
         f.write(formatted_data)
-        
+
+    if store is not None:
+        store.put(key, input_hash, out_json)
+    current_span().set_attributes(bytes_out=os.path.getsize(out_json), extracted=target_dir == output_dir)
+    return out_json
+
+def _document_span(in_txt: str):
+    return span("txt2json.document", doc_id=get_filename_without_ext(in_txt), bytes_in=os.path.getsize(in_txt))
+
+def generate_json(in_txt: str, output_dir: str, use_cache: bool = True, compact: bool = False):
+    with _document_span(in_txt):
+        cached, raw_text, store, key, input_hash = _prepare_input(in_txt, output_dir, use_cache, compact)
+        if cached:
+            print(f"♻️ Dùng lại JSON đã có: {cached}")
+            return cached
+
+        with span("txt2json.llm"):
+            formatted_data = process_txt_with_gemini(raw_text)
+        out_json = _save_output(formatted_data, in_txt, output_dir, store, key, input_hash)
     print(f"Đã lưu JSON vào: {out_json}")
+    return out_json
+
+async def generate_json_async(
+    in_txt: str,
+    output_dir: str,
+    semaphore: asyncio.Semaphore,
+    timeout: float = 120,
+    max_retries: int = 3,
+    use_cache: bool = True,
+    compact: bool = False,
+    tenant: str = None,
+):
+    """
+    Async variant of generate_json: at most `semaphore` calls are in flight, each
+    attempt is bounded by `timeout` and retried with exponential backoff. Calls go
+    through the "gemini" router's scheduler as bulk work of `tenant`, behind
+    interactive /chat traffic.
+    Returns:
+        str: Path of the saved JSON.
+    Raises:
+        Exception: The last error once all retries are used up.
+    """
+    with _document_span(in_txt) as doc:
+        cached, raw_text, store, key, input_hash = await asyncio.to_thread(_prepare_input, in_txt, output_dir, use_cache, compact)
+        if cached:
+            return cached
+
+        from src.pipeline.scheduler import BULK
+        from src.pipeline.service import get_limiter
+
+        for attempt in range(max_retries + 1):
+            doc.set_attribute("attempts", attempt + 1)
+            try:
+                async with semaphore, get_limiter("gemini").slot(BULK, tenant):
+                    with span("txt2json.llm"):
+                        formatted_data = await asyncio.wait_for(process_txt_with_gemini_async(raw_text), timeout)
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                delay = min(60, 2 ** attempt + random.random())
+                logger.warning(f"⚠️ {os.path.basename(in_txt)}: lần {attempt + 1} lỗi ({type(e).__name__}: {e}), thử lại sau {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        return await asyncio.to_thread(_save_output, formatted_data, in_txt, output_dir, store, key, input_hash)
+
+async def generate_json_folder(
+    input_txt_dir: str,
+    output_json_dir: str,
+    concurrency: int = 8,
+    timeout: float = 120,
+    max_retries: int = 3,
+    use_cache: bool = True,
+    clusters_csv: str = None,
+    compact: bool = False,
+    tenant: str = None,
+):
+    """
+    Convert every TXT in a folder to JSON with bounded concurrency. Failures are
+    logged and collected instead of stopping the run. With `clusters_csv` (output of
+    src.preproccess.dedup), files that are known near-duplicates of another file are
+    skipped; files missing from the CSV (e.g. added after dedup ran) are still sent.
+    Returns:
+        dict: {"total", "succeeded", "failed": {file name: error}}
+    """
+    txt_files = [file for file in os.listdir(input_txt_dir) if file.endswith(".txt")]
+    if clusters_csv:
+        from src.preproccess.dedup import load_duplicates
+
+        # dedup_folder ghi tên file (.txt), dedup_csv ghi title (= tên file bỏ đuôi, như make_csv)
+        duplicates = {key if key.endswith(".txt") else f"{key}.txt" for key in load_duplicates(clusters_csv)}
+        skipped = len(txt_files)
+        txt_files = [file for file in txt_files if file not in duplicates]
+        skipped -= len(txt_files)
+        logger.info(f"♻️ Bỏ qua {skipped} văn bản gần trùng (chỉ sinh cho đại diện của cụm)")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(file):
+        try:
+            await generate_json_async(
+                os.path.join(input_txt_dir, file), output_json_dir, semaphore, timeout, max_retries, use_cache, compact,
+                tenant,
+            )
+            return file, None
+        except Exception as e:
+            return file, f"{type(e).__name__}: {e}"
+
+    failed = {}
+    with span("txt2json", documents=len(txt_files), concurrency=concurrency) as stage:
+        progress = tqdm(total=len(txt_files), desc="Converting TXT to JSON")
+
+        def collect(done):
+            for task in done:
+                file, error = task.result()
+                if error:
+                    failed[file] = error
+                    logger.error(f"❌ {file}: {error}")
+                progress.update(1)
+            progress.set_postfix(failed=len(failed))
+
+        # Chỉ tạo tối đa `concurrency` task cùng lúc: file chỉ được đọc (và compact)
+        # khi sắp gửi, không nạp cả thư mục vào bộ nhớ ngay từ đầu
+        pending = set()
+        for file in txt_files:
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            pending.add(asyncio.create_task(run_one(file)))
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            collect(done)
+        progress.close()
+        stage.set_attribute("failed", len(failed))
+
+    return {"total": len(txt_files), "succeeded": len(txt_files) - len(failed), "failed": failed}
     
 # if __name__=='__main__':
 #     generate_json('/home/truongnn/trung/project/synthetic_data/data/input/txt/Báo cáo 191_BC-BTTTT năm 2024 đánh giá tình hình hoạt động của cơ sở truyền thanh - truyền hình cấp huyện do Bộ Thông tin và Truyền thông ban hành.txt', '/home/truongnn/trung/project/synthetic_data/data/output')
\ No newline at end of file
@@ -1,10 +1,11 @@
 import os
+import time
+import queue
 import argparse
 import logging
 import warnings
 from tqdm import tqdm
-from multiprocessing import Process, Queue
-from markitdown import MarkItDown
+from multiprocessing import get_context
 
 # Suppress pdfminer warnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -12,51 +13,238 @@ logging.getLogger("pdfminer").setLevel(logging.ERROR)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Convert single file in subprocess (to enable timeout)
-def convert_single_file(input_path, queue):
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+
+
+def convert_single_file(md, input_path, output_path):
+    """
+    Convert one PDF with an already initialized MarkItDown instance and write the
+    markdown straight to disk, so only a small status tuple has to cross processes.
+    Returns:
+        tuple: (status, message)
+    """
     try:
-        md = MarkItDown(enable_plugins=False)
         result = md.convert(input_path)
         content = getattr(result, "markdown_content", None) or result.text_content
-        queue.put(content)
     except Exception as e:
-        queue.put(f"__ERROR__: {e}")
+        return STATUS_ERROR, str(e)
 
-def convert_folder(input_dir, output_dir, timeout_sec=60):
-    os.makedirs(output_dir, exist_ok=True)
-    pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
-    if not pdf_files:
-        logger.warning("❌ No PDF files found.")
-        return
+    if not content or not content.strip():
+        return STATUS_EMPTY, ""
+
+    tmp_path = output_path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, output_path)
+    return STATUS_OK, ""
+
+
+def _worker_loop(task_queue, result_queue, max_tasks):
+    """
+    Long-lived worker: builds MarkItDown once, then handles up to `max_tasks` files
+    before exiting so the parent can replace it with a fresh process.
+    """
+    warnings.filterwarnings("ignore", category=UserWarning)
+    logging.getLogger("pdfminer").setLevel(logging.ERROR)
+    from markitdown import MarkItDown
 
-    for i, file_name in enumerate(tqdm(pdf_files, desc="Converting PDFs"), start=1):
-        input_path = os.path.join(input_dir, file_name)
-        output_filename = os.path.splitext(file_name)[0] + ".md"
-        output_path = os.path.join(output_dir, output_filename)
+    md = MarkItDown(enable_plugins=False)
+    done = 0
+    while max_tasks is None or done < max_tasks:
+        task = task_queue.get()
+        if task is None:
+            break
+        file_name, input_path, output_path = task
+        status, message = convert_single_file(md, input_path, output_path)
+        result_queue.put((os.getpid(), file_name, status, message))
+        done += 1
 
-        queue = Queue()
-        process = Process(target=convert_single_file, args=(input_path, queue))
+
+class MarkItDownPool:
+    """
+    Pool of persistent MarkItDown workers.
+
+    Each worker owns a private task queue and receives one file at a time, so the
+    parent always knows which file a worker is busy with and since when. A worker
+    stuck past `timeout_sec` is terminated and replaced; a worker that reached
+    `max_tasks_per_worker` exits on its own and is replaced as well.
+
+    Args:
+        num_workers (int): Number of worker processes.
+        timeout_sec (float): Per-file timeout before the worker is killed.
+        max_tasks_per_worker (int | None): Recycle a worker after this many files.
+    """
+
+    def __init__(self, num_workers=None, timeout_sec=60, max_tasks_per_worker=200):
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout_sec = timeout_sec
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._ctx = get_context("spawn")
+        self._result_queue = self._ctx.Queue()
+        self._workers = {}  # pid -> dict(process, tasks, task, started, handled)
+
+    def _spawn(self):
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_loop,
+            args=(task_queue, self._result_queue, self.max_tasks_per_worker),
+            daemon=True,
+        )
         process.start()
-        process.join(timeout=timeout_sec)
+        self._workers[process.pid] = {
+            "process": process,
+            "tasks": task_queue,
+            "task": None,
+            "started": None,
+            "handled": 0,
+        }
 
-        if process.is_alive():
-            process.terminate()
-            logger.warning(f"⏱️ Timeout after {timeout_sec}s: {file_name}")
-            continue
+    def _retire(self, pid, kill=False):
+        worker = self._workers.pop(pid)
+        if kill and worker["process"].is_alive():
+            worker["process"].terminate()
+        worker["process"].join(timeout=5)
+
+    def _assign(self, worker, task):
+        worker["task"] = task
+        worker["started"] = time.monotonic()
+        worker["handled"] += 1
+        worker["tasks"].put(task)
+
+    def _accept(self, result):
+        """Match a (pid, file_name, status, message) result to its worker; None if stale."""
+        pid, file_name, status, message = result
+        worker = self._workers.get(pid)
+        # Late results from a worker already killed for a timeout were reported
+        if worker is not None and worker["task"] and worker["task"][0] == file_name:
+            worker["task"] = None
+            worker["started"] = None
+            return file_name, status, message
+        return None
 
-        content = queue.get()
-        if isinstance(content, str) and content.startswith("__ERROR__"):
-            logger.error(f"❌ Error processing {file_name}: {content.replace('__ERROR__:', '').strip()}")
-            continue
+    def _drain_results(self):
+        while True:
+            try:
+                done = self._accept(self._result_queue.get_nowait())
+            except queue.Empty:
+                return
+            if done:
+                yield done
 
-        if not content.strip():
+    def map(self, tasks):
+        """
+        Run (file_name, input_path, output_path) tasks through the pool.
+        Yields:
+            tuple: (file_name, status, message) as soon as each file finishes.
+        """
+        pending = list(reversed(tasks))
+        for _ in range(min(self.num_workers, len(pending))):
+            self._spawn()
+
+        try:
+            while pending or any(w["task"] for w in self._workers.values()):
+                # Hand out work to idle workers, recycling those that used up their quota
+                for pid, worker in list(self._workers.items()):
+                    if worker["task"] is not None or not pending:
+                        continue
+                    if self.max_tasks_per_worker and worker["handled"] >= self.max_tasks_per_worker:
+                        self._retire(pid)
+                        self._spawn()
+                        continue
+                    self._assign(worker, pending.pop())
+
+                try:
+                    done = self._accept(self._result_queue.get(timeout=0.5))
+                    if done:
+                        yield done
+                except queue.Empty:
+                    pass
+
+                # Kill hung workers and dead workers, then refill the pool
+                now = time.monotonic()
+                for pid, worker in list(self._workers.items()):
+                    if worker["task"] is not None and not worker["process"].is_alive():
+                        # Worker có thể đã gửi kết quả cuối rồi thoát (recycle) ngay sau lần
+                        # get() ở trên: đọc nốt queue trước khi coi là "worker died"
+                        yield from self._drain_results()
+                    task = worker["task"]
+                    if task is None:
+                        if not worker["process"].is_alive():
+                            self._retire(pid)
+                            if pending:
+                                self._spawn()
+                        continue
+                    timed_out = now - worker["started"] > self.timeout_sec
+                    if timed_out or not worker["process"].is_alive():
+                        self._retire(pid, kill=True)
+                        if timed_out:
+                            yield task[0], STATUS_TIMEOUT, f"{self.timeout_sec}s"
+                        else:
+                            yield task[0], STATUS_ERROR, "worker died"
+                        if pending:
+                            self._spawn()
+        finally:
+            self.close()
+
+    def close(self):
+        for pid, worker in list(self._workers.items()):
+            if worker["process"].is_alive():
+                worker["tasks"].put(None)
+        for pid, worker in list(self._workers.items()):
+            worker["process"].join(timeout=1)
+            self._retire(pid, kill=True)
+
+
+def convert_files(pdf_paths, output_dir, timeout_sec=60, num_workers=None, max_tasks_per_worker=200):
+    """
+    Convert a list of PDF paths to markdown files in `output_dir`.
+    Returns:
+        dict: file name -> status (ok / empty / error / timeout).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for input_path in pdf_paths:
+        file_name = os.path.basename(input_path)
+        output_path = os.path.join(output_dir, os.path.splitext(file_name)[0] + ".md")
+        tasks.append((file_name, input_path, output_path))
+
+    statuses = {}
+    if not tasks:
+        return statuses
+
+    pool = MarkItDownPool(num_workers, timeout_sec, max_tasks_per_worker)
+    for file_name, status, message in tqdm(pool.map(tasks), total=len(tasks), desc="Converting PDFs"):
+        statuses[file_name] = status
+        if status == STATUS_OK:
+            logger.info(f"✅ Saved: {os.path.splitext(file_name)[0]}.md")
+        elif status == STATUS_TIMEOUT:
+            logger.warning(f"⏱️ Timeout after {timeout_sec}s: {file_name}")
+        elif status == STATUS_EMPTY:
             logger.warning(f"⚠️ Empty content extracted from: {file_name}")
-            continue
+        else:
+            logger.error(f"❌ Error processing {file_name}: {message}")
+    return statuses
+
+
+def convert_folder(input_dir, output_dir, timeout_sec=60, num_workers=None, max_tasks_per_worker=200):
+    pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
+    if not pdf_files:
+        logger.warning("❌ No PDF files found.")
+        return {}
+
+    pdf_paths = [os.path.join(input_dir, f) for f in pdf_files]
+    return convert_files(pdf_paths, output_dir, timeout_sec, num_workers, max_tasks_per_worker)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        logger.info(f"✅ Saved: {output_filename}")
 
-            
 if __name__=="__main__":
-    convert_folder('/home/truongnn/trung/project/synthetic_data/data/input/pdf', "/home/truongnn/trung/project/synthetic_data/data/output/markdown", 60)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert a folder of PDFs to markdown with MarkItDown")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-tasks-per-worker", type=int, default=200)
+    args = parser.parse_args()
+    convert_folder(args.input_dir, args.output_dir, args.timeout, args.workers, args.max_tasks_per_worker)
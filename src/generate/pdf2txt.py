@@ -1,26 +1,60 @@
 import subprocess
 import os
 from src.utils.utils import get_filename_without_ext
+from src.utils.tracing import span
 from tqdm import tqdm
 
-def convert_pdf_to_text(input_pdf_dir: str, output_txt_dir: str):
+def pdf_to_text(input_pdf_path: str, output_txt_path: str):
+    """
+    Run `pdftotext -layout` on a single PDF.
+    Raises:
+        subprocess.CalledProcessError: If pdftotext fails.
+    """
+    subprocess.run(
+        ["pdftotext", "-layout", input_pdf_path, output_txt_path],
+        check=True
+    )
+
+PDF2TXT_STAGE_VERSION = 1
+
+def convert_pdf_to_text(input_pdf_dir: str, output_txt_dir: str, use_cache: bool = True):
 
     if not os.path.exists(input_pdf_dir):
         raise FileNotFoundError(f"Không tìm thấy file PDF: {input_pdf_dir}")
 
+    store = None
+    if use_cache:
+        from src.utils.artifact_store import get_artifact_store, stage_key
+
+        store = get_artifact_store()
+        key = stage_key("pdf2txt", PDF2TXT_STAGE_VERSION, {"cmd": "pdftotext -layout"})
+
+    skipped = 0
     try:
         pdf_files = [file for file in os.listdir(input_pdf_dir) if file.endswith(".pdf")]
-        for file in tqdm(pdf_files, desc="Converting PDF to TXT"):
-            input_pdf_path = os.path.join(input_pdf_dir, file)
-            output_basename = get_filename_without_ext(input_pdf_path)
-            output_txt_path = os.path.join(output_txt_dir, f"{output_basename}.txt")
-
-            subprocess.run(
-                ["pdftotext", "-layout", input_pdf_path, output_txt_path],
-                check=True
-            )
-            print(f"Đã chuyển đổi PDF sang TXT: {output_txt_path}")
+        with span("pdf2txt", documents=len(pdf_files)) as stage:
+            for file in tqdm(pdf_files, desc="Converting PDF to TXT"):
+                input_pdf_path = os.path.join(input_pdf_dir, file)
+                output_basename = get_filename_without_ext(input_pdf_path)
+                output_txt_path = os.path.join(output_txt_dir, f"{output_basename}.txt")
+
+                with span("pdf2txt.document", doc_id=output_basename, bytes_in=os.path.getsize(input_pdf_path)) as doc:
+                    if store is not None:
+                        input_hash = store.hash_file(input_pdf_path)
+                        if store.reuse(key, input_hash, output_txt_path):
+                            skipped += 1
+                            doc.set_attribute("cached", True)
+                            continue
+
+                    pdf_to_text(input_pdf_path, output_txt_path)
+                    doc.set_attribute("bytes_out", os.path.getsize(output_txt_path))
+                    if store is not None:
+                        store.put(key, input_hash, output_txt_path)
+                print(f"Đã chuyển đổi PDF sang TXT: {output_txt_path}")
+            stage.set_attribute("cached", skipped)
+        if skipped:
+            print(f"♻️ Bỏ qua {skipped} PDF không thay đổi (đã có trong artifact store)")
     except subprocess.CalledProcessError as e:
         print(f"Lỗi khi chạy pdftotext: {e}")
     except Exception as e:
-        print(f"Lỗi khác: {e}")
\ No newline at end of file
+        print(f"Lỗi khác: {e}")
@@ -0,0 +1,216 @@
+import os
+import argparse
+import tempfile
+import subprocess
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List
+from tqdm import tqdm
+
+from src.generate.pdf2txt import pdf_to_text
+from src.utils.utils import get_filename_without_ext
+
+# Trang web trả về placeholder này khi văn bản chưa tải xong (xem check_txt_file)
+LOADING_PLACEHOLDER = "Đang tải văn bản..."
+
+PDF_EXTRACT_STAGE_VERSION = 1
+
+# Ký tự thay thế / private-use / control => dấu hiệu font bị map sai khi trích xuất
+_GARBLED_RE = re.compile(r"[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0e-\x1f\x7f]|\(cid:\d+\)")
+
+
+@dataclass
+class TextQuality:
+    """
+    Quality verdict for an extracted text.
+    Args:
+        chars (int): Number of non-whitespace characters.
+        pages (int): Number of pages (pdftotext separates pages with form feeds).
+        garbled_ratio (float): Share of replacement/private-use/control characters.
+        reasons (List[str]): Why the text was rejected; empty if it is good.
+    """
+    chars: int
+    pages: int
+    garbled_ratio: float
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.reasons
+
+
+def garbled_ratio(text: str) -> float:
+    """
+    Share of characters that are U+FFFD, private-use or stray control characters,
+    plus pdfminer-style "(cid:NN)" glyph markers.
+    """
+    if not text:
+        return 0.0
+    bad = sum(len(m) for m in _GARBLED_RE.findall(text))
+    return min(1.0, bad / len(text))
+
+
+def score_text(text: str, min_chars_per_page: int = 200, max_garbled_ratio: float = 0.02) -> TextQuality:
+    """
+    Score pdftotext output and list the reasons it should go to the expensive extractor.
+    Args:
+        text (str): Extracted text.
+        min_chars_per_page (int): Below this density the page is probably a scan.
+        max_garbled_ratio (float): Tolerated share of garbled characters.
+    Returns:
+        TextQuality: The verdict.
+    """
+    pages = max(1, text.rstrip("\f").count("\f") + 1) if text else 0
+    chars = len("".join(text.split()))
+    ratio = garbled_ratio(text)
+
+    reasons = []
+    if chars == 0:
+        reasons.append("empty")
+    else:
+        if LOADING_PLACEHOLDER in text:
+            reasons.append("placeholder")
+        if ratio > max_garbled_ratio:
+            reasons.append("garbled")
+        if chars / pages < min_chars_per_page:
+            reasons.append("low_density")
+    return TextQuality(chars=chars, pages=pages, garbled_ratio=ratio, reasons=reasons)
+
+
+def _cheap_extract(input_pdf_path: str, output_txt_path: str, min_chars_per_page: int, max_garbled_ratio: float):
+    try:
+        pdf_to_text(input_pdf_path, output_txt_path)
+        with open(output_txt_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except (subprocess.CalledProcessError, OSError) as e:
+        return TextQuality(chars=0, pages=0, garbled_ratio=0.0, reasons=[f"pdftotext_failed: {e}"])
+    return score_text(text, min_chars_per_page, max_garbled_ratio)
+
+
+def _record_extracted(store, key, results, input_hashes, output_txt_dir):
+    if store is None:
+        return
+    for file, source in results.items():
+        if source in ("pdftotext", "markitdown"):
+            output_txt_path = os.path.join(output_txt_dir, f"{get_filename_without_ext(file)}.txt")
+            store.put(key, input_hashes[file], output_txt_path)
+
+
+def extract_folder(
+    input_pdf_dir: str,
+    output_txt_dir: str,
+    workers: int = None,
+    min_chars_per_page: int = 200,
+    max_garbled_ratio: float = 0.02,
+    fallback_timeout_sec: float = 60,
+    fallback_workers: int = None,
+    use_cache: bool = True,
+):
+    """
+    Tiered PDF -> TXT extraction.
+
+    Every PDF goes through pdftotext first (run on a thread pool, the work happens in
+    the subprocess). Only files whose output is scored as poor are sent to the
+    MarkItDown worker pool; its result replaces the TXT only when it scores better.
+    With `use_cache`, PDFs whose content was already extracted with the same
+    thresholds are skipped.
+
+    Returns:
+        dict: file name -> "pdftotext" | "markitdown" | "cached" | "failed: <reasons>".
+    """
+    if not os.path.exists(input_pdf_dir):
+        raise FileNotFoundError(f"Không tìm thấy file PDF: {input_pdf_dir}")
+    os.makedirs(output_txt_dir, exist_ok=True)
+
+    pdf_files = [f for f in os.listdir(input_pdf_dir) if f.lower().endswith(".pdf")]
+    workers = workers or min(32, (os.cpu_count() or 1) * 2)
+
+    results = {}
+    poor = {}
+    store = None
+    key = None
+    input_hashes = {}
+    if use_cache:
+        from src.utils.artifact_store import get_artifact_store, stage_key
+
+        store = get_artifact_store()
+        key = stage_key("pdf_extract", PDF_EXTRACT_STAGE_VERSION, {
+            "min_chars_per_page": min_chars_per_page,
+            "max_garbled_ratio": max_garbled_ratio,
+        })
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for file in pdf_files:
+            input_pdf_path = os.path.join(input_pdf_dir, file)
+            output_txt_path = os.path.join(output_txt_dir, f"{get_filename_without_ext(file)}.txt")
+            if store is not None:
+                input_hashes[file] = store.hash_file(input_pdf_path)
+                if store.reuse(key, input_hashes[file], output_txt_path):
+                    results[file] = "cached"
+                    continue
+            future = executor.submit(_cheap_extract, input_pdf_path, output_txt_path, min_chars_per_page, max_garbled_ratio)
+            futures[future] = file
+        for future in tqdm(as_completed(futures), total=len(futures), desc="pdftotext"):
+            file = futures[future]
+            quality = future.result()
+            if quality.ok:
+                results[file] = "pdftotext"
+            else:
+                poor[file] = quality
+
+    print(f"✅ pdftotext: {len(results)} OK, {len(poor)} cần trích xuất lại bằng MarkItDown")
+    if not poor:
+        _record_extracted(store, key, results, input_hashes, output_txt_dir)
+        return results
+
+    # Import lazily: MarkItDown workers are only needed for the poor files
+    from src.generate.pdf2md import convert_files, STATUS_OK
+
+    # Thư mục tạm nằm trong output_txt_dir để os.replace không phải chép qua filesystem khác
+    with tempfile.TemporaryDirectory(prefix="_markitdown_", dir=output_txt_dir) as md_dir:
+        statuses = convert_files(
+            [os.path.join(input_pdf_dir, f) for f in poor],
+            md_dir,
+            timeout_sec=fallback_timeout_sec,
+            num_workers=fallback_workers,
+        )
+
+        for file, cheap_quality in poor.items():
+            name = get_filename_without_ext(file)
+            md_path = os.path.join(md_dir, f"{name}.md")
+            if statuses.get(file) != STATUS_OK:
+                results[file] = f"failed: {','.join(cheap_quality.reasons)}"
+                continue
+            with open(md_path, "r", encoding="utf-8") as f:
+                md_quality = score_text(f.read(), min_chars_per_page, max_garbled_ratio)
+            if len(md_quality.reasons) <= len(cheap_quality.reasons) and md_quality.chars >= cheap_quality.chars:
+                os.replace(md_path, os.path.join(output_txt_dir, f"{name}.txt"))
+                results[file] = "markitdown" if md_quality.ok else f"failed: {','.join(md_quality.reasons)}"
+            else:
+                results[file] = f"failed: {','.join(cheap_quality.reasons)}"
+
+    _record_extracted(store, key, results, input_hashes, output_txt_dir)
+    failed = sum(1 for v in results.values() if v.startswith("failed"))
+    print(f"✅ Hoàn tất: {len(results) - failed} OK, {failed} vẫn kém chất lượng")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pdftotext first, MarkItDown only for poor-quality output")
+    parser.add_argument("input_pdf_dir")
+    parser.add_argument("output_txt_dir")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-chars-per-page", type=int, default=200)
+    parser.add_argument("--max-garbled-ratio", type=float, default=0.02)
+    parser.add_argument("--fallback-timeout", type=float, default=60)
+    args = parser.parse_args()
+    extract_folder(
+        args.input_pdf_dir,
+        args.output_txt_dir,
+        workers=args.workers,
+        min_chars_per_page=args.min_chars_per_page,
+        max_garbled_ratio=args.max_garbled_ratio,
+        fallback_timeout_sec=args.fallback_timeout,
+    )
@@ -37,6 +37,17 @@ class BasePipeline(ABC):
     """
     Abstract base class for a pipeline that processes messages.
     """
+    # Router / model names used as metrics labels; set by src.pipeline.service.get_pipeline
+    router_name = None
+    model_label = None
+
+    @property
+    def metrics_router(self) -> str:
+        return self.router_name or type(self).__name__
+
+    @property
+    def metrics_model(self) -> str:
+        return self.model_label or self.settings.model_name
     def __init__(self, settings: BaseSettings, config:BaseConfig):
 
         """
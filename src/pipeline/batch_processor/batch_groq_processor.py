@@ -9,6 +9,8 @@ from dataclasses import dataclass
 # from together import Together
 import datetime
 from dotenv import load_dotenv
+from src.preproccess.compact import compact_text
+from src.utils.tracing import current_span, span, traced
 
 # Lấy đường dẫn thư mục hiện tại chứa script
 current_dir = os.path.dirname(__file__)
@@ -27,6 +29,8 @@ class BatchOpenAIConfig:
     max_tokens: int
     column_name_list: List[str]
     system_prompt: str
+    compact_context: bool = False  # bỏ header/footer, số trang, khoảng trắng layout trước khi gửi
+    poll_interval: float = 5  # giây giữa hai lần kiểm tra trạng thái batch
 
 
 class BatchProcessError(Exception):
@@ -63,13 +67,20 @@ class BatchOpenAIProcessor:
         self.sub_dataset = self.dataset.select(range(batch_openai_config.num_samples_range[0], batch_openai_config.num_samples_range[1]))
         self.column_name_list = batch_openai_config.column_name_list
 
+    @traced("batch.build")
     def build_request(self, prompt_list, start_index, end_index):
         file_name = f'batch_input{start_index}_{end_index}.jsonl'
         with open(file_name, 'w', encoding='utf-8') as f:
             req_id = start_index * len(self.column_name_list)
+            tokens_in, tokens_out = 0, 0
             for item in prompt_list:
                 for col in self.column_name_list:
-                    prompt_text = f"{col}: {item[col]}"
+                    value = item[col]
+                    if self.batch_openai_config.compact_context and isinstance(value, str):
+                        value, stats = compact_text(value)
+                        tokens_in += stats.tokens_in
+                        tokens_out += stats.tokens_out
+                    prompt_text = f"{col}: {value}"
                     record = {
                         "custom_id": f"req-{req_id}",
                         "method": "POST",
@@ -84,6 +95,10 @@ class BatchOpenAIProcessor:
                     }
                     f.write(json.dumps(record, ensure_ascii=False) + "\n")
                     req_id += 1
+        current_span().set_attributes(requests=req_id - start_index * len(self.column_name_list), bytes_out=os.path.getsize(file_name))
+        if tokens_in:
+            current_span().set_attributes(tokens_in=tokens_in, tokens_out=tokens_out)
+            print(f"🗜️ Compact context: {tokens_in:,} → {tokens_out:,} token ({1 - tokens_out / tokens_in:.1%} tiết kiệm)")
         return file_name
 
     
@@ -97,26 +112,30 @@ class BatchOpenAIProcessor:
         return prompt
 
 
+    @traced("batch")
     def generate_batch_response(self):
         # Step 1: Build request and write to input file
         prompt_list = self.make_json_list()
         start_idx, end_idx = self.batch_openai_config.num_samples_range
+        current_span().set_attributes(range_start=start_idx, range_end=end_idx, documents=len(prompt_list))
         input_file = self.build_request(prompt_list, start_index=start_idx, end_index=end_idx)
         self.batch_openai_config.input_file_path = input_file
 
         # Step 2: Upload input file
-        with open(input_file, "rb") as f:
+        with span("batch.upload", bytes_in=os.path.getsize(input_file)), open(input_file, "rb") as f:
             upload_resp = self.client.files.create(file=f, purpose="batch")
         input_file_id = upload_resp.id
         print(f"Uploaded input file: {input_file} | File ID: {input_file_id}")
 
         # Step 3: Create batch
-        batch_resp = self.client.batches.create(
-            completion_window="24h",
-            endpoint=self.batch_openai_config.url,
-            input_file_id=input_file_id
-        )
+        with span("batch.submit"):
+            batch_resp = self.client.batches.create(
+                completion_window="24h",
+                endpoint=self.batch_openai_config.url,
+                input_file_id=input_file_id
+            )
         batch_id = batch_resp.id
+        current_span().set_attribute("batch_id", batch_id)
         print(f"Batch job created. Batch ID: {batch_id}")
 
         # Step 4: Save metadata
@@ -135,11 +154,14 @@ class BatchOpenAIProcessor:
         # Step 5: Polling batch status
         print("Polling batch status...")
         status = batch_resp.status
-        while status in ("validating", "in_progress", "finalizing"):
-            print(f"Current status: {status}")
-            time.sleep(5)
-            batch_resp = self.client.batches.retrieve(batch_id)
-            status = batch_resp.status
+        with span("batch.poll") as poll:
+            while status in ("validating", "in_progress", "finalizing"):
+                print(f"Current status: {status}")
+                time.sleep(self.batch_openai_config.poll_interval)
+                batch_resp = self.client.batches.retrieve(batch_id)
+                status = batch_resp.status
+                poll.add("polls")
+            poll.set_attribute("status", status)
 
         print(f"Final status: {status}")
 
@@ -167,8 +189,10 @@ class BatchOpenAIProcessor:
 
         print("Downloading result file...")
         output_jsonl_path = f"batch_results_{start_idx}_{end_idx}.jsonl"
-        file_content = self.client.files.content(output_file_id)
-        file_content.write_to_file(output_jsonl_path)
+        with span("batch.download") as download:
+            file_content = self.client.files.content(output_file_id)
+            file_content.write_to_file(output_jsonl_path)
+            download.set_attribute("bytes_out", os.path.getsize(output_jsonl_path))
         print(f"Result file saved to {output_jsonl_path}")
 
         # Step 8: Convert to JSON
@@ -185,8 +209,10 @@ class BatchOpenAIProcessor:
         print("Batch processing completed successfully.")
 
 
+    @traced("batch.merge_jsonl_files")
     def merge_jsonl_files(self, input_json_path:str ):
         data = []
+        prompt_tokens, completion_tokens = 0, 0
         with open(input_json_path, 'r', encoding='utf-8') as f:
             for line in f:
                 try:
@@ -194,6 +220,11 @@ class BatchOpenAIProcessor:
                     data.append(obj)
                 except Exception as e:
                     print("Not a valid JSON line:", line)   
+                    continue
+                usage = ((obj.get("response") or {}).get("body") or {}).get("usage") or {}
+                prompt_tokens += usage.get("prompt_tokens") or 0
+                completion_tokens += usage.get("completion_tokens") or 0
+        current_span().set_attributes(responses=len(data), prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
                 
         
         output_name = 'converted_' + os.path.splitext(input_json_path)[0] + '.json'
@@ -204,6 +235,7 @@ class BatchOpenAIProcessor:
 
         print(f"Saving file: {output_path}")
 
+    @traced("batch.merge_data")
     def merge_data(
         self,
         input_jsonl_path: str,
@@ -225,39 +257,37 @@ class BatchOpenAIProcessor:
         """
         group_size = len(keys)
 
-        # Load input .jsonl file (each group_size lines = 1 logical unit)
-        with open(input_jsonl_path, "r", encoding="utf-8") as f:
-            input_entries = [json.loads(line) for line in f]
-
         # Load response JSON (structured as a list of responses, each with custom_id)
         with open(response_json_path, "r", encoding="utf-8") as f:
             response_data = json.load(f)
 
-        # Group input entries into logical units
-        grouped_inputs = []
-        for i in range(0, len(input_entries), group_size):
-            group = {}
-            for j, key in enumerate(keys):
-                group[key] = input_entries[i + j]["body"]["messages"][-1]["content"]
-            group["custom_id"] = input_entries[i]["custom_id"]
-            grouped_inputs.append(group)
-
-        # Create lookup map from custom_id to response text
+        # Create lookup map from custom_id to response text.
+        # The Batch API does not keep input order, so responses are only matched by custom_id.
         response_lookup = {
             item["custom_id"]: item["response"]["body"]["choices"][0]["message"]["content"]
             for item in response_data
         }
+        del response_data
 
-        # Merge input group with corresponding responses
+        # Stream the input .jsonl file (each group_size lines = 1 logical unit)
+        # and merge every group that got at least one response
         merged_result = []
-        for i in range(0, len(response_data), group_size):
-            ids = [response_data[i + j]["custom_id"] for j in range(group_size)]
-            matched = next((x for x in grouped_inputs if x["custom_id"] == ids[0]), None)
-
-            if matched:
-                for j, key in enumerate(keys):
-                    matched[f"{key}_response"] = response_lookup.get(ids[j], "")
-                merged_result.append(matched)
+        with open(input_jsonl_path, "r", encoding="utf-8") as f:
+            group, ids = {}, []
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                group[keys[len(ids)]] = entry["body"]["messages"][-1]["content"]
+                ids.append(entry["custom_id"])
+                if len(ids) < group_size:
+                    continue
+                if any(custom_id in response_lookup for custom_id in ids):
+                    group["custom_id"] = ids[0]
+                    for j, key in enumerate(keys):
+                        group[f"{key}_response"] = response_lookup.get(ids[j], "")
+                    merged_result.append(group)
+                group, ids = {}, []
 
         # Determine output path
         if output_dir is None:
@@ -269,6 +299,7 @@ class BatchOpenAIProcessor:
         # Write to file
         with open(output_path, "w", encoding="utf-8") as f:
             json.dump(merged_result, f, ensure_ascii=False, indent=2)
+        current_span().set_attributes(documents=len(merged_result), bytes_out=os.path.getsize(output_path))
 
         print(f"Merged file saved to: {output_path}")
 
@@ -1,11 +1,11 @@
 from ..base_chat import BasePipeline, BaseSettings, BaseConfig
 from ...utils.loggers import run_with_error_catch
+from ...utils.metrics import track_llm_call
 from google import genai
 from google.genai import types
 import os
 from dotenv import load_dotenv
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 load_dotenv()
 
 class GeminiChatPipeline(BasePipeline):
@@ -32,18 +32,23 @@ class GeminiChatPipeline(BasePipeline):
         Returns:
             str: The response from the model.
         """
-        response = self.client.models.generate_content(
-            model=self.settings.model_name,
-            contents = message,
-            config= types.GenerateContentConfig(
-                temperature= self.config.temperature,
-                top_p = self.config.top_p,
-                max_output_tokens= self.config.max_tokens,
-                # thinking_config= types.ThinkingConfig( thinking_budget= 0 if not self.config.get_thinking else 1000)
+        with track_llm_call(self.metrics_router, self.metrics_model) as record:
+            response = self.client.models.generate_content(
+                model=self.settings.model_name,
+                contents = message,
+                config= types.GenerateContentConfig(
+                    temperature= self.config.temperature,
+                    top_p = self.config.top_p,
+                    max_output_tokens= self.config.max_tokens,
+                    # thinking_config= types.ThinkingConfig( thinking_budget= 0 if not self.config.get_thinking else 1000)
 
+                )
+        
             )
-    
-        )
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                record.prompt_tokens = getattr(usage, "prompt_token_count", None)
+                record.completion_tokens = getattr(usage, "candidates_token_count", None)
 
         return response.text
     
@@ -51,9 +56,7 @@ class GeminiChatPipeline(BasePipeline):
     @run_with_error_catch
     async def send_messages_async(self, message: str) -> str:
         """
-        Asynchronous wrapper for the synchronous send_messages method.
+        Asynchronous wrapper for the synchronous send_messages method, run on the
+        default thread pool so the event loop is never blocked.
         """
-        loop = asyncio.get_running_loop()
-        with ThreadPoolExecutor() as executor:
-            response = await loop.run_in_executor(executor, self.send_messages, message)
-        return response
\ No newline at end of file
+        return await asyncio.to_thread(self.send_messages, message)
\ No newline at end of file
@@ -1,11 +1,16 @@
 from ..base_chat import BasePipeline, BaseSettings, BaseConfig
 from ...utils.loggers import run_with_error_catch
+from ...utils.metrics import track_llm_call
 
 from openai import OpenAI
-from groq import Groq
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+
+
+def _record_usage(record, usage):
+    if usage is not None:
+        record.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        record.completion_tokens = getattr(usage, "completion_tokens", None)
 
 class OpenAIChatPipeline(BasePipeline):
     """
@@ -38,36 +43,44 @@ class OpenAIChatPipeline(BasePipeline):
         Returns:
             str: The response from the model.
         """
-        response = self.client.chat.completions.create(
-            messages=[{"role": "user", "content": message}],
-            model=self.settings.model_name,
-            temperature=self.config.temperature,
-            top_p=self.config.top_p,
-            max_tokens=self.config.max_tokens,
-            stream=self.config.stream
-        )
+        with track_llm_call(self.metrics_router, self.metrics_model) as record:
+            # Khi stream, usage chỉ được gửi (ở chunk cuối) nếu yêu cầu include_usage
+            stream_options = {"stream_options": {"include_usage": True}} if self.config.stream else {}
+            response = self.client.chat.completions.create(
+                messages=[{"role": "user", "content": message}],
+                model=self.settings.model_name,
+                temperature=self.config.temperature,
+                top_p=self.config.top_p,
+                max_tokens=self.config.max_tokens,
+                stream=self.config.stream,
+                **stream_options
+            )
 
-        if self.config.stream:
+            if self.config.stream:
 
-            output =  ''
-            for chunk in response:
-                reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
-                if reasoning and self.config.get_thinking:
-                    output += reasoning           
-                if chunk.choices[0].delta.content is not None:
-                    output += chunk.choices[0].delta.content               
+                output =  ''
+                for chunk in response:
+                    _record_usage(record, getattr(chunk, "usage", None))
+                    if not chunk.choices:
+                        continue
+                    reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
+                    if reasoning and self.config.get_thinking:
+                        record.first_token()
+                        output += reasoning           
+                    if chunk.choices[0].delta.content is not None:
+                        record.first_token()
+                        output += chunk.choices[0].delta.content               
                 return output
-        else:
-            reasoning = getattr(response.choices[0].message, "reasoning_content", None)
-            if reasoning and self.config.get_thinking:
-                return reasoning + response.choices[0].message.content
             else:
-                return response.choices[0].message.content
+                _record_usage(record, getattr(response, "usage", None))
+                reasoning = getattr(response.choices[0].message, "reasoning_content", None)
+                if reasoning and self.config.get_thinking:
+                    return reasoning + response.choices[0].message.content
+                else:
+                    return response.choices[0].message.content
 
     async def send_messages_async(self, message: str) -> str:
-        loop = asyncio.get_running_loop()
-        with ThreadPoolExecutor() as executor:
-            return await loop.run_in_executor(executor, self.send_messages, message)
+        return await asyncio.to_thread(self.send_messages, message)
 
 
 class GroqChatPipeline(OpenAIChatPipeline):
@@ -0,0 +1,43 @@
+import importlib
+from functools import lru_cache
+
+# Pipelines are referenced by import path so the provider SDKs (google-genai, openai, ...)
+# are only imported the first time a router is actually used.
+PIPELINE_MAP = {
+    "gemini": "src.pipeline.gemini_endpoint.chat:GeminiChatPipeline",
+    "groq": "src.pipeline.openai_endpoint.chat:GroqChatPipeline",
+    "openai": "src.pipeline.openai_endpoint.chat:OpenAIChatPipeline",
+    "openrouter": "src.pipeline.openai_endpoint.chat:OpenAIChatPipeline",
+    "deepseek": "src.pipeline.openai_endpoint.chat:OpenAIChatPipeline",
+    "nvidia": "src.pipeline.openai_endpoint.chat:OpenAIChatPipeline",
+}
+
+ROUTER_MAP = {
+    'openai': 'OPENAI',
+    'openrouter': 'OPENROUTER',
+    'deepseek': 'DEEPSEEK',
+    'groq': 'GROQ',
+    'nvidia': 'NVIDIA',
+    'gemini': 'GEMINI'}
+
+
+@lru_cache(maxsize=None)
+def load_object(path: str):
+    """
+    Import "package.module:attr" and return the attribute.
+    """
+    module_name, attr = path.split(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_pipeline_cls(router_name: str):
+    """
+    Args:
+        router_name (str): Router name, e.g. "gemini" or "openai".
+    Returns:
+        type | None: The pipeline class, or None if the router is unknown.
+    """
+    path = PIPELINE_MAP.get(router_name)
+    if path is None:
+        return None
+    return load_object(path)
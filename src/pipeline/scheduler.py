@@ -0,0 +1,178 @@
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from ..utils.metrics import RATE_LIMIT_WAIT
+
+# Hàng đợi của một router đặt trước pipeline: /chat tương tác và các job hàng loạt
+# (send_request.py, /generate_json) dùng chung quota của provider.
+# - Lớp ưu tiên: request interactive luôn được cấp slot trước bulk.
+# - Trong mỗi lớp, các tenant (API key / X-Tenant-Id) được chia lượt theo trọng số
+#   (self-clocked fair queuing), một tenant gửi dồn dập không chặn được tenant khác.
+# - Một phần quota (slot đồng thời và RPM) chỉ dành cho interactive, bulk không dùng tới.
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)  # theo thứ tự ưu tiên
+DEFAULT_TENANT = "anonymous"
+
+
+def parse_tenant_weights(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "team-a=3,team-b=0.5" into {"team-a": 3.0, "team-b": 0.5}."""
+    weights = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        tenant, weight = item.rsplit("=", 1)
+        weights[tenant.strip()] = max(float(weight), 1e-6)
+    return weights
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "tenant", "tag")
+
+    def __init__(self, future: asyncio.Future, priority: str, tenant: str, tag: float):
+        self.future = future
+        self.priority = priority
+        self.tenant = tenant
+        self.tag = tag
+
+
+class PriorityScheduler:
+    """
+    Admission control for one router: at most `max_concurrency` calls in flight and
+    starts no faster than `rpm` per minute, granted by priority class, then by
+    weighted fair share between tenants. Unset limits are not enforced (every
+    request starts at once).
+
+    Args:
+        interactive_reserve (float): Share of the concurrency slots and of the RPM
+            that bulk requests may not use. Bulk always keeps at least one slot.
+        tenant_weights (dict): Relative share of each tenant inside a class (default 1).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rpm: Optional[float] = None,
+        name: str = "",
+        interactive_reserve: float = 0.0,
+        tenant_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.interactive_reserve = min(max(interactive_reserve, 0.0), 1.0)
+        self.tenant_weights = tenant_weights or {}
+        self.in_flight = {p: 0 for p in PRIORITIES}
+        self.waiting = {p: 0 for p in PRIORITIES}
+
+        self._bulk_slots = None
+        if max_concurrency:
+            reserved = min(max_concurrency - 1, math.ceil(max_concurrency * self.interactive_reserve))
+            self._bulk_slots = max_concurrency - reserved
+        self._interval = 60.0 / rpm if rpm else 0.0
+        self._bulk_interval = self._interval / max(1.0 - self.interactive_reserve, 0.05) if rpm else 0.0
+        self._next_start = 0.0
+        self._bulk_next_start = 0.0
+
+        self._queues = {p: [] for p in PRIORITIES}
+        self._virtual = {p: 0.0 for p in PRIORITIES}
+        self._last_tag: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITIES}
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: str = INTERACTIVE, tenant: Optional[str] = None):
+        """Hold one slot of the router for the duration of the block."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        start = time.perf_counter()
+        await self._acquire(priority, tenant or DEFAULT_TENANT)
+        RATE_LIMIT_WAIT.observe(time.perf_counter() - start, router=self.name, priority=priority)
+        try:
+            yield self
+        finally:
+            self._release(priority)
+
+    def _tag(self, priority: str, tenant: str) -> float:
+        last_tag = self._last_tag[priority]
+        tag = max(self._virtual[priority], last_tag.get(tenant, 0.0)) + 1.0 / self.tenant_weights.get(tenant, 1.0)
+        last_tag[tenant] = tag
+        if len(last_tag) > 4096:
+            # Tag cũ hơn thời gian ảo không còn tác dụng
+            for key in [k for k, v in last_tag.items() if v <= self._virtual[priority]]:
+                del last_tag[key]
+        return tag
+
+    async def _acquire(self, priority: str, tenant: str):
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority, tenant, self._tag(priority, tenant))
+        heapq.heappush(self._queues[priority], (waiter.tag, next(self._seq), waiter))
+        self.waiting[priority] += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Được cấp slot đúng lúc bị huỷ: trả lại cho request kế tiếp
+                self._release(priority)
+            else:
+                waiter.future.cancel()
+                self.waiting[priority] -= 1
+            raise
+
+    def _release(self, priority: str):
+        self.in_flight[priority] -= 1
+        self._dispatch()
+
+    def _has_capacity(self, priority: str) -> bool:
+        if self.max_concurrency and sum(self.in_flight.values()) >= self.max_concurrency:
+            return False
+        return priority != BULK or self._bulk_slots is None or self.in_flight[BULK] < self._bulk_slots
+
+    def _head(self, priority: str) -> Optional[_Waiter]:
+        queue = self._queues[priority]
+        while queue and queue[0][2].future.done():
+            heapq.heappop(queue)
+        return queue[0][2] if queue else None
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = next(
+                (w for w in map(self._head, PRIORITIES) if w is not None and self._has_capacity(w.priority)),
+                None,
+            )
+            if waiter is None:
+                return
+
+            now = loop.time()
+            ready_at = self._next_start
+            if waiter.priority == BULK:
+                ready_at = max(ready_at, self._bulk_next_start)
+            if ready_at > now:
+                if self._timer is None or ready_at < self._timer_at:
+                    if self._timer is not None:
+                        self._timer.cancel()
+                    self._timer = loop.call_at(ready_at, self._on_timer)
+                    self._timer_at = ready_at
+                return
+
+            heapq.heappop(self._queues[waiter.priority])
+            if self._interval:
+                self._next_start = max(now, self._next_start) + self._interval
+                if waiter.priority == BULK:
+                    self._bulk_next_start = max(now, self._bulk_next_start) + self._bulk_interval
+            self._virtual[waiter.priority] = waiter.tag
+            self.waiting[waiter.priority] -= 1
+            self.in_flight[waiter.priority] += 1
+            waiter.future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,271 @@
+import os
+import copy
+import time
+import asyncio
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple
+from typing import Optional
+
+from .registry import ROUTER_MAP, get_pipeline_cls
+from .scheduler import DEFAULT_TENANT, INTERACTIVE, PriorityScheduler, parse_tenant_weights
+from .base_chat import BaseSettings, BaseConfig
+from ..utils.utils import get_all_env_values
+from ..utils.handle_response import handle_response
+from ..utils.metrics import CHAT_COALESCED, CHAT_LATENCY, CHAT_REQUESTS, PIPELINE_CACHE, Gauge
+
+# Shared by the /chat endpoint and the in-process (direct) mode of send_request.py:
+# same settings resolution, one pipeline (and provider client) per configuration,
+# one scheduler (priority + rate limit) per router and event loop.
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+# asyncio primitives belong to one event loop: keep one scheduler per (loop, router)
+_limiters = weakref.WeakKeyDictionary()
+_limiters_lock = threading.Lock()
+# Pipeline gọi provider bằng asyncio.to_thread: pool mặc định chỉ có min(32, CPU + 4)
+# thread, nhỏ hơn số request đồng thời cần chạy (và thread của request đã timeout
+# vẫn bận tới khi provider trả lời)
+PROVIDER_THREADS = int(os.getenv("PROVIDER_THREADS", "64"))
+
+
+def get_limiter(router_name: str) -> PriorityScheduler:
+    """
+    Scheduler of a router for the running event loop, configured from
+    <PREFIX>_MAX_CONCURRENCY, <PREFIX>_RPM (e.g. DEEPSEEK_RPM=60) and
+    <PREFIX>_INTERACTIVE_RESERVE (share of both kept for interactive requests,
+    default 0.25). Tenant weights come from SCHEDULER_TENANT_WEIGHTS ("team-a=3,team-b=1").
+    The first call on a loop also sizes its default thread pool (PROVIDER_THREADS).
+    """
+    loop = asyncio.get_running_loop()
+    with _limiters_lock:
+        if loop not in _limiters:
+            loop.set_default_executor(ThreadPoolExecutor(PROVIDER_THREADS, thread_name_prefix="provider"))
+        per_loop = _limiters.setdefault(loop, {})
+        if router_name not in per_loop:
+            prefix = ROUTER_MAP.get(router_name, router_name.upper())
+            reserve = _env_number(f"{prefix}_INTERACTIVE_RESERVE", float)
+            per_loop[router_name] = PriorityScheduler(
+                max_concurrency=_env_number(f"{prefix}_MAX_CONCURRENCY", int),
+                rpm=_env_number(f"{prefix}_RPM", float),
+                name=router_name,
+                interactive_reserve=0.25 if reserve is None else reserve,
+                tenant_weights=parse_tenant_weights(os.getenv("SCHEDULER_TENANT_WEIGHTS")),
+            )
+        return per_loop[router_name]
+
+
+def _limiter_stats():
+    stats = {}
+    with _limiters_lock:
+        per_loops = list(_limiters.values())
+    for per_loop in per_loops:
+        for router_name, limiter in list(per_loop.items()):
+            for state in ("in_flight", "waiting"):
+                for priority, count in getattr(limiter, state).items():
+                    key = (router_name, priority, state)
+                    stats[key] = stats.get(key, 0) + count
+    return stats
+
+
+Gauge(
+    "rate_limiter_requests", "Requests holding or queued for a router's scheduler, per priority class.",
+    ("router", "priority", "state"), callback=_limiter_stats,
+)
+
+
+def build_settings(router_name: str, model_name: str) -> BaseSettings:
+    """Resolve API key, model and base URL of a router from the environment."""
+    prefix = ROUTER_MAP.get(router_name)
+    if not prefix:
+        raise Exception("Router not supported")
+
+    envs = get_all_env_values()
+    return BaseSettings(
+        model_name=envs.get(f"{prefix}_MODEL_NAME", model_name),
+        base_url=envs.get(f"{prefix}_BASE_URL"),
+        api_key=envs.get(f"{prefix}_KEY"),
+    )
+
+
+def build_config(user_config: Optional[dict] = None) -> BaseConfig:
+    user_config = user_config or {}
+    return BaseConfig(
+        temperature=user_config.get("temperature", 0.6),
+        top_p=user_config.get("top_p", 0.95),
+        max_tokens=user_config.get("max_tokens", 4096),
+        stream=user_config.get("stream", False),
+        get_thinking=user_config.get("get_thinking", False),
+    )
+
+
+# Một pipeline (provider client + connection pool) cho mỗi (router, settings), giới hạn
+# số lượng; config của request (temperature, max_tokens, ...) được gắn vào bản sao nhẹ
+_pipelines = OrderedDict()
+_pipelines_lock = threading.Lock()
+PIPELINE_CACHE_SIZE = int(os.getenv("PIPELINE_CACHE_SIZE", "32"))
+
+
+def get_pipeline(router_name: str, model_name: str, user_config: Optional[dict] = None):
+    """
+    Pipeline for (router, model) with the request's config. The provider client is
+    created once per (router, settings) and shared by every request; the least
+    recently used clients are dropped beyond PIPELINE_CACHE_SIZE. A pipeline whose
+    client failed to initialise is not cached.
+    """
+    router_name = router_name.lower()
+    model_name = model_name.lower()
+    pipeline_cls = get_pipeline_cls(router_name)
+    if not pipeline_cls:
+        raise Exception("Model not supported")
+
+    settings = build_settings(router_name, model_name)
+    config = build_config(user_config)
+    key = (router_name, astuple(settings))
+    with _pipelines_lock:
+        base = _pipelines.get(key)
+        if base is not None:
+            _pipelines.move_to_end(key)
+            PIPELINE_CACHE.inc(result="hit")
+    if base is None:
+        PIPELINE_CACHE.inc(result="miss")
+        base = pipeline_cls(settings, config)
+        if getattr(base, "client", None) is None:
+            raise Exception(f"Failed to initialise the {router_name} client")
+        base.router_name = router_name
+        base.model_label = model_label(router_name)
+        with _pipelines_lock:
+            base = _pipelines.setdefault(key, base)
+            while len(_pipelines) > PIPELINE_CACHE_SIZE:
+                _pipelines.popitem(last=False)
+
+    pipeline = copy.copy(base)
+    pipeline.config = config
+    return pipeline
+
+
+def model_label(router_name: str) -> str:
+    """
+    Model name for metrics labels: the one configured in <PREFIX>_MODEL_NAME, never
+    the client-supplied value (unbounded label values), else "other".
+    """
+    prefix = ROUTER_MAP.get(router_name)
+    return (prefix and get_all_env_values().get(f"{prefix}_MODEL_NAME")) or "other"
+
+
+def pipeline_key(pipeline) -> tuple:
+    """(router, settings, config) of a pipeline from get_pipeline."""
+    return (pipeline.router_name, astuple(pipeline.settings), astuple(pipeline.config))
+
+
+class SingleFlight:
+    """
+    Run one call per key at a time: callers arriving while a call with the same key
+    is in flight wait for it and get the same result (or exception). The call runs
+    in its own task, so a cancelled caller does not cancel it for the others; it is
+    cancelled only when every caller has gone. Finished calls are forgotten at once,
+    nothing is cached.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn):
+        """
+        Returns:
+            tuple: (result of `fn()`, True if it was shared with an earlier caller).
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[key] = [asyncio.ensure_future(fn()), 0]
+            call[0].add_done_callback(lambda _: self._forget(key, call))
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0]), shared
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                # Không còn ai chờ kết quả: huỷ lời gọi upstream, trả slot của scheduler
+                call[0].cancel()
+                self._forget(key, call)
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+_flights = weakref.WeakKeyDictionary()
+
+
+def get_single_flight() -> SingleFlight:
+    """SingleFlight of the running event loop (its tasks belong to that loop)."""
+    loop = asyncio.get_running_loop()
+    with _limiters_lock:
+        flight = _flights.get(loop)
+        if flight is None:
+            flight = _flights[loop] = SingleFlight()
+        return flight
+
+
+Gauge(
+    "chat_in_flight_calls", "Distinct upstream /chat calls in flight after coalescing.",
+    callback=lambda: {(): sum(len(f) for f in list(_flights.values()))},
+)
+
+
+async def chat(
+    chat: str,
+    model_name: str,
+    router_name: str,
+    config: Optional[dict] = None,
+    priority: str = INTERACTIVE,
+    tenant: Optional[str] = None,
+) -> dict:
+    """
+    Send one prompt through the router's pipeline once its scheduler grants a slot
+    to (`priority`, `tenant`): "interactive" for users waiting on the answer,
+    "bulk" for dataset jobs. Concurrent requests with the same pipeline (router,
+    model, config), priority, tenant and prompt share one upstream call (set
+    CHAT_COALESCE=0 to disable); other tenants never wait in this tenant's queue.
+    Returns:
+        dict: {"response": ..., "status": "success" | "error"}, as returned by /chat.
+    """
+    start = time.perf_counter()
+    # Nhãn metrics chỉ nhận giá trị đã biết, không lấy nguyên chuỗi client gửi lên
+    labels = {"router": router_name.lower() if router_name.lower() in ROUTER_MAP else "other", "model": "other"}
+    try:
+        pipeline = get_pipeline(router_name, model_name, config)
+        labels["model"] = pipeline.metrics_model
+        limiter = get_limiter(router_name.lower())
+
+        async def call():
+            async with limiter.slot(priority, tenant):
+                return await pipeline.send_messages_async(chat)
+
+        if os.getenv("CHAT_COALESCE", "1") != "0":
+            response, shared = await get_single_flight().do(
+                (pipeline_key(pipeline), priority, tenant or DEFAULT_TENANT, chat), call
+            )
+            if shared:
+                CHAT_COALESCED.inc(**labels)
+        else:
+            response = await call()
+        # Pipeline bắt lỗi và trả về chuỗi "<Error> ..." thay vì raise
+        failed = isinstance(response, str) and response.startswith("<Error>")
+        CHAT_REQUESTS.inc(status="error" if failed else "success", **labels)
+        return handle_response({"response": response}, "success")
+    except Exception as e:
+        CHAT_REQUESTS.inc(status="error", **labels)
+        return handle_response({"response": f"Error: Got {e}"}, "error")
+    finally:
+        CHAT_LATENCY.observe(time.perf_counter() - start, **labels)
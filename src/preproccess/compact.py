@@ -0,0 +1,278 @@
+import os
+import re
+import csv
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from tqdm import tqdm
+
+COMPACT_STAGE_VERSION = 2
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken là tuỳ chọn
+    tiktoken = None
+
+# Xấp xỉ khi không có tiktoken: mỗi từ / dấu câu / cụm khoảng trắng dài ~ 1 token
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]| {2,}|\n")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count with tiktoken (o200k_base) when available, else a word-level estimate."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(_TOKEN_RE.findall(text))
+    return len(encoding.encode(text, disallowed_special=()))
+
+# Dòng chỉ chứa số trang: "12", "- 12 -", "Trang 3", "3/10", "Page 2 of 9"
+_PAGE_NUMBER_RE = re.compile(
+    r"^\s*(?:-\s*)?(?:(?:trang|page)\s+)?\d{1,4}(?:\s*(?:/|of|trên)\s*\d{1,4})?(?:\s*-)?\s*$",
+    re.IGNORECASE,
+)
+_DOT_LEADER_RE = re.compile(r"\s*(?:(?:\.\s?){4,}|(?:…\s?){2,})\s*")
+_UNDERSCORE_RE = re.compile(r"_{4,}")
+_LAYOUT_GAP_RE = re.compile(r" {3,}|\t+")
+_DIGITS_RE = re.compile(r"\d+")
+# Dòng mở đầu một đơn vị cấu trúc: không được nối vào dòng trước
+_STRUCTURE_RE = re.compile(
+    r"^(?:Phần|Chương|Mục|Tiểu mục|Điều|Khoản|Điểm|Phụ lục|PHẦN|CHƯƠNG|MỤC|ĐIỀU|PHỤ LỤC)\b"
+    r"|^(?:\d+(?:\.\d+)*[.)]|[a-zđ][)]|[IVXLC]+[.)]|[-–+•*])\s"
+)
+
+
+@dataclass
+class CompactStats:
+    chars_in: int
+    chars_out: int
+    tokens_in: int
+    tokens_out: int
+    headers: int = 0
+    page_numbers: int = 0
+    leaders: int = 0
+    joined_lines: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.tokens_saved / self.tokens_in if self.tokens_in else 0.0
+
+
+def _edge_keys(lines: List[str]) -> dict:
+    """
+    Candidate header/footer lines of a page: line index -> key. The outermost lines
+    are compared with digits ignored (page numbers, issue numbers); the next ones
+    only when identical. Structural lines ("Điều 3.") are never candidates.
+    """
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    keys = {}
+    for pos, exact in ((0, False), (-1, False), (1, True), (-2, True)):
+        if -len(content) <= pos < len(content):
+            i = content[pos]
+            line = lines[i].strip()
+            if i not in keys and not _STRUCTURE_RE.match(line):
+                keys[i] = f"={line}" if exact else _DIGITS_RE.sub("#", line)
+    return keys
+
+
+def _repeated_edges(pages: List[List[str]], min_pages: int, min_share: float) -> set:
+    """Header/footer keys repeated on most pages."""
+    if len(pages) < min_pages:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        counts.update(set(_edge_keys(lines).values()))
+    return {key for key, count in counts.items() if count / len(pages) >= min_share}
+
+
+def _page_number_lines(lines: List[str], after_break: bool, before_break: bool) -> set:
+    """
+    Indices of page-number-only lines right next to a form feed (first content line
+    after it, last one before it). Number-only lines inside a page are kept: years,
+    article numbers and table cells look the same.
+    """
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    if not content:
+        return set()
+    candidates = ([content[0]] if after_break else []) + ([content[-1]] if before_break else [])
+    return {i for i in candidates if _PAGE_NUMBER_RE.match(lines[i])}
+
+
+def _joinable(prev: str, line: str) -> bool:
+    # pdftotext ngắt dòng giữa câu: nối khi dòng sau bắt đầu bằng chữ thường
+    return bool(prev) and bool(line) and line[0].islower() and not _STRUCTURE_RE.match(line) and prev[-1] not in ".:;!?"
+
+
+def compact_text(
+    text: str,
+    min_pages: int = 3,
+    min_share: float = 0.5,
+    join_lines: bool = True,
+) -> Tuple[str, CompactStats]:
+    """
+    Remove layout boilerplate from pdftotext output while keeping the legal structure.
+
+    - repeated page headers/footers (same line, digits ignored, on >= `min_share` of pages)
+    - page-number-only lines next to a page break, and form feeds
+    - dot leaders / ellipsis runs (kept as a single "…") and long underscore runs
+    - layout indentation and column gaps (runs of 3+ spaces become 2)
+    - blank-line runs, and line wraps inside a sentence when `join_lines`
+
+    Lines that start a structural unit (Chương, Mục, Điều, "1.", "a)"...) always stay
+    on their own line.
+
+    Returns:
+        tuple: (compacted text, CompactStats)
+    """
+    pages = [page.split("\n") for page in text.split("\f")]
+    repeated = _repeated_edges(pages, min_pages, min_share)
+    stats = CompactStats(chars_in=len(text), chars_out=0, tokens_in=estimate_tokens(text), tokens_out=0)
+
+    out: List[str] = []
+    for n, lines in enumerate(pages):
+        edges = _edge_keys(lines) if repeated else {}
+        page_number_lines = _page_number_lines(lines, after_break=n > 0, before_break=n < len(pages) - 1)
+        for i, line in enumerate(lines):
+            if edges.get(i) in repeated:
+                stats.headers += 1
+                continue
+            if i in page_number_lines:
+                stats.page_numbers += 1
+                continue
+            line, n_leaders = _DOT_LEADER_RE.subn(" … ", line)
+            stats.leaders += n_leaders
+            line = _UNDERSCORE_RE.sub("___", line)
+            line = _LAYOUT_GAP_RE.sub("  ", line.strip())
+
+            if not line:
+                if out and out[-1] != "":
+                    out.append("")
+                continue
+            if join_lines and out and _joinable(out[-1], line):
+                out[-1] = f"{out[-1]} {line}"
+                stats.joined_lines += 1
+                continue
+            out.append(line)
+
+    compacted = "\n".join(out).strip()
+    stats.chars_out = len(compacted)
+    stats.tokens_out = estimate_tokens(compacted)
+    return compacted, stats
+
+
+def _compact_file(args) -> Tuple[str, Optional[dict], Optional[str]]:
+    input_path, output_path, options = args
+    try:
+        with open(input_path, "r", encoding="utf-8", errors="replace") as f:
+            compacted, stats = compact_text(f.read(), **options)
+        tmp_path = output_path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(compacted)
+        os.replace(tmp_path, output_path)
+        return os.path.basename(input_path), asdict(stats), None
+    except Exception as e:
+        return os.path.basename(input_path), None, f"{type(e).__name__}: {e}"
+
+
+def compact_folder(
+    input_txt_dir: str,
+    output_txt_dir: str,
+    report_csv: Optional[str] = None,
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+    **options,
+) -> dict:
+    """
+    Compact every TXT of a folder on a process pool and report token savings per
+    document. The output folder can replace the raw TXT folder for make_csv,
+    build_dataset or generate_json_folder.
+    Returns:
+        dict: {"total", "cached", "failed", "tokens_in", "tokens_out"}
+    """
+    if not os.path.exists(input_txt_dir):
+        raise FileNotFoundError(f"Không tìm thấy thư mục TXT: {input_txt_dir}")
+    os.makedirs(output_txt_dir, exist_ok=True)
+    files = sorted(f for f in os.listdir(input_txt_dir) if f.endswith(".txt"))
+
+    store = None
+    hashes = {}
+    if use_cache:
+        from src.utils.artifact_store import get_artifact_store, stage_key
+
+        store = get_artifact_store()
+        key = stage_key("compact", COMPACT_STAGE_VERSION, options)
+
+    tasks = []
+    cached = 0
+    for file in files:
+        input_path = os.path.join(input_txt_dir, file)
+        output_path = os.path.join(output_txt_dir, file)
+        if store is not None:
+            hashes[file] = store.hash_file(input_path)
+            if store.reuse(key, hashes[file], output_path):
+                cached += 1
+                continue
+        tasks.append((input_path, output_path, options))
+
+    rows = []
+    failed = {}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_compact_file, tasks, chunksize=32)
+        for file, stats, error in tqdm(results, total=len(tasks), desc="🗜️ Compacting TXT"):
+            if error:
+                failed[file] = error
+                continue
+            rows.append({"file": file, **stats})
+            if store is not None:
+                store.put(key, hashes[file], os.path.join(output_txt_dir, file))
+
+    tokens_in = sum(r["tokens_in"] for r in rows)
+    tokens_out = sum(r["tokens_out"] for r in rows)
+    if report_csv and rows:
+        with open(report_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) + ["saved_ratio"])
+            writer.writeheader()
+            for r in rows:
+                writer.writerow({**r, "saved_ratio": round(1 - r["tokens_out"] / r["tokens_in"], 4) if r["tokens_in"] else 0})
+
+    saved = 1 - tokens_out / tokens_in if tokens_in else 0.0
+    method = "tiktoken" if _encoding() is not None else "ước lượng"
+    print(f"✅ Đã nén {len(rows)} file ({cached} dùng lại, {len(failed)} lỗi): "
+          f"{tokens_in:,} → {tokens_out:,} token ({saved:.1%} tiết kiệm, {method})")
+    return {"total": len(files), "cached": cached, "failed": failed, "tokens_in": tokens_in, "tokens_out": tokens_out}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strip layout boilerplate from TXT files before sending them to an LLM")
+    parser.add_argument("input_txt_dir")
+    parser.add_argument("output_txt_dir")
+    parser.add_argument("--report", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-join-lines", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    compact_folder(
+        args.input_txt_dir,
+        args.output_txt_dir,
+        report_csv=args.report,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        join_lines=not args.no_join_lines,
+    )
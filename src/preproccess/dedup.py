@@ -0,0 +1,289 @@
+import os
+import re
+import csv
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# Số nguyên tố Mersenne 2^31 - 1: a * x + b luôn nằm gọn trong uint64
+_PRIME = np.uint64((1 << 31) - 1)
+_MAX_HASH = np.uint64((1 << 31) - 1)
+_WORD_RE = re.compile(r"\w+")
+_BLOCK = 4096
+
+
+def shingles(text: str, k: int = 5) -> np.ndarray:
+    """
+    Hashed word k-gram shingles of a lower-cased text.
+    Returns:
+        np.ndarray: Unique 31-bit shingle hashes (uint64), empty for an empty text.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) < k:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    return np.unique(hashes % _PRIME)
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def minhash(shingle_hashes: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """MinHash signature of one shingle set under the permutations (a * x + b) mod p."""
+    signature = np.full(len(a), _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(shingle_hashes), _BLOCK):
+        block = shingle_hashes[start:start + _BLOCK]
+        hashed = (a[:, None] * block[None, :] + b[:, None]) % _PRIME
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature
+
+
+def _signature_chunk(args) -> Tuple[np.ndarray, np.ndarray]:
+    items, from_files, num_perm, shingle_size, seed = args
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(items), num_perm), dtype=np.uint64)
+    empty = np.zeros(len(items), dtype=bool)
+    for i, item in enumerate(items):
+        if from_files:
+            with open(item, "r", encoding="utf-8", errors="replace") as f:
+                item = f.read()
+        hashes = shingles(item if isinstance(item, str) else "", shingle_size)
+        empty[i] = len(hashes) == 0
+        signatures[i] = minhash(hashes, a, b)
+    return signatures, empty
+
+
+def compute_signatures(
+    items: Sequence[str],
+    from_files: bool = False,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    seed: int = 1,
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MinHash signatures for many documents across a process pool, preserving order.
+    Args:
+        items (Sequence[str]): Texts, or file paths when `from_files` is set (workers
+            read the files themselves so the texts are not pickled to them).
+        workers (int, optional): Number of processes; defaults to the CPU count.
+    Returns:
+        tuple: (signatures of shape (n, num_perm), boolean mask of empty documents)
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    chunks = [
+        (items[i:i + chunksize], from_files, num_perm, shingle_size, seed)
+        for i in range(0, len(items), chunksize)
+    ]
+    if not chunks:
+        return np.empty((0, num_perm), dtype=np.uint64), np.empty(0, dtype=bool)
+
+    progress = tqdm(total=len(items), desc="🧬 MinHash", mininterval=1)
+    parts = []
+    if workers <= 1 or len(chunks) == 1:
+        for chunk in chunks:
+            parts.append(_signature_chunk(chunk))
+            progress.update(len(chunk[0]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk, part in zip(chunks, executor.map(_signature_chunk, chunks)):
+                parts.append(part)
+                progress.update(len(chunk[0]))
+    progress.close()
+    return np.vstack([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows <= num_perm so that the LSH S-curve
+    (1/bands) ** (1/rows) sits closest to `threshold`.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands == 0:
+            break
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            # Gốc luôn là phần tử có chỉ số nhỏ nhất => đại diện ổn định theo thứ tự đầu vào
+            if ry < rx:
+                rx, ry = ry, rx
+            self.parent[ry] = rx
+
+
+def cluster_signatures(
+    signatures: np.ndarray,
+    empty: np.ndarray,
+    threshold: float = 0.8,
+    bands: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Group documents whose estimated Jaccard similarity reaches `threshold`.
+
+    Signatures are split into bands; documents sharing a bucket in any band are
+    candidates and are linked only if their signature agreement (the MinHash
+    estimate of Jaccard) is at least `threshold`. Empty documents stay alone.
+
+    Returns:
+        np.ndarray: For each document, the index of its cluster representative
+            (the first document of the cluster in input order).
+    """
+    n, num_perm = signatures.shape
+    if bands is None:
+        bands, rows = optimal_bands(threshold, num_perm)
+    else:
+        rows = num_perm // bands
+    uf = _UnionFind(n)
+    live = np.flatnonzero(~empty)
+
+    for band in range(bands):
+        band_sig = np.ascontiguousarray(signatures[live, band * rows:(band + 1) * rows])
+        keys = band_sig.view(np.dtype((np.void, band_sig.dtype.itemsize * rows))).ravel()
+        _, bucket, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = counts[bucket] > 1
+        if not shared.any():
+            continue
+        members = live[shared]
+        buckets = bucket[shared]
+        order = np.argsort(buckets, kind="stable")
+        members, buckets = members[order], buckets[order]
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        for group in np.split(members, starts[1:]):
+            head = group[0]
+            agreement = (signatures[group[1:]] == signatures[head]).mean(axis=1)
+            for other in group[1:][agreement >= threshold]:
+                uf.union(int(head), int(other))
+
+    return np.array([uf.find(i) for i in range(n)], dtype=np.int64)
+
+
+def find_near_duplicates(
+    items: Sequence[str],
+    threshold: float = 0.8,
+    from_files: bool = False,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Near-duplicate clustering with shingles, MinHash and LSH banding.
+    Args:
+        items (Sequence[str]): Texts, or file paths with `from_files`.
+        threshold (float): Minimum estimated Jaccard similarity of word shingles.
+    Returns:
+        np.ndarray: Representative index for each item.
+    """
+    signatures, empty = compute_signatures(items, from_files, num_perm, shingle_size, workers=workers)
+    return cluster_signatures(signatures, empty, threshold)
+
+
+def _write_clusters(output_csv: str, keys: List[str], representatives: np.ndarray):
+    sizes = np.bincount(representatives, minlength=len(keys))
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["key", "cluster_id", "representative", "cluster_size"])
+        writer.writeheader()
+        for i, key in enumerate(keys):
+            rep = int(representatives[i])
+            writer.writerow({
+                "key": key,
+                "cluster_id": rep,
+                "representative": keys[rep],
+                "cluster_size": int(sizes[rep]),
+            })
+    duplicates = int((representatives != np.arange(len(keys))).sum())
+    clusters = int((sizes > 1).sum())
+    print(f"✅ {len(keys)} văn bản, {clusters} cụm trùng lặp, {duplicates} bản gần trùng có thể bỏ qua: {output_csv}")
+
+
+def dedup_folder(input_txt_dir: str, output_csv: str, threshold: float = 0.8, **kwargs) -> Dict[str, str]:
+    """
+    Cluster the TXT files of a folder and write key/cluster_id/representative rows.
+    Returns:
+        dict: file name -> representative file name.
+    """
+    if not os.path.exists(input_txt_dir):
+        raise FileNotFoundError(f"Không tìm thấy thư mục TXT: {input_txt_dir}")
+    files = sorted(f for f in os.listdir(input_txt_dir) if f.endswith(".txt"))
+    paths = [os.path.join(input_txt_dir, f) for f in files]
+    representatives = find_near_duplicates(paths, threshold, from_files=True, **kwargs)
+    _write_clusters(output_csv, files, representatives)
+    return {f: files[r] for f, r in zip(files, representatives)}
+
+
+def dedup_csv(
+    input_csv: str,
+    output_csv: str,
+    column: str = "context",
+    key_column: str = "title",
+    threshold: float = 0.8,
+    **kwargs,
+) -> Dict[str, str]:
+    """
+    Cluster the rows of a dataset CSV (e.g. the one from make_csv / the HF dataset)
+    on its `column` text.
+    Returns:
+        dict: key -> representative key.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(input_csv, usecols=[key_column, column], dtype=str, keep_default_na=False)
+    keys = df[key_column].tolist()
+    representatives = find_near_duplicates(df[column].tolist(), threshold, **kwargs)
+    _write_clusters(output_csv, keys, representatives)
+    return {k: keys[r] for k, r in zip(keys, representatives)}
+
+
+def load_duplicates(clusters_csv: str) -> Set[str]:
+    """Keys that are not the representative of their cluster, i.e. safe to skip."""
+    with open(clusters_csv, "r", encoding="utf-8", newline="") as f:
+        return {row["key"] for row in csv.DictReader(f) if row["key"] != row["representative"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate detection (MinHash LSH) over a TXT folder or dataset CSV")
+    parser.add_argument("input", help="Folder of .txt files or a CSV with a text column")
+    parser.add_argument("output_csv")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--shingle-size", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--column", default="context")
+    parser.add_argument("--key-column", default="title")
+    args = parser.parse_args()
+    options = dict(num_perm=args.num_perm, shingle_size=args.shingle_size, workers=args.workers)
+    if os.path.isdir(args.input):
+        dedup_folder(args.input, args.output_csv, args.threshold, **options)
+    else:
+        dedup_csv(args.input, args.output_csv, args.column, args.key_column, args.threshold, **options)
@@ -0,0 +1,309 @@
+import os
+import re
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(s: str):
+        return orjson.loads(s)
+except ImportError:  # pragma: no cover - orjson là tuỳ chọn
+    orjson = None
+
+    def _loads(s: str):
+        return json.loads(s)
+
+# Tên các bước sửa lỗi được ghi lại cho từng response
+REPAIR_FENCE = "fence"
+REPAIR_PROSE = "prose"
+REPAIR_COMMENTS = "comments"
+REPAIR_TRAILING_COMMA = "trailing_comma"
+REPAIR_ESCAPES = "escapes"
+REPAIR_CONTROL_CHARS = "control_chars"
+REPAIR_ESCAPED_QUOTES = "escaped_quotes"
+REPAIR_TRUNCATED = "truncated"
+REPAIR_DOUBLE_ENCODED = "double_encoded"
+FAIL_EMPTY = "empty"
+FAIL_NO_JSON = "no_json"
+FAIL_INVALID = "invalid"
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?")
+_STRING_SPECIAL_RE = re.compile(r'["\\\x00-\x1f]')
+_OUTSIDE_SPECIAL_RE = re.compile(r'["{}\[\],:/]')
+_VALID_STRING_RE = re.compile(r'[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"')
+_HEX4_RE = re.compile(r"[0-9a-fA-F]{4}")
+_ESCAPED_OBJECT_RE = re.compile(r'^[{\[]\s*\\"')
+_VALID_ESCAPES = set('"\\/bfnrt')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+# Trạng thái của một object/array đang mở
+_KEY, _COLON, _VALUE, _AFTER = range(4)
+
+
+def _strip_fence(text: str, repairs: List[str]) -> str:
+    start = text.find("```")
+    if start < 0:
+        return text
+    m = _FENCE_RE.match(text, start)
+    body_start = m.end()
+    end = text.find("```", body_start)
+    repairs.append(REPAIR_FENCE)
+    return text[body_start:] if end < 0 else text[body_start:end]
+
+
+def _scan_string(text: str, i: int, repairs: List[str]) -> Tuple[str, int, bool]:
+    """
+    Copy the JSON string starting at text[i] == '"', fixing invalid escapes and raw
+    control characters on the way.
+    Returns:
+        tuple: (string literal including quotes, index after it, closed)
+    """
+    m = _VALID_STRING_RE.match(text, i + 1)
+    if m is not None:
+        # Đường nhanh: chuỗi hợp lệ, copy nguyên khối
+        return text[i:m.end()], m.end(), True
+
+    parts = ['"']
+    j = i + 1
+    n = len(text)
+    while True:
+        m = _STRING_SPECIAL_RE.search(text, j)
+        if m is None:
+            parts.append(text[j:])
+            parts.append('"')
+            return "".join(parts), n, False
+        k = m.start()
+        parts.append(text[j:k])
+        c = text[k]
+        if c == '"':
+            parts.append('"')
+            return "".join(parts), k + 1, True
+        if c == "\\":
+            nxt = text[k + 1] if k + 1 < n else ""
+            if nxt in _VALID_ESCAPES and nxt:
+                parts.append(text[k:k + 2])
+                j = k + 2
+            elif nxt == "u" and _HEX4_RE.match(text, k + 2):
+                parts.append(text[k:k + 6])
+                j = k + 6
+            elif not nxt:
+                # Bị cắt ngay sau dấu "\": bỏ đi
+                parts.append('"')
+                return "".join(parts), n, False
+            else:
+                if REPAIR_ESCAPES not in repairs:
+                    repairs.append(REPAIR_ESCAPES)
+                parts.append("\\\\")
+                j = k + 1
+        else:
+            if REPAIR_CONTROL_CHARS not in repairs:
+                repairs.append(REPAIR_CONTROL_CHARS)
+            parts.append(_CONTROL_ESCAPES.get(c, "\\u%04x" % ord(c)))
+            j = k + 1
+
+
+def _drop_trailing_commas(out: List[str]) -> bool:
+    dropped = False
+    while out and out[-1].strip() in ("", ","):
+        if out[-1].strip() == ",":
+            dropped = True
+        out.pop()
+    return dropped
+
+
+def _repair(text: str, repairs: List[str]) -> str:
+    """
+    One pass over `text` (which starts with '{' or '['): drops comments and trailing
+    commas, fixes strings, stops at the end of the first value and closes whatever a
+    truncated response left open.
+    """
+    out: List[str] = []
+    stack: List[list] = []  # [kind, state, out index of current key, out index of current value]
+    i = 0
+    n = len(text)
+    while i < n:
+        m = _OUTSIDE_SPECIAL_RE.search(text, i)
+        k = m.start() if m else n
+        chunk = text[i:k]
+        if chunk:
+            if chunk.strip() and stack:
+                frame = stack[-1]
+                if frame[1] == _VALUE:
+                    frame[1] = _AFTER
+                    frame[3] = len(out)
+            out.append(chunk)
+        if m is None:
+            break
+        c = text[k]
+        i = k + 1
+
+        if c == '"':
+            literal, i, closed = _scan_string(text, k, repairs)
+            frame = stack[-1] if stack else None
+            if frame is not None and frame[0] == "{" and frame[1] == _KEY:
+                frame[2] = len(out)
+                frame[1] = _COLON
+            elif frame is not None:
+                frame[3] = len(out)
+                frame[1] = _AFTER
+            out.append(literal)
+            if not closed and frame is not None and frame[1] == _COLON:
+                # Khoá bị cắt giữa chừng: bỏ luôn khoá đó
+                del out[frame[2]:]
+            if not closed:
+                break
+        elif c in "{[":
+            if stack:
+                stack[-1][1] = _AFTER
+                stack[-1][3] = len(out)
+            stack.append([c, _KEY if c == "{" else _VALUE, len(out), len(out)])
+            out.append(c)
+        elif c in "}]":
+            if _drop_trailing_commas(out) and REPAIR_TRAILING_COMMA not in repairs:
+                repairs.append(REPAIR_TRAILING_COMMA)
+            out.append(c)
+            if stack:
+                stack.pop()
+            if not stack:
+                if text[i:].strip() and REPAIR_PROSE not in repairs:
+                    repairs.append(REPAIR_PROSE)
+                return "".join(out)
+        elif c == ":":
+            if stack:
+                stack[-1][1] = _VALUE
+            out.append(c)
+        elif c == ",":
+            if stack:
+                stack[-1][1] = _KEY if stack[-1][0] == "{" else _VALUE
+            out.append(c)
+        elif c == "/":
+            nxt = text[i] if i < n else ""
+            if nxt == "/":
+                end = text.find("\n", i)
+                i = n if end < 0 else end
+            elif nxt == "*":
+                end = text.find("*/", i + 1)
+                i = n if end < 0 else end + 2
+            else:
+                out.append(c)
+                continue
+            if REPAIR_COMMENTS not in repairs:
+                repairs.append(REPAIR_COMMENTS)
+
+    if stack:
+        repairs.append(REPAIR_TRUNCATED)
+        while stack:
+            kind, state, key_start, value_start = stack.pop()
+            if kind == "{" and state in (_COLON, _VALUE):
+                # Khoá chưa có giá trị: bỏ cả khoá
+                del out[key_start:]
+            elif state == _AFTER and value_start < len(out) and not out[value_start].lstrip().startswith(('"', "{", "[")):
+                # Literal số / true / false bị cắt dở: chỉ giữ nếu nó hợp lệ
+                try:
+                    _loads(out[value_start].strip())
+                except Exception:
+                    del out[key_start if kind == "{" else value_start:]
+            _drop_trailing_commas(out)
+            out.append("}" if kind == "{" else "]")
+    return "".join(out)
+
+
+def parse_llm_json(s: Any) -> Tuple[Optional[Any], List[str]]:
+    """
+    Parse a model response into a JSON value, repairing common defects.
+
+    Handles code fences, prose before/after the JSON, `//` and `/* */` comments copied
+    from the schema, trailing commas, invalid backslash escapes, raw newlines inside
+    strings, quotes escaped as in a stringified object, and truncated output.
+
+    Args:
+        s (Any): The raw response text.
+    Returns:
+        tuple: (parsed value or None, list of repairs applied / failure reason)
+    """
+    if not isinstance(s, str) or not s.strip():
+        return None, [FAIL_EMPTY]
+
+    text = s.strip()
+    try:
+        return _unwrap(_loads(text), [])
+    except Exception:
+        pass
+
+    repairs: List[str] = []
+    text = _strip_fence(text, repairs)
+
+    starts = [p for p in (text.find("{"), text.find("[")) if p >= 0]
+    if not starts:
+        return None, repairs + [FAIL_NO_JSON]
+    start = min(starts)
+    if text[:start].strip():
+        repairs.append(REPAIR_PROSE)
+    text = text[start:]
+
+    if _ESCAPED_OBJECT_RE.match(text):
+        text = text.replace('\\"', '"')
+        repairs.append(REPAIR_ESCAPED_QUOTES)
+
+    candidate = _repair(text, repairs)
+    try:
+        value = _loads(candidate)
+    except Exception:
+        try:
+            value = json.loads(candidate, strict=False)
+        except Exception:
+            return None, repairs + [FAIL_INVALID]
+    return _unwrap(value, repairs)
+
+
+def _unwrap(value: Any, repairs: List[str]) -> Tuple[Any, List[str]]:
+    # Model trả về object bị stringify thêm một lần: "{\"so_hieu\": ...}"
+    if isinstance(value, str) and value.lstrip()[:1] in ("{", "["):
+        inner, inner_repairs = parse_llm_json(value)
+        if inner is not None:
+            return inner, repairs + [REPAIR_DOUBLE_ENCODED] + inner_repairs
+    return value, repairs
+
+
+def _parse_chunk(chunk: List[Any]) -> List[Tuple[Optional[Any], List[str]]]:
+    return [parse_llm_json(s) for s in chunk]
+
+
+def parse_many(
+    responses: Iterable[Any],
+    workers: Optional[int] = None,
+    chunksize: int = 2000,
+) -> List[Tuple[Optional[Any], List[str]]]:
+    """
+    Parse many responses across a process pool, preserving order.
+    Args:
+        responses (Iterable): Raw response texts.
+        workers (int, optional): Number of processes; defaults to the CPU count.
+            With 1 worker (or a small input) everything runs in-process.
+        chunksize (int): Responses sent to a worker at a time.
+    Returns:
+        list: One (value, repairs) tuple per response.
+    """
+    responses = list(responses)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(responses) <= chunksize:
+        return _parse_chunk(responses)
+
+    chunks = [responses[i:i + chunksize] for i in range(0, len(responses), chunksize)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(_parse_chunk, chunks):
+            results.extend(part)
+    return results
+
+
+def repair_stats(results: Iterable[Tuple[Optional[Any], List[str]]]) -> Counter:
+    """Count how often each repair / failure reason occurred."""
+    stats = Counter()
+    for value, repairs in results:
+        stats["ok" if value is not None else "failed"] += 1
+        stats.update(repairs or ["clean"])
+    return stats
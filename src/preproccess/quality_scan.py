@@ -0,0 +1,290 @@
+import os
+import re
+import csv
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from tqdm import tqdm
+
+from src.generate.pdf_extract import LOADING_PLACEHOLDER, garbled_ratio
+
+SEVERITY_QUARANTINE = "quarantine"
+SEVERITY_WARN = "warn"
+
+_VIETNAMESE_RE = re.compile(
+    "[àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ"
+    "ÀÁẢÃẠĂẰẮẲẴẶÂẦẤẨẪẬÈÉẺẼẸÊỀẾỂỄỆÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴĐ]"
+)
+# UTF-8 tiếng Việt bị giải mã nhầm thành cp1252/latin-1: "Ä‘", "Æ°", "á»", "Ã¡"...
+_MOJIBAKE_RE = re.compile(r"á[º»]|Ã[\xa0-\xbf]|Ä[\x80-\xbf‘]|Æ[°¯]|â€")
+# Byte không phải chữ ASCII và không phải byte đầu của ký tự UTF-8 nhiều byte
+_NON_LETTER_BYTES = bytes(b for b in range(256) if not (chr(b).isalpha() and b < 128 or b >= 0xC0))
+
+
+@dataclass
+class Document:
+    """
+    What a rule sees for one file.
+    Args:
+        name (str): File name.
+        text (str): Decoded text (invalid UTF-8 replaced by U+FFFD).
+        raw (bytes): The file content.
+        valid_utf8 (bool): Whether the raw bytes were valid UTF-8.
+    """
+    name: str
+    text: str
+    raw: bytes = b""
+    valid_utf8: bool = True
+    _cache: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def chars(self) -> int:
+        if "chars" not in self._cache:
+            self._cache["chars"] = len("".join(self.text.split()))
+        return self._cache["chars"]
+
+    @property
+    def pages(self) -> List[str]:
+        if "pages" not in self._cache:
+            self._cache["pages"] = [p for p in self.text.split("\f") if p.strip()]
+        return self._cache["pages"]
+
+    @property
+    def letters(self) -> int:
+        """ASCII letters plus non-ASCII characters, counted on the raw bytes."""
+        if "letters" not in self._cache:
+            self._cache["letters"] = len(self.raw.translate(None, _NON_LETTER_BYTES))
+        return self._cache["letters"]
+
+
+# Một rule nhận Document và trả về chi tiết lỗi (str) hoặc None nếu đạt
+Rule = Callable[[Document], Optional[str]]
+
+RULES: Dict[str, Rule] = {}
+SEVERITIES: Dict[str, str] = {}
+
+
+def register_rule(name: str, severity: str = SEVERITY_QUARANTINE):
+    """Decorator adding a rule to the registry under `name`."""
+    def decorator(func: Rule) -> Rule:
+        RULES[name] = func
+        SEVERITIES[name] = severity
+        return func
+    return decorator
+
+
+@register_rule("placeholder")
+def placeholder_rule(doc: Document) -> Optional[str]:
+    if LOADING_PLACEHOLDER in doc.text:
+        return f"contains '{LOADING_PLACEHOLDER}'"
+    return None
+
+
+@register_rule("empty")
+def empty_rule(doc: Document, min_chars: int = 200) -> Optional[str]:
+    if doc.chars < min_chars:
+        return f"{doc.chars} chars"
+    return None
+
+
+@register_rule("encoding")
+def encoding_rule(doc: Document, max_garbled_ratio: float = 0.02) -> Optional[str]:
+    if not doc.valid_utf8:
+        return "invalid utf-8"
+    ratio = garbled_ratio(doc.text)
+    if ratio > max_garbled_ratio:
+        return f"garbled {ratio:.1%}"
+    return None
+
+
+@register_rule("mojibake")
+def mojibake_rule(doc: Document, max_ratio: float = 0.005) -> Optional[str]:
+    if not doc.letters:
+        return None
+    hits = len(_MOJIBAKE_RE.findall(doc.text))
+    if hits / doc.letters > max_ratio:
+        return f"{hits} mojibake sequences"
+    return None
+
+
+@register_rule("low_vietnamese")
+def low_vietnamese_rule(doc: Document, min_ratio: float = 0.05, min_letters: int = 500) -> Optional[str]:
+    if doc.letters < min_letters:
+        return None
+    vietnamese = len(_VIETNAMESE_RE.findall(doc.text))
+    ratio = vietnamese / doc.letters
+    if ratio < min_ratio:
+        return f"vietnamese chars {ratio:.1%}"
+    return None
+
+
+def _edge_lines(pages: List[str], last: bool) -> Counter:
+    lines = Counter()
+    for page in pages:
+        stripped = [line.strip() for line in page.splitlines() if line.strip()]
+        if stripped:
+            # Bỏ số trang để "Trang 3" và "Trang 4" được tính là cùng một header
+            lines[re.sub(r"\d+", "#", stripped[-1 if last else 0])] += 1
+    return lines
+
+
+@register_rule("repeated_header", severity=SEVERITY_WARN)
+def repeated_header_rule(doc: Document, min_pages: int = 3, min_share: float = 0.6) -> Optional[str]:
+    pages = doc.pages
+    if len(pages) < min_pages:
+        return None
+    for where, last in (("header", False), ("footer", True)):
+        common = _edge_lines(pages, last).most_common(1)
+        if common and common[0][1] / len(pages) >= min_share and len(common[0][0]) > 1:
+            return f"{where} on {common[0][1]}/{len(pages)} pages: {common[0][0][:60]!r}"
+    return None
+
+
+@dataclass
+class ScanResult:
+    file: str
+    size: int
+    chars: int = 0
+    pages: int = 0
+    issues: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def quarantined(self) -> bool:
+        return self.error is not None or any(
+            SEVERITIES.get(name, SEVERITY_QUARANTINE) == SEVERITY_QUARANTINE for name in self.issues
+        )
+
+
+def _read(path: str):
+    # Các rule cần cả text đã giải mã, nên đọc thẳng một lần (mmap rồi copy không tiết kiệm gì)
+    with open(path, "rb") as f:
+        raw = f.read()
+    return raw, len(raw)
+
+
+def scan_file(path: str, rules: Sequence[Union[str, Rule]]) -> ScanResult:
+    """Run `rules` (registry names or callables) over one file."""
+    name = os.path.basename(path)
+    try:
+        raw, size = _read(path)
+    except OSError as e:
+        return ScanResult(file=name, size=0, error=str(e))
+    try:
+        text, valid = raw.decode("utf-8"), True
+    except UnicodeDecodeError:
+        text, valid = raw.decode("utf-8", errors="replace"), False
+
+    doc = Document(name=name, text=text, raw=raw, valid_utf8=valid)
+    result = ScanResult(file=name, size=size, chars=doc.chars, pages=len(doc.pages))
+    for rule in rules:
+        func = RULES[rule] if isinstance(rule, str) else rule
+        rule_name = rule if isinstance(rule, str) else rule.__name__
+        try:
+            detail = func(doc)
+        except Exception as e:
+            detail = f"rule error: {e}"
+        if detail:
+            result.issues[rule_name] = detail
+    return result
+
+
+def _scan_chunk(args) -> List[ScanResult]:
+    paths, rules = args
+    return [scan_file(p, rules) for p in paths]
+
+
+def scan_folder(
+    folder_path: str,
+    report_csv: Optional[str] = None,
+    quarantine_list: Optional[str] = None,
+    rules: Optional[Iterable[Union[str, Rule]]] = None,
+    workers: Optional[int] = None,
+    chunksize: int = 256,
+) -> List[ScanResult]:
+    """
+    Check every TXT of a folder against a set of quality rules on a process pool.
+    Nothing is deleted: results go to a CSV report and a quarantine list (one file
+    name per line, without extension).
+
+    Args:
+        folder_path (str): Folder of TXT files.
+        report_csv (str, optional): Where to write file/size/chars/pages/issues rows.
+        quarantine_list (str, optional): Where to write the names of files to exclude.
+        rules (Iterable, optional): Rule names from RULES and/or callables
+            `rule(doc) -> Optional[str]` (module-level, so they can be pickled).
+            Defaults to every registered rule.
+        workers (int, optional): Number of processes; defaults to the CPU count.
+    Returns:
+        List[ScanResult]: One result per file, in sorted file order.
+    """
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"Không tìm thấy thư mục TXT: {folder_path}")
+    rules = list(rules) if rules is not None else list(RULES)
+    unknown = [r for r in rules if isinstance(r, str) and r not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown rules: {unknown}. Available: {sorted(RULES)}")
+
+    with os.scandir(folder_path) as entries:
+        paths = sorted(e.path for e in entries if e.name.endswith(".txt") and e.is_file())
+    chunks = [(paths[i:i + chunksize], rules) for i in range(0, len(paths), chunksize)]
+    workers = workers or os.cpu_count() or 1
+
+    results: List[ScanResult] = []
+    progress = tqdm(total=len(paths), desc="🔍 Đang kiểm tra file", unit="file", mininterval=1)
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(_scan_chunk(chunk))
+            progress.update(len(chunk[0]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for part in executor.map(_scan_chunk, chunks):
+                results.extend(part)
+                progress.update(len(part))
+    progress.close()
+
+    quarantined = [r for r in results if r.quarantined]
+    if report_csv:
+        with open(report_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["file", "size", "chars", "pages", "action", "issues"])
+            writer.writeheader()
+            for r in results:
+                if not r.issues and r.error is None:
+                    continue
+                issues = "; ".join(f"{k}: {v}" for k, v in r.issues.items())
+                writer.writerow({
+                    "file": r.file,
+                    "size": r.size,
+                    "chars": r.chars,
+                    "pages": r.pages,
+                    "action": SEVERITY_QUARANTINE if r.quarantined else SEVERITY_WARN,
+                    "issues": r.error or issues,
+                })
+    if quarantine_list:
+        with open(quarantine_list, "w", encoding="utf-8") as f:
+            for r in quarantined:
+                f.write(f"{os.path.splitext(r.file)[0]}\n")
+
+    counts = Counter(name for r in results for name in r.issues)
+    print(f"\n✅ Đã kiểm tra {len(results)} file, {len(quarantined)} file cần cách ly")
+    for name, count in counts.most_common():
+        print(f"   - {name}: {count}")
+    if report_csv:
+        print(f"📄 Báo cáo lưu tại: {report_csv}")
+    if quarantine_list:
+        print(f"📄 Danh sách cách ly lưu tại: {quarantine_list}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel quality scan of a TXT corpus (report only, never deletes)")
+    parser.add_argument("folder_path")
+    parser.add_argument("--report", default="data/quality_report.csv")
+    parser.add_argument("--quarantine", default="data/quarantine.txt")
+    parser.add_argument("--rules", nargs="*", default=None, help=f"Subset of: {', '.join(RULES)}")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    scan_folder(args.folder_path, args.report, args.quarantine, rules=args.rules, workers=args.workers)
@@ -0,0 +1,93 @@
+import math
+from array import array
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+_EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """Set of character n-grams of `text`, padded with one space on each side."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleIndex:
+    """
+    Approximate title matcher over a catalogue of normalized titles.
+
+    Titles are indexed by character n-grams in an inverted index. A query only looks
+    at the postings of its rarest grams: if Jaccard(q, c) >= t then c shares at least
+    ceil(t * |q|) grams with q, so it must contain one of any |q| - ceil(t * |q|) + 1
+    of them (prefix filtering). Candidates are then filtered by size and scored with
+    the exact n-gram Jaccard similarity, so there is no pairwise scan of the catalogue.
+
+    Args:
+        titles (Iterable[str]): Normalized catalogue titles; the position is the id.
+        n (int): n-gram size.
+        extra_prefix (int): Look at this many more grams than the minimal prefix and
+            require extra_prefix + 1 shared grams among them, which prunes candidates
+            much harder for the same guarantee.
+    """
+
+    def __init__(self, titles: Iterable[str], n: int = 3, extra_prefix: int = 4):
+        self.n = n
+        self.extra_prefix = extra_prefix
+        self.titles: List[str] = list(titles)
+        sizes = array("I")
+        postings = defaultdict(lambda: array("I"))
+        for title_id, title in enumerate(tqdm(self.titles, desc="🗂️ Indexing titles", mininterval=1)):
+            grams = char_ngrams(title, n) if title else set()
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(title_id)
+        self.sizes = np.frombuffer(sizes, dtype=np.uint32)
+        self.postings = {gram: np.frombuffer(ids, dtype=np.uint32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def query(self, title: str, threshold: float = 0.85) -> Optional[Tuple[int, float]]:
+        """
+        Find the most similar catalogue title.
+        Args:
+            title (str): Normalized query title.
+            threshold (float): Minimum n-gram Jaccard similarity in (0, 1].
+        Returns:
+            tuple | None: (catalogue id, similarity) of the best match, or None.
+        """
+        if not title:
+            return None
+        grams = char_ngrams(title, self.n)
+        q_size = len(grams)
+        min_shared = math.ceil(threshold * q_size)
+        # Gram không có trong catalogue vẫn tính vào |q| nhưng không sinh ứng viên
+        ordered = sorted(grams, key=lambda g: len(self.postings.get(g, _EMPTY)))
+        # Mở rộng prefix thêm `extra` gram: ứng viên phải trùng ít nhất extra + 1 gram trong đó
+        extra = min(self.extra_prefix, min_shared - 1)
+        prefix = ordered[: q_size - min_shared + 1 + extra]
+
+        min_size = threshold * q_size
+        max_size = q_size / threshold
+        ids = np.concatenate([self.postings.get(gram, _EMPTY) for gram in prefix])
+        ids, counts = np.unique(ids, return_counts=True)
+        ids = ids[counts > extra]
+        sizes = self.sizes[ids]
+        candidates = ids[(sizes >= min_size) & (sizes <= max_size)].tolist()
+
+        best = None
+        for title_id in candidates:
+            other = char_ngrams(self.titles[title_id], self.n)
+            inter = len(grams & other)
+            score = inter / (q_size + len(other) - inter)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (title_id, score)
+        return best
+
+    def query_many(self, titles: Iterable[str], threshold: float = 0.85) -> List[Optional[Tuple[int, float]]]:
+        return [self.query(t, threshold) for t in tqdm(list(titles), desc="🔎 Fuzzy matching", mininterval=1)]
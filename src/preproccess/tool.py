@@ -1,10 +1,18 @@
+import os
+import numpy as np
 import pandas as pd
 from typing import List, Optional
 import json
+from collections import Counter, deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import re
 from tqdm import tqdm
 from datetime import datetime
 import unicodedata
+from src.preproccess.json_parser import parse_llm_json, FAIL_EMPTY
+from src.preproccess.title_index import TitleIndex
+from src.utils.tracing import current_span, span, traced
 
 class OutputLLMProcessor():
     def __init__(
@@ -33,15 +41,15 @@ class OutputLLMProcessor():
         return ext
     
 def safe_json_loads(s):
-    if not isinstance(s, str) or not s.strip():
-        return None
-    try:
-        cleaned = re.sub(r"^```json\s*|\s*```$", "", s.strip(), flags=re.DOTALL)
-        cleaned = cleaned.replace("\\", "")
-        return json.loads(cleaned)
-    except Exception as e:
-        print("❌ Error parsing JSON:", e)
-        return None
+    """
+    Parse an LLM response with the tolerant parser in json_parser.py.
+    Returns:
+        dict | list | None: The parsed value, or None if it could not be repaired.
+    """
+    value, repairs = parse_llm_json(s)
+    if value is None and FAIL_EMPTY not in repairs:
+        print("❌ Error parsing JSON:", ", ".join(repairs))
+    return value
 
 def safe_get(d, key):
     if isinstance(d, dict):
@@ -54,42 +62,223 @@ def format_date(date_str):
     except Exception:
         return date_str
     
+# Tên cột đầu ra -> khoá trong JSON của LLM
+FIELD_MAP = {
+    "Số hiệu": "so_hieu",
+    "Loại văn bản": "loai_vb",
+    "Lĩnh vực": "linh_vuc",
+    "Nơi ban hành": "noi_ban_hanh",
+    "Người ký": "nguoi_ky",
+    "Ngày ban hành": "ngay_ban_hanh",
+    "Ngày hiệu lực": "ngay_hieu_luc",
+    "Ngày đăng": "ngay_cong_bao",
+    "Số công báo": "so_cong_bao",
+    "Tình trạng": "tinh_trang",
+    "Nội dung": "noi_dung",
+}
+DATE_COLUMNS = ["Ngày ban hành", "Ngày hiệu lực", "Ngày đăng"]
+OUTPUT_COLUMNS = ["Tên văn bản"] + list(FIELD_MAP)
+
+def format_date_series(dates: pd.Series) -> pd.Series:
+    """Vectorized format_date: YYYY-MM-DD -> DD/MM/YYYY, other values unchanged."""
+    parsed = pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce")
+    return parsed.dt.strftime("%d/%m/%Y").where(parsed.notna(), dates)
+
+def _string_column(values: pd.Series) -> pd.Series:
+    # Giống safe_get: chỉ giữ giá trị chuỗi, đã strip
+    is_str = values.map(lambda v: isinstance(v, str))
+    return values.where(is_str, "").astype(object).str.strip()
+
+def map_fields(parsed: list, custom_ids: list) -> pd.DataFrame:
+    """
+    Map parsed LLM outputs to the output columns (without "Tên văn bản").
+    Responses that could not be parsed are dropped.
+    Returns:
+        pd.DataFrame: One row per parsed response, plus a "custom_id" column.
+    """
+    keep = [i for i, value in enumerate(parsed) if value is not None]
+    rows = [parsed[i] if isinstance(parsed[i], dict) else {} for i in keep]
+    raw = pd.DataFrame.from_records(rows, columns=list(FIELD_MAP.values()))
+
+    mapped = pd.DataFrame({"custom_id": [custom_ids[i] for i in keep]})
+    for column, key in FIELD_MAP.items():
+        mapped[column] = _string_column(raw[key]) if len(raw) else pd.Series(dtype=object)
+    mapped["Số hiệu"] = mapped["Số hiệu"].str.replace("\\", "", regex=False)
+    for column in DATE_COLUMNS:
+        mapped[column] = format_date_series(mapped[column])
+    return mapped
+
+def _parse_and_map_chunk(records: list) -> tuple:
+    """Worker: parse one chunk of {"custom_id", "context_response"} records."""
+    custom_ids = [r.get("custom_id", "") for r in records]
+    results = [parse_llm_json(r.get("context_response", "")) for r in records]
+    parsed = [value for value, _ in results]
+    skipped = [cid for cid, value in zip(custom_ids, parsed) if value is None]
+    repairs = Counter(tag for _, tags in results for tag in tags)
+    return map_fields(parsed, custom_ids), skipped, repairs
+
+def load_titles(csv_path: str, chunksize: int = 50000) -> pd.Series:
+    """
+    Read only the "title" column of the dataset CSV, chunk by chunk, so the
+    `context` column never has to be held in memory.
+    Returns:
+        pd.Series: Titles indexed by row number.
+    """
+    parts = [chunk["title"] for chunk in pd.read_csv(csv_path, usecols=["title"], chunksize=chunksize)]
+    if not parts:
+        return pd.Series(dtype=object)
+    titles = pd.concat(parts)
+    titles.index = pd.RangeIndex(len(titles))
+    return titles
+
+def _attach_titles(mapped: pd.DataFrame, titles: pd.Series) -> pd.DataFrame:
+    index = pd.to_numeric(mapped["custom_id"].astype(str).str.split("-").str[1], errors="coerce")
+    matched = titles.reindex(index).to_numpy()
+    mapped.insert(0, "Tên văn bản", [t if isinstance(t, str) else None for t in matched])
+    return mapped.drop(columns=["custom_id"])[OUTPUT_COLUMNS]
+
+def iter_json_records(path: str, columns: Optional[List[str]] = None, buffer_size: int = 1 << 20):
+    """
+    Stream objects from a JSON array file or a JSONL file without loading it whole.
+    Args:
+        path (str): Input file.
+        columns (List[str], optional): Keep only these keys of each object.
+        buffer_size (int): Characters read per refill.
+    Yields:
+        dict: One record at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        while True:
+            # Bỏ qua khoảng trắng và dấu phân cách của mảng
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf, pos = f.read(buffer_size), 0
+                eof = not buf
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(buffer_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            pos = end
+            if columns is not None:
+                obj = {c: obj.get(c) for c in columns}
+            yield obj
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class _RecordWriter:
+    """Append DataFrame chunks to a JSON array (.json) or JSON Lines (.jsonl) file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lines = path.endswith(".jsonl")
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+        if not self.lines:
+            self.f.write("[")
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.lines:
+            self.f.write(df.to_json(orient="records", force_ascii=False, lines=True).rstrip("\n") + "\n")
+            return
+        body = df.to_json(orient="records", force_ascii=False)[1:-1]
+        self.f.write(("" if self.first else ",") + "\n" + body)
+        self.first = False
+
+    def close(self):
+        if not self.lines:
+            self.f.write("\n]")
+        self.f.close()
+
+@traced("postprocess.extract")
+def extract_and_map_fields_from_file(
+    input_path: str,
+    csv_path: str,
+    output_path: str,
+    chunksize: int = 5000,
+    workers: Optional[int] = None,
+) -> dict:
+    """
+    Out-of-core version of extract_and_map_fields_from_df.
+
+    Streams {"custom_id", "context_response"} records from a merged JSON / JSONL file,
+    parses and maps them chunk by chunk on a process pool and appends the result to
+    `output_path` (.json array or .jsonl). Only the "title" column of the CSV is loaded,
+    and at most ~2 chunks per worker are in memory at once.
+
+    Returns:
+        dict: {"records", "skipped", "repairs"}
+    """
+    titles = load_titles(csv_path)
+    workers = workers or os.cpu_count() or 1
+    records = iter_json_records(input_path, columns=["custom_id", "context_response"])
+    chunks = _chunked(records, chunksize)
+
+    writer = _RecordWriter(output_path)
+    total, skipped, repairs = 0, 0, Counter()  # repairs["no_title"]: custom_id không khớp dòng nào trong CSV
+    progress = tqdm(desc="🔍 Processing LLM responses", unit="rec")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_parse_and_map_chunk, chunk))
+                if len(in_flight) < workers * 2:
+                    continue
+                total, skipped = _drain(in_flight.popleft(), titles, writer, progress, total, skipped, repairs)
+            while in_flight:
+                total, skipped = _drain(in_flight.popleft(), titles, writer, progress, total, skipped, repairs)
+    finally:
+        progress.close()
+        writer.close()
+
+    current_span().set_attributes(records=total, skipped=skipped, no_title=repairs["no_title"], bytes_in=os.path.getsize(input_path))
+    print(f"✅ Done. {total} records saved to {output_path} ({skipped} skipped due to JSON error, {repairs['no_title']} without title)")
+    return {"records": total, "skipped": skipped, "repairs": dict(repairs)}
+
+def _drain(future, titles, writer, progress, total, skipped, repairs):
+    mapped, skipped_ids, chunk_repairs = future.result()
+    out = _attach_titles(mapped, titles)
+    writer.write(out)
+    repairs.update(chunk_repairs)
+    repairs["no_title"] += int(out["Tên văn bản"].isna().sum())
+    progress.update(len(out) + len(skipped_ids))
+    return total + len(out), skipped + len(skipped_ids)
+
+@traced("postprocess.extract")
 def extract_and_map_fields_from_df(llm_df: pd.DataFrame, csv_path: str, output_path: str = None) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
-    records = []
-
-    for _, item in tqdm(llm_df.iterrows(), total=len(llm_df), desc="🔍 Processing LLM responses"):
-        context_json = safe_json_loads(item.get("context_response", ""))
-        if context_json is None:
-            print(f"⚠️ Skipping due to JSON error: custom_id={item.get('custom_id')}")
-            continue
-
-        custom_id = item.get("custom_id", "")
-        try:
-            index = int(custom_id.split("-")[1])
-            matched_title = df.loc[index, "title"]
-        except Exception as e:
-            print(f"⚠️ Failed to get title for custom_id={custom_id}: {e}")
-            matched_title = None
-
-        record = {
-            "Tên văn bản": matched_title,
-            "Số hiệu": safe_get(context_json, "so_hieu").replace("\\", ""),
-            "Loại văn bản": safe_get(context_json, "loai_vb"),
-            "Lĩnh vực": safe_get(context_json, "linh_vuc"),
-            "Nơi ban hành": safe_get(context_json, "noi_ban_hanh"),
-            "Người ký": safe_get(context_json, "nguoi_ky"),
-            "Ngày ban hành": format_date(safe_get(context_json, "ngay_ban_hanh")),
-            "Ngày hiệu lực": format_date(safe_get(context_json, "ngay_hieu_luc")),
-            "Ngày đăng": format_date(safe_get(context_json, "ngay_cong_bao")),
-            "Số công báo": safe_get(context_json, "so_cong_bao"),
-            "Tình trạng": safe_get(context_json, "tinh_trang"),
-            "Nội dung": safe_get(context_json, "noi_dung"),
-        }
-
-        records.append(record)
-
-    output_df = pd.DataFrame(records)
+    titles = load_titles(csv_path)
+    records = llm_df[["custom_id", "context_response"]].to_dict("records") if len(llm_df) else []
+
+    mapped, skipped_ids, _ = _parse_and_map_chunk(records)
+    for custom_id in skipped_ids:
+        print(f"⚠️ Skipping due to JSON error: custom_id={custom_id}")
+    output_df = _attach_titles(mapped, titles).reset_index(drop=True)
+    missing = int(output_df["Tên văn bản"].isna().sum())
+    current_span().set_attributes(records=len(output_df), skipped=len(skipped_ids), no_title=missing)
+    if missing:
+        print(f"⚠️ Failed to get title for {missing} records")
 
     if output_path:
         output_df.to_json(output_path, orient="records", indent=2, force_ascii=False)
@@ -99,54 +288,103 @@ def extract_and_map_fields_from_df(llm_df: pd.DataFrame, csv_path: str, output_p
 
     return output_df
 
-def normalize(text):
-    if not isinstance(text, str):
-        return ""
-
-    # Chuẩn hóa Unicode
-    text = unicodedata.normalize("NFKC", text)
-
-    # Thay thế dấu nháy và ngoặc đặc biệt
-    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
-    text = text.replace("–", "-").replace("—", "-")  # dash variants
+class _NormalizeTable(dict):
+    """
+    str.translate table for normalize(): quote / dash variants and "_" are mapped,
+    every non-printable character (control chars, NBSP and other special spaces,
+    line breaks, tabs) is deleted. Entries for other characters are filled in lazily.
+    """
 
-    # Xoá ký tự không in được, kể cả dấu space đặc biệt
-    text = ''.join(c for c in text if c.isprintable())
-    text = text.replace('\u00A0', ' ')  # non-breaking space
+    def __missing__(self, code):
+        value = code if chr(code).isprintable() else None
+        self[code] = value
+        return value
 
-    # Thay gạch dưới bằng gạch chéo
-    text = text.replace('_', '/')
+_NORMALIZE_TABLE = _NormalizeTable({
+    ord("“"): '"', ord("”"): '"', ord("‘"): "'", ord("’"): "'",
+    ord("–"): "-", ord("—"): "-",
+    ord("_"): "/",
+})
+_MULTI_SPACE_RE = re.compile(r" {2,}")
 
-    # Xoá xuống dòng, tab, dấu ngoặc kép thừa
-    text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+@lru_cache(maxsize=1 << 20)
+def _normalize_str(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).translate(_NORMALIZE_TABLE)
     text = text.strip('"').strip("'")
+    return _MULTI_SPACE_RE.sub(" ", text).strip().lower()
 
-    # Rút gọn khoảng trắng
-    text = re.sub(r"\s+", " ", text)
+def normalize(text):
+    """
+    Normalize a title for URL matching: NFKC, unify quotes/dashes, drop non-printable
+    characters, "_" -> "/", trim quotes, collapse spaces, lowercase.
+    Results are memoized, so repeated titles cost a dict lookup.
+    """
+    if not isinstance(text, str):
+        return ""
+    return _normalize_str(text)
 
-    return text.strip().lower()
+def normalize_series(titles: pd.Series) -> pd.Series:
+    """
+    Vectorized normalize(): each distinct title is normalized once with pandas string
+    operations, then broadcast back to all rows.
+    """
+    codes, uniques = pd.factorize(pd.Series(titles, dtype=object), use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    is_str = uniques.map(lambda v: isinstance(v, str))
+    text = uniques.where(is_str, "")
+    text = (
+        text.str.normalize("NFKC")
+        .str.translate(_NORMALIZE_TABLE)
+        .str.strip('"')
+        .str.strip("'")
+        .str.replace(_MULTI_SPACE_RE, " ", regex=True)
+        .str.strip()
+        .str.lower()
+    )
+    values = text.to_numpy(dtype=object)
+    result = np.where(codes >= 0, values[np.maximum(codes, 0)] if len(values) else "", "")
+    return pd.Series(result, index=getattr(titles, "index", None), dtype=object)
 
-def match_url_and_save(final_df: pd.DataFrame, url_json_path: str, output_csv_path: str):
+@traced("postprocess.match_url")
+def match_url_and_save(final_df: pd.DataFrame, url_json_path: str, output_csv_path: str, fuzzy_threshold: Optional[float] = 0.9):
+    """
+    Attach catalogue URLs to the extracted documents by normalized title and save a CSV.
+    Titles without an exact match are resolved with a character n-gram index when
+    `fuzzy_threshold` is set (n-gram Jaccard similarity, None disables it).
+    """
     # 1. Normalize tiêu đề
-    final_df["normalized_title"] = final_df["Tên văn bản"].apply(normalize)
+    final_df["normalized_title"] = normalize_series(final_df["Tên văn bản"])
 
     # 2. Load JSON chứa URL
     with open(url_json_path, "r", encoding="utf-8") as f:
         json_data = json.load(f)
 
     # 3. Tạo dict map normalized_title → url
-    title_to_url = {
-        normalize(item["title"]): item["url"]
-        for item in json_data
-        if "title" in item and "url" in item
-    }
+    items = [item for item in json_data if "title" in item and "url" in item]
+    catalogue_titles = normalize_series(pd.Series([item["title"] for item in items], dtype=object))
+    title_to_url = dict(zip(catalogue_titles, (item["url"] for item in items)))
 
     # 4. Ánh xạ URL
-    tqdm.pandas(desc="🔗 Matching URLs")
-    final_df["url"] = final_df["normalized_title"].progress_apply(lambda x: title_to_url.get(x, ""))
+    final_df["url"] = final_df["normalized_title"].map(title_to_url).fillna("")
+
+    # 4b. Khớp gần đúng cho các tiêu đề còn thiếu
+    unmatched = final_df["url"].eq("") & final_df["normalized_title"].ne("")
+    if fuzzy_threshold and unmatched.any():
+        catalogue = list(title_to_url)
+        queries = final_df.loc[unmatched, "normalized_title"].unique()
+        fuzzy_urls = {}
+        with span("postprocess.match_url.fuzzy", catalogue=len(catalogue), queries=len(queries)):
+            index = TitleIndex(catalogue)
+            for query, match in zip(queries, index.query_many(queries, fuzzy_threshold)):
+                if match is not None:
+                    fuzzy_urls[query] = title_to_url[catalogue[match[0]]]
+        fuzzy = final_df.loc[unmatched, "normalized_title"].map(fuzzy_urls)
+        final_df.loc[unmatched, "url"] = fuzzy.fillna("")
+        print(f"🔎 Khớp gần đúng thêm {int(fuzzy.notna().sum())} văn bản (ngưỡng {fuzzy_threshold}).")
 
     # 5. Báo thiếu
     missing = final_df["url"].eq("").sum()
+    current_span().set_attributes(documents=len(final_df), missing_url=int(missing))
     print(f"⚠️ Không tìm thấy URL cho {missing} văn bản.")
 
     # 6. Xoá cột phụ và lưu file
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Set
+
+DEFAULT_DB_PATH = os.getenv("ARTIFACT_DB_PATH", os.path.join("data", "artifacts.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    stage_key TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (stage_key, input_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_output ON artifacts (stage_key, output_path);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return sha256_bytes(text.encode("utf-8"))
+
+
+def stage_key(stage: str, version: int, params: Optional[dict] = None) -> str:
+    """
+    Build the cache namespace for a stage.
+    Args:
+        stage (str): Stage name, e.g. "pdf2txt".
+        version (int): Bump it whenever the stage logic changes its output.
+        params (dict, optional): Parameters that affect the output (model, prompt hash...).
+    Returns:
+        str: "<stage>:v<version>:<params hash>"
+    """
+    params_json = json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{stage}:v{version}:{sha256_text(params_json)[:16]}"
+
+
+class ArtifactStore:
+    """
+    Content-addressed manifest of pipeline artifacts backed by SQLite.
+
+    An artifact is identified by (stage key, input content hash) and points to the
+    output file produced for it; the output's size and mtime are recorded too, so an
+    output changed outside the pipeline is not reused. File hashes are memoized by (path, size, mtime) so a
+    re-run over an unchanged corpus does not re-read every input.
+
+    Args:
+        db_path (str): Path of the SQLite manifest.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def hash_file(self, path: str) -> str:
+        """
+        Return the SHA-256 of a file, reusing the stored digest when size and mtime match.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, sha),
+            )
+            self._conn.commit()
+        return sha
+
+    def get(self, key: str, input_hash: str) -> Optional[str]:
+        """
+        Return the recorded output path for an input, or None if it is unknown, the
+        output file no longer exists or it was truncated / edited since it was recorded.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.output_path, o.path FROM artifacts a LEFT JOIN outputs o ON o.path = a.output_path "
+                "WHERE a.stage_key = ? AND a.input_hash = ?",
+                (key, input_hash),
+            ).fetchone()
+        if row and os.path.exists(row[0]):
+            if row[1] is None:
+                # Manifest cũ chưa lưu size/mtime của output: ghi lại từ lần này
+                self.mark_output(row[0])
+            if self.output_unchanged(row[0]):
+                self.hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, input_hash: str, output_path: str):
+        output_path = os.path.abspath(output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (stage_key, input_hash, output_path, created_at) VALUES (?, ?, ?, ?)",
+                (key, input_hash, output_path, time.time()),
+            )
+            self._conn.commit()
+        if os.path.exists(output_path):
+            self.mark_output(output_path)
+
+    def reuse(self, key: str, input_hash: str, target_path: str) -> bool:
+        """
+        If the artifact exists, make sure it is available at `target_path` (copying it
+        from an earlier output location if needed) and return True.
+        """
+        cached = self.get(key, input_hash)
+        if cached is None:
+            return False
+        if os.path.abspath(target_path) != cached:
+            os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+            shutil.copyfile(cached, target_path)
+        return True
+
+    def inputs_for_output(self, key: str, output_path: str) -> Set[str]:
+        """Input hashes recorded as part of an aggregate output (e.g. one CSV)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT input_hash FROM artifacts WHERE stage_key = ? AND output_path = ?",
+                (key, os.path.abspath(output_path)),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def put_many(self, key: str, input_hashes, output_path: str):
+        now = time.time()
+        output_path = os.path.abspath(output_path)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO artifacts (stage_key, input_hash, output_path, created_at) VALUES (?, ?, ?, ?)",
+                [(key, h, output_path, now) for h in input_hashes],
+            )
+            self._conn.commit()
+
+    def forget_output(self, key: str, output_path: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM artifacts WHERE stage_key = ? AND output_path = ?",
+                (key, os.path.abspath(output_path)),
+            )
+            self._conn.commit()
+
+    def mark_output(self, path: str):
+        """Remember the size/mtime of an output we wrote, to detect outside edits later."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs (path, size, mtime_ns) VALUES (?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns),
+            )
+            self._conn.commit()
+
+    def output_unchanged(self, path: str) -> bool:
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return False
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM outputs WHERE path = ?", (path,)
+            ).fetchone()
+        return bool(row) and row[0] == st.st_size and row[1] == st.st_mtime_ns
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Process-wide store at ARTIFACT_DB_PATH (default data/artifacts.sqlite)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ArtifactStore()
+        return _default_store
@@ -0,0 +1,171 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from src.utils.utils import system_prompt, human_prompt
+from src.utils.tracing import current_span, traced
+
+PROMPTS_FILE = "prompts.json"
+DATA_SUBDIR = "data"
+
+SCHEMA = pa.schema([("title", pa.string()), ("context", pa.string())])
+
+
+def _read_txt(path: str) -> Tuple[str, str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return os.path.splitext(os.path.basename(path))[0], f.read().strip()
+
+
+def iter_txt_records(txt_path: str, workers: Optional[int] = None, prefetch: int = 256) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (title, context) for every TXT file of a folder in sorted order. Files are
+    read on a thread pool with at most `prefetch` reads in flight, so memory stays
+    bounded whatever the corpus size.
+    """
+    filenames = sorted(f for f in os.listdir(txt_path) if f.endswith(".txt"))
+    paths = [os.path.join(txt_path, f) for f in filenames]
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in tqdm(range(0, len(paths), prefetch), desc="📚 Building dataset", unit="batch"):
+            yield from executor.map(_read_txt, paths[start:start + prefetch])
+
+
+def _iter_batches(records: Iterator[Tuple[str, str]], batch_rows: int) -> Iterator[pa.RecordBatch]:
+    titles: List[str] = []
+    contexts: List[str] = []
+    for title, context in records:
+        titles.append(title)
+        contexts.append(context)
+        if len(titles) >= batch_rows:
+            yield pa.record_batch([titles, contexts], schema=SCHEMA)
+            titles, contexts = [], []
+    if titles:
+        yield pa.record_batch([titles, contexts], schema=SCHEMA)
+
+
+@traced("build_dataset")
+def build_dataset(
+    txt_path: str,
+    output_dir: str,
+    split: str = "train",
+    max_shard_bytes: int = 150 * 1024 * 1024,
+    batch_rows: int = 256,
+    compression: str = "zstd",
+    workers: Optional[int] = None,
+) -> List[str]:
+    """
+    Stream a folder of TXT files into compressed Parquet shards, a replacement for
+    make_csv + upload that never materializes the corpus or re-parses a CSV.
+
+    Rows only hold title/context; the system and human prompts are stored once, in
+    the Parquet schema metadata and in `prompts.json`. The output directory can be
+    loaded (memory-mapped) with `load_dataset(output_dir)` or pushed with `upload_dataset`.
+
+    Args:
+        txt_path (str): Folder of TXT files.
+        output_dir (str): Dataset folder; shards go to <output_dir>/data/<split>-*.parquet.
+        max_shard_bytes (int): Start a new shard after this many bytes of raw text.
+        compression (str): Parquet codec ("zstd", "snappy", ...).
+    Returns:
+        List[str]: Paths of the written shards.
+    """
+    if not os.path.exists(txt_path):
+        raise FileNotFoundError(f"Không tìm thấy thư mục TXT: {txt_path}")
+    data_dir = os.path.join(output_dir, DATA_SUBDIR)
+    os.makedirs(data_dir, exist_ok=True)
+    for old in os.listdir(data_dir):
+        if old.startswith(f"{split}-") and old.endswith(".parquet"):
+            os.remove(os.path.join(data_dir, old))
+
+    prompts = {"system": system_prompt.strip(), "human": human_prompt}
+    schema = SCHEMA.with_metadata({"prompts": json.dumps(prompts, ensure_ascii=False)})
+
+    shards: List[str] = []
+    writer = None
+    shard_bytes = 0
+    rows = 0
+    try:
+        for batch in _iter_batches(iter_txt_records(txt_path, workers), batch_rows):
+            if writer is None or shard_bytes >= max_shard_bytes:
+                if writer is not None:
+                    writer.close()
+                shards.append(os.path.join(data_dir, f"{split}-{len(shards):05d}.parquet.part"))
+                writer = pq.ParquetWriter(shards[-1], schema, compression=compression)
+                shard_bytes = 0
+            writer.write_batch(batch)
+            shard_bytes += batch.nbytes
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # Đổi tên theo quy ước <split>-XXXXX-of-YYYYY.parquet của Hub khi đã biết tổng số shard
+    final = []
+    for i, part in enumerate(shards):
+        path = os.path.join(data_dir, f"{split}-{i:05d}-of-{len(shards):05d}.parquet")
+        os.replace(part, path)
+        final.append(path)
+
+    with open(os.path.join(output_dir, PROMPTS_FILE), "w", encoding="utf-8") as f:
+        json.dump(prompts, f, ensure_ascii=False, indent=2)
+
+    current_span().set_attributes(rows=rows, shards=len(final), bytes_out=sum(os.path.getsize(p) for p in final))
+    print(f"✅ Đã ghi {rows} dòng vào {len(final)} shard Parquet tại: {data_dir}")
+    return final
+
+
+def load_prompts(dataset_dir: str) -> dict:
+    """Return the {"system", "human"} prompts stored next to a built dataset."""
+    with open(os.path.join(dataset_dir, PROMPTS_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@traced("upload")
+def upload_dataset(dataset_dir: str, repo_id: str):
+    """
+    Push the Parquet shards and prompts.json as-is, without re-encoding them. Remote
+    shards of the uploaded splits are replaced, so a split that now has fewer shards
+    does not keep stale ones on the Hub.
+    """
+    from huggingface_hub import HfApi
+
+    data_dir = os.path.join(dataset_dir, DATA_SUBDIR)
+    splits = sorted({f.rsplit("-", 3)[0] for f in os.listdir(data_dir) if f.endswith(".parquet")})
+    api = HfApi()
+    api.create_repo(repo_id, repo_type="dataset", exist_ok=True)
+    api.upload_folder(
+        folder_path=dataset_dir,
+        repo_id=repo_id,
+        repo_type="dataset",
+        allow_patterns=[f"{DATA_SUBDIR}/*.parquet", PROMPTS_FILE],
+        delete_patterns=[f"{DATA_SUBDIR}/{split}-*.parquet" for split in splits],
+    )
+    print(f"✅ Đã upload dataset lên: {repo_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build Parquet dataset shards from a folder of TXT files")
+    parser.add_argument("txt_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--max-shard-mb", type=int, default=150)
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repo-id", default=None, help="Upload to this Hub dataset repo when done")
+    args = parser.parse_args()
+    build_dataset(
+        args.txt_path,
+        args.output_dir,
+        split=args.split,
+        max_shard_bytes=args.max_shard_mb * 1024 * 1024,
+        compression=args.compression,
+        workers=args.workers,
+    )
+    if args.repo_id:
+        upload_dataset(args.output_dir, args.repo_id)
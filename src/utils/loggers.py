@@ -1,4 +1,6 @@
 import logging
+import functools
+import inspect
 
 # Cấu hình logger
 logger = logging.getLogger("model_logger")
@@ -16,7 +18,20 @@ def run_with_error_catch(func):
         function: The decorated function.
     Description
         This decorator is used to catch and log exceptions raised by the function.
+        Coroutine functions get an async wrapper, so errors raised while awaiting
+        are caught too.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"get bug {e} when running process")
+                return f"<Error> get bug {e} when running process"
+        return async_wrapper
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
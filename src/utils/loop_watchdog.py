@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Optional
+
+from src.utils.loggers import logger
+from src.utils.metrics import Counter, Gauge, Histogram
+
+# Phát hiện code chặn event loop (time.sleep, I/O đồng bộ, CPU nặng trong handler async):
+# - một heartbeat chạy trên loop đo độ trễ giữa lúc hẹn và lúc thực sự được chạy lại;
+# - một thread giám sát thấy heartbeat trễ quá ngưỡng thì chụp stack của thread chạy
+#   loop ngay lúc đó, tức là stack của callback / coroutine đang giữ loop.
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of the event loop heartbeat beyond its schedule.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LOOP_BLOCKED = Counter("event_loop_blocked_total", "Times a callback held the event loop longer than the threshold.")
+LOOP_MAX_LAG = Gauge("event_loop_max_lag_seconds", "Largest event loop lag since start.")
+
+
+def _current_task_name(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    # Đọc từ thread khác: chỉ để ghi log, chấp nhận giá trị không chính xác tuyệt đối
+    try:
+        task = asyncio.tasks._current_tasks.get(loop)
+    except Exception:
+        return None
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopWatchdog:
+    """
+    Measure event loop lag and log the loop thread's stack when it is blocked for
+    more than `threshold` seconds. Lag is exported as `event_loop_lag_seconds`.
+
+    Args:
+        threshold (float): Blocking time that triggers a stack dump.
+        interval (float): Heartbeat period; also the resolution of the lag metric.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_beat = 0.0
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start on the running loop (call from a coroutine, e.g. a startup hook)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat(), name="loop-watchdog")
+        self._monitor = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._monitor.start()
+        logger.info(f"🐶 Event loop watchdog: ngưỡng {self.threshold * 1000:.0f} ms")
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                LOOP_MAX_LAG.set(lag)
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - self.interval
+            # Mỗi lần loop bị chặn chỉ báo một lần (cho tới heartbeat kế tiếp)
+            if blocked < self.threshold or reported_beat == last_beat:
+                continue
+            reported_beat = last_beat
+            LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>\n"
+            task = _current_task_name(self._loop) or "-"
+            logger.warning(
+                f"⏱️ Event loop bị chặn {blocked * 1000:.0f} ms (task: {task}). Stack hiện tại:\n{stack}"
+            )
+
+
+def install_watchdog(app, threshold: Optional[float] = None, interval: float = 0.05) -> Optional[LoopWatchdog]:
+    """
+    Run a LoopWatchdog for the lifetime of a FastAPI app. The threshold defaults to
+    $LOOP_WATCHDOG_THRESHOLD_MS (250 ms); 0 disables the watchdog.
+    """
+    if threshold is None:
+        threshold = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "250")) / 1000
+    if threshold <= 0:
+        return None
+    watchdog = LoopWatchdog(threshold=threshold, interval=interval)
+    app.router.add_event_handler("startup", watchdog.start)
+    app.router.add_event_handler("shutdown", watchdog.stop)
+    return watchdog
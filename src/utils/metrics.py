@@ -0,0 +1,234 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bộ metrics tối giản theo định dạng text của Prometheus (không cần prometheus_client):
+# mỗi lần ghi chỉ là một phép cộng dưới lock, đủ rẻ để bật thường xuyên.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge whose value is set directly or read from `callback` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = dict(self._values)
+        if self.callback is not None:
+            try:
+                items.update(self.callback())
+            except Exception:
+                pass
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}" for k, v in items.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [số lần rơi vào từng bucket (+ bucket +Inf), tổng, số mẫu]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- LLM calls (ghi trong các pipeline) ------------------------------------------
+
+LLM_REQUESTS = Counter("llm_requests_total", "Provider calls by outcome.", ("router", "model", "status"))
+LLM_ERRORS = Counter("llm_errors_total", "Provider call failures by exception class.", ("router", "model", "error"))
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "Total provider call latency.", ("router", "model"))
+LLM_TTFT = Histogram("llm_time_to_first_token_seconds", "Time to the first streamed token.", ("router", "model"))
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens reported by provider usage.", ("router", "model"))
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens reported by provider usage.", ("router", "model"))
+LLM_IN_FLIGHT = Gauge("llm_in_flight_requests", "Provider calls currently running.", ("router",))
+
+# ---- /chat (chat_with_model) -----------------------------------------------------
+
+CHAT_REQUESTS = Counter("chat_requests_total", "/chat requests by outcome.", ("router", "model", "status"))
+CHAT_LATENCY = Histogram("chat_request_duration_seconds", "/chat latency including rate limiting.", ("router", "model"))
+CHAT_COALESCED = Counter(
+    "chat_coalesced_total", "/chat requests answered by an identical call already in flight.", ("router", "model"),
+)
+
+# ---- cache / rate limiter ---------------------------------------------------------
+
+PIPELINE_CACHE = Counter("pipeline_cache_total", "Pipeline (client) cache lookups.", ("result",))
+RATE_LIMIT_WAIT = Histogram(
+    "rate_limiter_wait_seconds", "Time spent queued in the per-router scheduler.", ("router", "priority"),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60),
+)
+
+
+def _artifact_store_stats():
+    from src.utils import artifact_store
+
+    store = artifact_store._default_store
+    if store is None:
+        return {}
+    return {("hit",): store.hits, ("miss",): store.misses}
+
+
+Gauge("artifact_store_lookups", "Artifact store lookups since start, by result.", ("result",), callback=_artifact_store_stats)
+
+
+class CallRecord:
+    """Filled in by the pipeline during a tracked call."""
+    __slots__ = ("prompt_tokens", "completion_tokens", "first_token_at")
+
+    def __init__(self):
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+
+@contextmanager
+def track_llm_call(router: str, model: str):
+    """
+    Record count, latency, time to first token, token usage and error class of one
+    provider call. Exceptions are recorded and re-raised.
+    """
+    record = CallRecord()
+    LLM_IN_FLIGHT.inc(router=router)
+    start = time.perf_counter()
+    status = "success"
+    try:
+        yield record
+    except BaseException as e:
+        status = "error"
+        LLM_ERRORS.inc(router=router, model=model, error=type(e).__name__)
+        raise
+    finally:
+        LLM_IN_FLIGHT.dec(router=router)
+        LLM_LATENCY.observe(time.perf_counter() - start, router=router, model=model)
+        if record.first_token_at is not None:
+            LLM_TTFT.observe(record.first_token_at - start, router=router, model=model)
+        if record.prompt_tokens:
+            LLM_PROMPT_TOKENS.inc(record.prompt_tokens, router=router, model=model)
+        if record.completion_tokens:
+            LLM_COMPLETION_TOKENS.inc(record.completion_tokens, router=router, model=model)
+        LLM_REQUESTS.inc(router=router, model=model, status=status)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
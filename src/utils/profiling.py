@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from typing import List, Optional
+
+# Profiler lấy mẫu cho process đang chạy (không cần py-spy / quyền ptrace): một thread
+# đọc sys._current_frames() theo chu kỳ và đếm các stack giống nhau. Kết quả ở định dạng
+# "folded" (một stack mỗi dòng, các frame cách nhau bởi ";", cuối dòng là số mẫu), đọc
+# được bằng flamegraph.pl, speedscope hoặc inferno.
+
+# Lá của stack khi thread đang chờ (event loop rảnh, worker chờ job, lock...)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter:
+    """
+    Sample the Python stack of every thread (the event loop included) for `seconds`.
+    Returns:
+        Counter: folded stack ("thread;outer;...;inner") -> number of samples.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def render_folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class AllocationTracker:
+    """
+    tracemalloc snapshots diffed against a baseline, to see which allocation sites
+    keep growing between two calls.
+    """
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def diff(self, limit: int = 25, key_type: str = "lineno", reset: bool = True) -> dict:
+        """
+        Start tracing on the first call (baseline only). Later calls return the top
+        `limit` allocation sites by growth since the baseline, which is moved to now
+        when `reset`.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._baseline = None
+            snapshot = self._filtered(tracemalloc.take_snapshot())
+            current, peak = tracemalloc.get_traced_memory()
+            result = {"traced_bytes": current, "peak_bytes": peak, "top": []}
+            if self._baseline is None:
+                self._baseline = snapshot
+                result["message"] = "tracemalloc started, baseline taken; call again to see growth"
+                return result
+
+            stats = snapshot.compare_to(self._baseline, key_type)
+            result["top"] = [
+                {
+                    "where": _format_traceback(stat.traceback, key_type),
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in stats[:limit]
+            ]
+            if reset:
+                self._baseline = snapshot
+            return result
+
+    def stop(self) -> dict:
+        with self._lock:
+            was_tracing = tracemalloc.is_tracing()
+            tracemalloc.stop()
+            self._baseline = None
+            return {"stopped": was_tracing}
+
+
+def _format_traceback(traceback: tracemalloc.Traceback, key_type: str) -> List[str]:
+    if key_type == "filename":
+        return [traceback[0].filename]
+    # Frame gần nhất trước, giống thứ tự của tracemalloc
+    return [f"{f.filename}:{f.lineno}" for f in traceback]
+
+
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,266 @@
+import io
+import os
+import csv
+import sys
+import mmap
+import json
+import struct
+import hashlib
+import argparse
+from typing import Any, Dict, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+try:
+    import orjson
+
+    def _loads(b: bytes):
+        return orjson.loads(b)
+except ImportError:  # pragma: no cover - orjson là tuỳ chọn
+    def _loads(b: bytes):
+        return json.loads(b)
+
+INDEX_SUFFIX = ".idx"
+_MAGIC = b"ROWIDX01"
+# magic, source size, source mtime_ns, rows, keys, meta length
+_HEADER = struct.Struct("<8sQQQQQ")
+_SCAN_CHUNK = 64 << 20
+_NEWLINE = 10
+_QUOTE = 34
+
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _record_spans(mm, quoted: bool):
+    """
+    Start/end byte offsets of every non-blank record. For CSV (`quoted`) a newline
+    only ends a record when it is outside quotes, i.e. after an even number of '"'.
+    """
+    size = len(mm)
+    ends = []
+    parity = 0
+    for start in range(0, size, _SCAN_CHUNK):
+        count = min(_SCAN_CHUNK, size - start)
+        buf = np.frombuffer(mm, dtype=np.uint8, count=count, offset=start)
+        newlines = np.flatnonzero(buf == _NEWLINE)
+        if quoted:
+            quotes = np.flatnonzero(buf == _QUOTE)
+            outside = (parity + np.searchsorted(quotes, newlines)) % 2 == 0
+            newlines = newlines[outside]
+            parity = (parity + len(quotes)) % 2
+        ends.append(newlines.astype(np.uint64) + np.uint64(start + 1))
+    ends = np.concatenate(ends) if ends else np.empty(0, dtype=np.uint64)
+    if size and (len(ends) == 0 or ends[-1] < size):
+        ends = np.append(ends, np.uint64(size))
+    starts = np.concatenate([np.zeros(1, dtype=np.uint64), ends[:-1]])
+    # Bỏ các dòng trống ("\n" hoặc "\r\n")
+    lengths = ends - starts
+    keep = lengths > 2
+    for i in np.flatnonzero(~keep):
+        keep[i] = bool(bytes(mm[int(starts[i]):int(ends[i])]).strip())
+    return starts[keep], ends[keep]
+
+
+class RowIndex:
+    """
+    Sidecar byte-offset index (<file>.idx) for a CSV or JSONL file.
+
+    The index stores the start/end offset of every record and a sorted table of
+    64-bit key hashes (e.g. custom_id or title), both memory-mapped. Fetching row N
+    is a seek into the memory-mapped source; fetching a key is a binary search in
+    the hash table. The index is rebuilt automatically when the source changes.
+
+    Args:
+        path (str): CSV (.csv) or JSONL file.
+        key (str, optional): Field used for key lookups. Defaults to "custom_id" for
+            JSONL and "title" for CSV. A CSV without that column gets no key table.
+    """
+
+    def __init__(self, path: str, key: Optional[str] = None):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.is_csv = path.lower().endswith(".csv")
+        if key is None:
+            key = "title" if self.is_csv else "custom_id"
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+        if not self._load(key):
+            self._build(key)
+            self._load(key)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._arrays = None
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.starts)
+
+    # ---- build / load -------------------------------------------------------
+
+    def _build(self, key: str):
+        st = os.stat(self.path)
+        starts, ends = _record_spans(self._mm, self.is_csv)
+        header = None
+        if self.is_csv and len(starts):
+            header = self._parse_csv(starts[0], ends[0])
+            starts, ends = starts[1:], ends[1:]
+        if header is not None and key not in header:
+            key = ""
+
+        hashes = np.empty(0, dtype=np.uint64)
+        rows = np.empty(0, dtype=np.uint64)
+        if key:
+            hashes = np.empty(len(starts), dtype=np.uint64)
+            for i in tqdm(range(len(starts)), desc=f"🗂️ Indexing {key}", mininterval=1):
+                record = self._decode(starts[i], ends[i], header)
+                value = record.get(key) if isinstance(record, dict) else None
+                hashes[i] = _key_hash(str(value)) if value is not None else 0
+            rows = np.argsort(hashes, kind="stable").astype(np.uint64)
+            hashes = hashes[rows]
+
+        meta = json.dumps({"key": key, "header": header}, ensure_ascii=False).encode("utf-8")
+        meta += b" " * (-len(meta) % 8)
+        tmp_path = self.index_path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, st.st_size, st.st_mtime_ns, len(starts), len(hashes), len(meta)))
+            f.write(meta)
+            for arr in (starts, ends, hashes, rows):
+                f.write(np.ascontiguousarray(arr, dtype=np.uint64).tobytes())
+        os.replace(tmp_path, self.index_path)
+
+    def _load(self, key: str) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, "rb") as f:
+            raw = f.read(_HEADER.size)
+            if len(raw) < _HEADER.size:
+                return False
+            magic, size, mtime_ns, n_rows, n_keys, meta_len = _HEADER.unpack(raw)
+            meta = json.loads(f.read(meta_len))
+        st = os.stat(self.path)
+        if magic != _MAGIC or size != st.st_size or mtime_ns != st.st_mtime_ns:
+            return False
+        missing_column = meta["key"] == "" and meta["header"] is not None and key not in meta["header"]
+        if meta["key"] != key and not missing_column:
+            return False
+
+        self.key = meta["key"]
+        self.header = meta["header"]
+        arrays = np.memmap(self.index_path, dtype=np.uint64, mode="r", offset=_HEADER.size + meta_len) if n_rows else np.empty(0, dtype=np.uint64)
+        self._arrays = arrays
+        self.starts = arrays[:n_rows]
+        self.ends = arrays[n_rows:2 * n_rows]
+        self._hashes = arrays[2 * n_rows:2 * n_rows + n_keys]
+        self._rows = arrays[2 * n_rows + n_keys:2 * n_rows + 2 * n_keys]
+        return True
+
+    # ---- access -------------------------------------------------------------
+
+    def _parse_csv(self, start, end):
+        csv.field_size_limit(sys.maxsize)
+        text = bytes(self._mm[int(start):int(end)]).decode("utf-8-sig" if int(start) == 0 else "utf-8")
+        return next(csv.reader(io.StringIO(text, newline="")))
+
+    def _decode(self, start, end, header):
+        if self.is_csv:
+            values = self._parse_csv(start, end)
+            return dict(zip(header, values)) if header else values
+        return _loads(bytes(self._mm[int(start):int(end)]))
+
+    def raw(self, n: int) -> bytes:
+        """Raw bytes of row `n` (negative indexes count from the end)."""
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(f"Row {n} out of range ({len(self)} rows)")
+        return bytes(self._mm[int(self.starts[n]):int(self.ends[n])])
+
+    def row(self, n: int) -> Any:
+        """Row `n` as a dict (CSV with a header, JSON objects) or parsed value."""
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(f"Row {n} out of range ({len(self)} rows)")
+        return self._decode(self.starts[n], self.ends[n], self.header)
+
+    def find(self, value: str) -> Optional[int]:
+        """Row number whose key field equals `value`, or None."""
+        if not self.key:
+            raise ValueError(f"{self.path} has no key index")
+        h = np.uint64(_key_hash(str(value)))
+        pos = int(np.searchsorted(self._hashes, h))
+        while pos < len(self._hashes) and self._hashes[pos] == h:
+            n = int(self._rows[pos])
+            record = self.row(n)
+            if isinstance(record, dict) and str(record.get(self.key)) == str(value):
+                return n
+            pos += 1
+        return None
+
+    def get(self, value: str) -> Optional[Dict[str, Any]]:
+        n = self.find(value)
+        return None if n is None else self.row(n)
+
+
+def get_row(path: str, n: int) -> Any:
+    """Fetch row `n` of a CSV/JSONL file through its (auto-built) sidecar index."""
+    with RowIndex(path) as index:
+        return index.row(n)
+
+
+def find_row(path: str, value: str, key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Fetch the row whose `key` field (custom_id / title by default) equals `value`."""
+    with RowIndex(path, key=key) as index:
+        return index.get(value)
+
+
+def _print_row(row: Any, max_chars: int):
+    if not isinstance(row, dict):
+        print(json.dumps(row, ensure_ascii=False)[:max_chars])
+        return
+    for field, value in row.items():
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        suffix = "..." if len(text) > max_chars else ""
+        print(f"📌 {field}:\n{text[:max_chars]}{suffix}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random access to rows of large CSV/JSONL files")
+    parser.add_argument("path")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--row", type=int, help="Row number (0-based, header excluded)")
+    group.add_argument("--id", help="Value of the key field, e.g. a custom_id")
+    parser.add_argument("--key", default=None, help="Key field (default: custom_id for JSONL, title for CSV)")
+    parser.add_argument("--max-chars", type=int, default=1000)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path + INDEX_SUFFIX):
+        os.remove(args.path + INDEX_SUFFIX)
+    with RowIndex(args.path, key=args.key) as index:
+        if args.id is not None:
+            n = index.find(args.id)
+            if n is None:
+                print(f"❌ Không tìm thấy {index.key} = {args.id}")
+                sys.exit(1)
+        elif args.row is not None:
+            n = args.row
+            if not -len(index) <= n < len(index):
+                print(f"❌ Index {n} vượt quá số dòng ({len(index)})")
+                sys.exit(1)
+        else:
+            print(f"📄 {args.path}: {len(index)} dòng, key = {index.key or '-'}")
+            sys.exit(0)
+        print(f"🔎 Dòng số {n}:")
+        _print_row(index.row(n), args.max_chars)
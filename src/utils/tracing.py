@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import argparse
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Tracing theo từng stage / từng văn bản của pipeline. Mỗi dòng của file trace là
+# một bản ghi OTLP/JSON ({"resourceSpans": [...]}), cùng định dạng với file exporter
+# của OpenTelemetry Collector, nên có thể nạp lại bằng receiver `otlpjsonfile` để xem
+# trên Jaeger/Tempo. Tắt mặc định: khi chưa cấu hình, span() gần như không tốn gì.
+
+TRACE_FILE_ENV = "SYNTH_TRACE_FILE"
+SERVICE_NAME = "synthetic-data"
+
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+_SPAN_KIND_INTERNAL = 1
+
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add(self, key: str, amount: float = 1):
+        """Increment a numeric attribute, e.g. tokens over several prompts."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_otlp(self) -> dict:
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        return record
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class FileSpanExporter:
+    """
+    Append finished spans to a JSONL file in OTLP/JSON. Spans are buffered and
+    written when a root span ends, when the buffer is full and at exit.
+    """
+
+    def __init__(self, path: str, service_name: str = SERVICE_NAME, buffer_size: int = 512):
+        self.path = path
+        self.service_name = service_name
+        self.buffer_size = buffer_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Process con (fork) kế thừa buffer của process cha: bỏ đi để không ghi trùng
+                self._buffer = []
+                self._pid = os.getpid()
+            self._buffer.append(span)
+            if not span.parent_id or len(self._buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            if os.getpid() == self._pid:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        record = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                    {"key": "process.pid", "value": {"intValue": str(self._pid)}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [s.to_otlp() for s in self._buffer],
+                }],
+            }]
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._buffer = []
+
+
+_exporter: Optional[FileSpanExporter] = None
+_configured = False
+_config_lock = threading.Lock()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def configure_tracing(path: Optional[str] = None, service_name: str = SERVICE_NAME) -> Optional[FileSpanExporter]:
+    """
+    Enable tracing to `path` (defaults to $SYNTH_TRACE_FILE). Without a path,
+    tracing stays disabled.
+    """
+    global _exporter, _configured
+    with _config_lock:
+        if _exporter is not None:
+            _exporter.flush()
+        path = path or os.getenv(TRACE_FILE_ENV)
+        _exporter = FileSpanExporter(path, service_name) if path else None
+        _configured = True
+    return _exporter
+
+
+def _get_exporter() -> Optional[FileSpanExporter]:
+    if not _configured:
+        configure_tracing()
+    return _exporter
+
+
+def tracing_enabled() -> bool:
+    return _get_exporter() is not None
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a child of the current span (contextvars, so asyncio tasks
+    inherit their parent). Exceptions mark the span as failed and are re-raised.
+
+        with span("pdf2txt.document", doc_id=name, bytes_in=size) as s:
+            ...
+            s.set_attribute("bytes_out", out_size)
+    """
+    exporter = _get_exporter()
+    if exporter is None:
+        yield _NOOP_SPAN
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        exporter.export(current)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of span() for sync and async functions."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@atexit.register
+def _flush_at_exit():
+    if _exporter is not None:
+        _exporter.flush()
+
+
+# ---- summary -----------------------------------------------------------------------
+
+def _parse_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return float(value["doubleValue"])
+    if "boolValue" in value:
+        return value["boolValue"]
+    return value.get("stringValue")
+
+
+def load_spans(path: str) -> List[dict]:
+    """Flatten an OTLP/JSON trace file into dicts with name, ids, duration and attributes."""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for s in scope.get("spans", []):
+                        spans.append({
+                            "name": s["name"],
+                            "trace_id": s["traceId"],
+                            "span_id": s["spanId"],
+                            "parent_id": s.get("parentSpanId", ""),
+                            "start": int(s["startTimeUnixNano"]) / 1e9,
+                            "end": int(s["endTimeUnixNano"]) / 1e9,
+                            "duration": (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e9,
+                            "error": s.get("status", {}).get("code") == _STATUS_ERROR,
+                            "attributes": {a["key"]: _parse_value(a["value"]) for a in s.get("attributes", [])},
+                        })
+    return spans
+
+
+def _busy_time(intervals: List[tuple]) -> float:
+    """Length of the union of (start, end) intervals: overlapping spans count once."""
+    busy, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                busy += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        busy += current_end - current_start
+    return busy
+
+
+def summarize(spans: List[dict]) -> List[dict]:
+    """
+    Per-span-name breakdown: count, errors, total and self time (total minus direct
+    children), busy time (wall-clock during which at least one such span was running,
+    so concurrent per-document spans are not double counted) and its share of the
+    wall-clock of root spans, mean / p95, plus the sum of every numeric attribute
+    (sizes, token counts).
+    """
+    children_time: Dict[str, float] = defaultdict(float)
+    for s in spans:
+        if s["parent_id"]:
+            children_time[s["parent_id"]] += s["duration"]
+    wall = _busy_time([(s["start"], s["end"]) for s in spans if not s["parent_id"]]) or 1e-9
+
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    for s in spans:
+        groups[s["name"]].append(s)
+
+    rows = []
+    for name, items in groups.items():
+        durations = sorted(s["duration"] for s in items)
+        totals: Dict[str, float] = defaultdict(float)
+        for s in items:
+            for key, value in s["attributes"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] += value
+        total = sum(durations)
+        busy = _busy_time([(s["start"], s["end"]) for s in items])
+        self_time = sum(max(0.0, s["duration"] - children_time.get(s["span_id"], 0.0)) for s in items)
+        rows.append({
+            "name": name,
+            "count": len(items),
+            "errors": sum(s["error"] for s in items),
+            "total_s": total,
+            "self_s": self_time,
+            "busy_s": busy,
+            "mean_s": total / len(items),
+            "p95_s": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            "wall_share": busy / wall,
+            "attributes": dict(totals),
+        })
+    rows.sort(key=lambda r: (r["busy_s"], r["self_s"]), reverse=True)
+    return rows
+
+
+def _print_summary(rows: List[dict], top_attributes: int = 4):
+    header = (f"{'stage':<32} {'count':>7} {'err':>5} {'busy s':>10} {'% wall':>7} {'total s':>10} "
+              f"{'self s':>10} {'mean s':>9} {'p95 s':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['name'][:32]:<32} {r['count']:>7} {r['errors']:>5} {r['busy_s']:>10.2f} {r['wall_share']:>7.1%} "
+              f"{r['total_s']:>10.2f} {r['self_s']:>10.2f} {r['mean_s']:>9.3f} {r['p95_s']:>9.3f}")
+        attributes = sorted(r["attributes"].items(), key=lambda kv: -abs(kv[1]))[:top_attributes]
+        if attributes:
+            print(" " * 4 + ", ".join(f"{k}={v:,.0f}" for k, v in attributes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage time breakdown of a trace file")
+    parser.add_argument("trace_file", nargs="?", default=os.getenv(TRACE_FILE_ENV))
+    parser.add_argument("--trace-id", default=None, help="Only spans of this trace")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+    if not args.trace_file:
+        parser.error(f"trace_file is required (or set {TRACE_FILE_ENV})")
+
+    spans = load_spans(args.trace_file)
+    if args.trace_id:
+        spans = [s for s in spans if s["trace_id"] == args.trace_id]
+    if not spans:
+        print(f"❌ Không có span nào trong {args.trace_file}")
+        sys.exit(1)
+    rows = summarize(spans)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        traces = len({s["trace_id"] for s in spans})
+        print(f"📊 {len(spans)} span, {traces} trace từ {args.trace_file}\n")
+        _print_summary(rows)
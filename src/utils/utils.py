@@ -1,9 +1,8 @@
 import os
 from tqdm import tqdm
 import csv
-from huggingface_hub import HfApi, HfFolder, upload_file
-from datasets import load_dataset, Dataset, DatasetDict
 import sys
+from src.utils.tracing import current_span, traced
 
 system_prompt = r"""
 Bạn là một chuyên gia pháp luật có nhiệm vụ **trích xuất thông tin có cấu trúc** từ văn bản pháp luật đã được số hóa (OCR hoặc định dạng văn bản thường).
@@ -86,32 +85,74 @@ def get_all_env_values():
     ]
     return {key: os.getenv(key) for key in keys}
 
-def make_csv(output_csv, txt_path):
-  with open(output_csv, mode="w", newline='', encoding="utf-8") as csvfile:
-      writer = csv.DictWriter(
-          csvfile,
-          fieldnames=["title", "system", "human", "context"],
-          quoting=csv.QUOTE_ALL
-      )
-      writer.writeheader()
-
-      for filename in os.listdir(txt_path):
-          if filename.endswith(".txt"):
-              file_path = os.path.join(txt_path, filename)
-              with open(file_path, "r", encoding="utf-8") as f:
-                  raw_context = f.read().strip().replace('"', '""')  # escape dấu "
-                  title = os.path.splitext(filename)[0]
-
-                  writer.writerow({
-                      "title": title,
-                      "system": system_prompt.strip(),
-                      "human": human_prompt,
-                      "context": raw_context
-                  })
-
-  print(f"✅ File CSV đã được tạo thành công tại: {output_csv}")
-  
+def _write_csv_rows(writer, txt_path, filenames):
+    for filename in filenames:
+        file_path = os.path.join(txt_path, filename)
+        with open(file_path, "r", encoding="utf-8") as f:
+            # csv.writer tự escape dấu " khi quote, không escape thêm ở đây
+            raw_context = f.read().strip()
+            title = os.path.splitext(filename)[0]
+
+            writer.writerow({
+                "title": title,
+                "system": system_prompt.strip(),
+                "human": human_prompt,
+                "context": raw_context
+            })
+
+@traced("make_csv")
+def make_csv(output_csv, txt_path, use_cache=True):
+    """
+    Build the title/system/human/context CSV from a folder of TXT files.
+
+    With `use_cache`, the artifact store remembers which (file name, content hash)
+    rows are already in `output_csv`: new files are appended, and the CSV is only
+    rewritten when a file was changed or removed or the CSV was edited outside.
+    """
+    filenames = sorted(f for f in os.listdir(txt_path) if f.endswith(".txt"))
+    fieldnames = ["title", "system", "human", "context"]
+
+    store = None
+    row_hashes = {}
+    mode = "w"
+    if use_cache:
+        from src.utils.artifact_store import get_artifact_store, stage_key, sha256_text
+
+        store = get_artifact_store()
+        key = stage_key("txt2csv", 2, {"system": sha256_text(system_prompt), "human": sha256_text(human_prompt)})
+        row_hashes = {
+            f: sha256_text(f + "\0" + store.hash_file(os.path.join(txt_path, f)))
+            for f in tqdm(filenames, desc="Hashing TXT")
+        }
+        recorded = store.inputs_for_output(key, output_csv)
+        if recorded and store.output_unchanged(output_csv) and recorded <= set(row_hashes.values()):
+            filenames = [f for f in filenames if row_hashes[f] not in recorded]
+            mode = "a"
+        else:
+            store.forget_output(key, output_csv)
+
+        if mode == "a" and not filenames:
+            current_span().set_attributes(rows=0, cached=len(row_hashes))
+            print(f"✅ CSV đã cập nhật, không có file mới: {output_csv}")
+            return
+
+    with open(output_csv, mode=mode, newline='', encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+        if mode == "w":
+            writer.writeheader()
+        _write_csv_rows(writer, txt_path, filenames)
+
+    if store is not None:
+        store.put_many(key, [row_hashes[f] for f in filenames], output_csv)
+        store.mark_output(output_csv)
+    current_span().set_attributes(rows=len(filenames), bytes_out=os.path.getsize(output_csv))
+
+    print(f"✅ File CSV đã được tạo thành công tại: {output_csv} ({len(filenames)} dòng mới)")
+
+@traced("upload")
 def upload(csv_path, repo_id):
+  from datasets import Dataset, DatasetDict
+
   dataset = Dataset.from_csv(csv_path)
   data = DatasetDict({'train': dataset})
   data.push_to_hub(repo_id=repo_id, max_shard_size='150MB')
\ No newline at end of file